@@ -0,0 +1,136 @@
+"""
+Async versions of the read-heavy endpoints, served under /api/async/.
+
+Under ASGI a sync view holds one thread of the server's pool for the whole
+request, DB waits included; these views await Django's async ORM instead,
+so a slow query doesn't take a thread away from other requests. Responses
+match their sync counterparts (same keys, same ETag/304 handling through
+caching.arespond) except that list endpoints are not paginated and ignore
+?fields=.
+
+They are plain Django views, not DRF ones (DRF's APIView is sync only), so
+authentication, the GET-only check and error bodies are done by
+@async_api_view below.
+"""
+import functools
+
+from django.db.models import Prefetch
+from django.http import JsonResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from . import caching
+from .authentication import CachedJWTAuthentication
+from .models import DoctorPatient, Medicine, SymptomReport, User
+from .serializers import MedicineSerializer, SymptomReportSerializer, UserSerializer
+from .views import (
+    DASHBOARD_MAX_SYMPTOMS, DASHBOARD_SYMPTOMS,
+    medicine_payload, patient_summary, symptom_payload, with_doctor_notes,
+)
+
+
+def async_api_view(view):
+    """Authenticates the request with CachedJWTAuthentication and allows GET only."""
+    authenticator = CachedJWTAuthentication()
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405,
+                                headers={'Allow': 'GET'})
+        try:
+            result = await authenticator.aauthenticate(request)
+        except (AuthenticationFailed, InvalidToken, TokenError) as e:
+            detail = getattr(e, 'detail', str(e))
+            return JsonResponse(detail if isinstance(detail, dict) else {"detail": str(detail)}, status=401,
+                                headers={'WWW-Authenticate': authenticator.authenticate_header(request)})
+        if result is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401,
+                                headers={'WWW-Authenticate': authenticator.authenticate_header(request)})
+        request.user, request.auth = result
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def _patients_of(doctor):
+    return User.objects.filter(
+        doctor_links__doctor=doctor,
+        doctor_links__status='accepted',
+        doctor_links__deleted_at__isnull=True,
+    ).distinct().order_by('id')
+
+
+# --- Profile ---
+
+@async_api_view
+async def profile(request):
+    async def build():
+        return UserSerializer(request.user).data
+
+    return await caching.arespond(request, request.user, 'async:profile', build)
+
+
+# --- Medicines / Symptoms ---
+
+@async_api_view
+async def medicines(request):
+    async def build():
+        rows = [m async for m in Medicine.objects.filter(user=request.user).order_by('-added_at', '-id')]
+        return MedicineSerializer(rows, many=True).data
+
+    return await caching.arespond(request, request.user, 'async:medicines', build)
+
+
+@async_api_view
+async def symptoms(request):
+    async def build():
+        queryset = with_doctor_notes(SymptomReport.objects.filter(user=request.user).order_by('-created_at', '-id'))
+        return SymptomReportSerializer([s async for s in queryset], many=True).data
+
+    return await caching.arespond(request, request.user, 'async:symptoms', build)
+
+
+# --- Patient requests ---
+
+@async_api_view
+async def patient_requests(request):
+    async def build():
+        return [
+            {"id": req.id, "doctor_name": req.doctor_username, "status": req.status, "date": "Today"}
+            async for req in DoctorPatient.objects.filter(patient=request.user).order_by('-id')
+        ]
+
+    return await caching.arespond(request, request.user, 'async:patient-requests', build)
+
+
+# --- Doctor dashboards ---
+
+@async_api_view
+async def my_patients(request):
+    return JsonResponse([patient_summary(p) async for p in _patients_of(request.user)], encoder=caching.JSONEncoder,
+                        safe=False)
+
+
+@async_api_view
+async def doctor_dashboard(request):
+    """Same rows and queries as views.get_doctor_dashboard."""
+    try:
+        limit = max(0, min(int(request.GET.get('symptoms', DASHBOARD_SYMPTOMS)), DASHBOARD_MAX_SYMPTOMS))
+    except ValueError:
+        return JsonResponse({"error": "symptoms must be an integer"}, status=400)
+
+    patients = _patients_of(request.user).prefetch_related(
+        Prefetch('medicines', queryset=Medicine.objects.order_by('-added_at', '-id'), to_attr='current_medicines'),
+        Prefetch('symptoms', queryset=with_doctor_notes(SymptomReport.objects.order_by('-created_at', '-id'))[:limit],
+                 to_attr='latest_symptoms'),
+    )
+    data = [
+        {
+            **patient_summary(p),
+            "medicines": [medicine_payload(m) for m in p.current_medicines],
+            "symptoms": [symptom_payload(s) for s in p.latest_symptoms],
+        }
+        async for p in patients
+    ]
+    return JsonResponse(data, encoder=caching.JSONEncoder, safe=False)
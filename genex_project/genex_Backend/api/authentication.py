@@ -0,0 +1,153 @@
+"""
+JWT authentication without a user query per request.
+
+CachedJWTAuthentication resolves the token's user from a small in-process
+LRU (bounded size, short TTL) instead of loading the User row every time.
+Entries are dropped when the user is saved or deleted (api.signals), which
+covers password changes. Other worker processes notice within TTL seconds.
+
+Tokens from get_tokens_for_user carry a `tv` (token version) claim derived
+from the password hash. After a password change, tokens issued before it no
+longer match the user's version and are rejected. Tokens without the claim
+were issued before it existed, so they predate any password change recorded
+in User.password_changed_at: they are accepted only while the user has none.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.crypto import salted_hmac
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+TOKEN_VERSION_CLAIM = 'tv'
+
+
+def token_version(user):
+    """Changes whenever the user's password does."""
+    return salted_hmac('api.token_version', user.password).hexdigest()[:16]
+
+
+class UserCache:
+    """
+    Bounded LRU of user_id -> (token version, User), each entry valid for `ttl` seconds.
+    Ids are compared as strings: tokens carry the user id claim as a string.
+    """
+
+    def __init__(self, max_entries=10000, ttl=60, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Returns None when API_AUTH_USER_CACHE is None (every request loads the user)."""
+        options = getattr(settings, 'API_AUTH_USER_CACHE', {})
+        if options is None:
+            return None
+        return cls(max_entries=options.get('MAX_ENTRIES', 10000), ttl=options.get('TTL', 60))
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        now = self._clock()
+        with self._lock:
+            item = self._data.get(user_id)
+            if item is None:
+                return None
+            expires_at, version, user = item
+            if expires_at <= now:
+                del self._data[user_id]
+                return None
+            self._data.move_to_end(user_id)
+            return version, user
+
+    def set(self, user_id, version, user):
+        user_id = str(user_id)
+        with self._lock:
+            self._data[user_id] = (self._clock() + self.ttl, version, user)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._data.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+user_cache = UserCache.from_settings(settings)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id, claimed = self._claims(validated_token)
+        user = self._cached(user_id, claimed)
+        if user is None:
+            user = self._remember(user_id, claimed, super().get_user(validated_token))  # DB lookup + is_active check
+        # Views may modify request.user (e.g. profile PATCH); never hand out the shared instance.
+        return copy.copy(user)
+
+    # --- Async views (api/async_views.py) ---
+
+    async def aauthenticate(self, request):
+        """authenticate() for plain Django async views. Returns (user, token) or None; raises on a bad token."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id, claimed = self._claims(validated_token)
+        user = self._cached(user_id, claimed)
+        if user is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed("User not found", code='user_not_found') from e
+            if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+                raise AuthenticationFailed("User is inactive", code='user_inactive')
+            user = self._remember(user_id, claimed, user)
+        return copy.copy(user)
+
+    @staticmethod
+    def _claims(validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken("Token contained no recognizable user identification") from e
+        return user_id, validated_token.get(TOKEN_VERSION_CLAIM)
+
+    @staticmethod
+    def _accepts(claimed, version, user):
+        if claimed is None:  # an old token without the claim
+            return user.password_changed_at is None
+        return claimed == version
+
+    @classmethod
+    def _cached(cls, user_id, claimed):
+        cached = user_cache.get(user_id) if user_cache is not None else None
+        if cached is not None and cls._accepts(claimed, *cached):
+            return cached[1]
+        return None
+
+    @classmethod
+    def _remember(cls, user_id, claimed, user):
+        """Checks the token version against a freshly loaded user and caches it."""
+        version = token_version(user)
+        if not cls._accepts(claimed, version, user):
+            raise AuthenticationFailed("The user's password has been changed.", code='password_changed')
+        if user_cache is not None:
+            user_cache.set(user_id, version, user)
+        return user
@@ -0,0 +1,87 @@
+"""
+Batch creates for the patient log viewsets (medicines, symptom reports).
+
+The app records entries offline and syncs them later. POSTing a JSON list
+validates the whole batch in one serializer pass (many=True) and inserts it
+with bulk_create in a single transaction. Entries may carry a client_id
+(unique per user). Re-sending an entry that already exists returns the
+stored row instead of inserting a duplicate, so a retried upload is safe.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .caching import bump_user_versions
+
+MAX_BULK_CREATE = getattr(settings, 'API_MAX_BULK_CREATE', 500)
+
+
+class BulkCreateMixin:
+    """
+    ViewSet mixin: create() also accepts a list. Single creates with a known
+    client_id return the existing row (200) instead of failing.
+    """
+
+    def create(self, request, *args, **kwargs):
+        if isinstance(request.data, list):
+            return self.bulk_create(request)
+
+        client_id = request.data.get('client_id') if hasattr(request.data, 'get') else None
+        if not client_id:
+            return super().create(request, *args, **kwargs)
+
+        # all_objects: a key that was since deleted must not be inserted again
+        stored = self.get_queryset().model.all_objects.filter(user=request.user, client_id=client_id)
+        existing = stored.first()
+        if existing is None:
+            try:
+                with transaction.atomic():
+                    return super().create(request, *args, **kwargs)
+            except IntegrityError:
+                # A concurrent retry inserted the key after the check above
+                existing = stored.first()
+                if existing is None:
+                    raise
+        return Response(self.get_serializer(existing).data, status=status.HTTP_200_OK)
+
+    def bulk_create(self, request):
+        items = request.data
+        if len(items) > MAX_BULK_CREATE:
+            return Response({"error": f"Batch too large ({len(items)} > {MAX_BULK_CREATE})"},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        serializer = self.get_serializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+        model = self.get_queryset().model
+        user = request.user
+
+        # Duplicates inside the batch collapse onto their first occurrence
+        keyed, unkeyed = {}, []
+        for data in serializer.validated_data:
+            obj = model(user=user, **data)
+            if obj.client_id:
+                keyed.setdefault(obj.client_id, obj)
+            else:
+                unkeyed.append(obj)
+
+        with transaction.atomic():
+            # Keyed rows: conflicts with earlier uploads (or a concurrent retry) are
+            # skipped by the database, then every keyed row is read back.
+            model.objects.bulk_create(keyed.values(), ignore_conflicts=True)
+            stored = {obj.client_id: obj for obj in model.all_objects.filter(user=user, client_id__in=list(keyed))}
+            model.objects.bulk_create(unkeyed)  # fills in primary keys
+            self.after_bulk_create(list(stored.values()) + unkeyed)
+
+        # bulk_create sends no post_save signals
+        bump_user_versions([user.id])
+
+        unkeyed_iter = iter(unkeyed)
+        rows = []
+        for data in serializer.validated_data:
+            client_id = data.get('client_id')
+            rows.append(stored[client_id] if client_id else next(unkeyed_iter))
+        return Response(self.get_serializer(rows, many=True).data, status=status.HTTP_201_CREATED)
+
+    def after_bulk_create(self, rows):
+        """Hook for work post_save receivers would have done (runs inside the transaction)."""
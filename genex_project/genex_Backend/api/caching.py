@@ -0,0 +1,208 @@
+"""
+Conditional GET (ETag / Last-Modified) and per-user payload caching.
+
+Every user has a version token. It is bumped whenever something that user's
+responses depend on changes: their profile, medicines, symptom reports or
+doctor links (see api.signals). ETags are derived from the token, so a
+revalidation is answered with 304 without touching the data tables or
+re-serializing.
+
+Tokens live in the database (ResponseVersion, one primary-key read per GET)
+unless API_RESPONSE_CACHE is set. Then they live in that cache, next to the
+serialized payloads, which a changed token retires. Its ALIAS has to be a
+cache every server process shares (Redis, Memcached, database): with a
+per-process cache (LocMemCache, Django's default) one worker would keep
+serving, and answering 304 for, what another just invalidated. The api.W001
+system check warns about such an alias.
+
+Writes that bypass model signals (bulk_create, QuerySet.update/delete)
+must call bump_user_versions() themselves.
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import ResponseVersion
+
+
+def options():
+    """API_RESPONSE_CACHE, or None when the payload cache is off (read per call, so tests can override it)."""
+    return getattr(settings, 'API_RESPONSE_CACHE', None)
+
+
+def _cache():
+    return caches[options().get('ALIAS', 'default')]
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    config = options()
+    if config is None:
+        return []
+    alias = config.get('ALIAS', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    if backend.endswith('LocMemCache'):
+        return [checks.Warning(
+            f"API_RESPONSE_CACHE uses the per-process cache '{alias}' ({backend}).",
+            hint="With more than one worker, invalidations in one aren't seen by the others. "
+                 "Point ALIAS at a shared cache (Redis, Memcached, database) or set API_RESPONSE_CACHE = None.",
+            id='api.W001',
+        )]
+    return []
+
+
+def _version_key(user_id):
+    return f'api:user-version:{user_id}'
+
+
+def _new_version():
+    # Unknown state (first request, or evicted): start a new token, which makes
+    # clients refetch once rather than trust a possibly stale validator.
+    return uuid.uuid4().hex, int(time.time())
+
+
+def get_user_version(user_id):
+    """(token, last_modified epoch seconds) for a user, creating one if there is none."""
+    if options() is None:
+        versions = ResponseVersion.objects.filter(user_id=user_id).values_list('token', 'modified')
+        version = versions.first()
+        if version is None:
+            token, modified = _new_version()
+            ResponseVersion.objects.bulk_create([ResponseVersion(user_id=user_id, token=token, modified=modified)],
+                                                ignore_conflicts=True)
+            version = versions.first()
+        return version
+
+    cache = _cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        version = _new_version()
+        if not cache.add(_version_key(user_id), version, timeout=None):
+            version = cache.get(_version_key(user_id)) or version
+    return version
+
+
+async def aget_user_version(user_id):
+    """get_user_version() for async views."""
+    if options() is None:
+        versions = ResponseVersion.objects.filter(user_id=user_id).values_list('token', 'modified')
+        version = await versions.afirst()
+        if version is None:
+            token, modified = _new_version()
+            await ResponseVersion.objects.abulk_create(
+                [ResponseVersion(user_id=user_id, token=token, modified=modified)], ignore_conflicts=True)
+            version = await versions.afirst()
+        return version
+
+    cache = _cache()
+    version = await cache.aget(_version_key(user_id))
+    if version is None:
+        version = _new_version()
+        if not await cache.aadd(_version_key(user_id), version, timeout=None):
+            version = await cache.aget(_version_key(user_id)) or version
+    return version
+
+
+def bump_user_versions(user_ids):
+    """Invalidates cached responses and validators of the given users."""
+    user_ids = {i for i in user_ids if i is not None}
+    if not user_ids:
+        return
+    if options() is None:
+        # Same transaction as the change itself, so it can't be seen without it
+        now = int(time.time())
+        ResponseVersion.objects.bulk_create(
+            [ResponseVersion(user_id=i, token=uuid.uuid4().hex, modified=now) for i in sorted(user_ids)],
+            update_conflicts=True, unique_fields=['user_id'], update_fields=['token', 'modified'],
+        )
+        return
+
+    def bump():
+        now = int(time.time())
+        _cache().set_many({_version_key(i): (uuid.uuid4().hex, now) for i in user_ids}, timeout=None)
+
+    bump()
+    if connection.in_atomic_block:
+        # Bump again once the data is visible to other connections, so a request
+        # that read the old rows in between can't leave them cached under the new token.
+        transaction.on_commit(bump)
+
+
+def _validators(request, user_id, resource, version):
+    """(payload cache key, ETag/Last-Modified headers, 304 wanted?) for one request."""
+    token, modified = version
+    query = request.META.get('QUERY_STRING', '')
+    digest = hashlib.sha1(f'{user_id}|{resource}|{query}|{token}'.encode()).hexdigest()[:20]
+    etag = quote_etag(digest)
+    headers = {'ETag': etag, 'Last-Modified': http_date(modified), 'Cache-Control': 'private, no-cache'}
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        fresh = etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    else:
+        since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        fresh = since is not None and modified <= since
+    return f'api:payload:{digest}', headers, fresh
+
+
+def respond(request, resource, build_response):
+    """
+    Serves a GET for the logged-in user's `resource` with validators.
+    Returns 304 if the client's copy is current, the cached payload if there is
+    one, and otherwise calls build_response() (which returns a Response) and
+    caches its data (when API_RESPONSE_CACHE is set).
+    """
+    key, headers, fresh = _validators(request, request.user.id, resource, get_user_version(request.user.id))
+    if fresh:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    data = _cache().get(key) if options() is not None else None
+    if data is not None:
+        response = Response(data)
+    else:
+        response = build_response()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+        if options() is not None:
+            _cache().set(key, response.data, timeout=options().get('TTL', 300))
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+async def arespond(request, user, resource, build_data):
+    """
+    respond() for plain Django async views: `build_data` is an async callable
+    returning the payload, and the result is a JsonResponse (DRF's encoder,
+    so dates render as on the sync endpoints).
+    """
+    key, headers, fresh = _validators(request, user.id, resource, await aget_user_version(user.id))
+    if fresh:
+        return HttpResponseNotModified(headers=headers)
+
+    if options() is None:
+        return JsonResponse(await build_data(), encoder=JSONEncoder, safe=False, headers=headers)
+    cache = _cache()
+    data = await cache.aget(key)
+    if data is None:
+        data = await build_data()
+        await cache.aset(key, data, timeout=options().get('TTL', 300))
+    return JsonResponse(data, encoder=JSONEncoder, safe=False, headers=headers)
+
+
+class CachedListMixin:
+    """ViewSet mixin: list() goes through respond() under `cache_resource`."""
+    cache_resource = None
+
+    def list(self, request, *args, **kwargs):
+        return respond(request, self.cache_resource, lambda: super(CachedListMixin, self).list(request, *args, **kwargs))
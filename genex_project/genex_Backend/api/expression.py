@@ -0,0 +1,219 @@
+"""
+Streaming parser for gene-expression tables (RABC expression files, GEO
+series matrices), plain or gzip-compressed.
+
+ExpressionParser is fed the raw upload bytes in whatever pieces they arrive
+and never holds more than one piece plus a block of parsed rows in memory:
+
+- gzip is detected from the first two bytes and decompressed incrementally
+  (at most DECOMPRESS_STEP bytes of text at a time, multi-member files too);
+- text is split into lines of at most MAX_LINE characters; '#' comments
+  and GEO '!' metadata lines are skipped; the first remaining line is the
+  header (gene/probe id column, then one column per sample), the rest are
+  rows;
+- every FLUSH_ROWS rows the block is converted to float32 and each sample's
+  column is appended to its own .npy file in `directory`, next to genes.txt
+  (one gene/probe id per line, in row order).
+
+The .npy files are written with a fixed-size header that close() patches
+with the final row count, so a finished upload is one float32 vector per
+sample (np.load(path, mmap_mode='r')) without re-reading the table.
+Missing values ('', NA, null, NaN) become NaN.
+"""
+import codecs
+import os
+import shutil
+import struct
+import zlib
+
+import numpy as np
+
+GZIP_MAGIC = b'\x1f\x8b'
+DECOMPRESS_STEP = 1 << 20  # bytes of text inflated per step
+MAX_LINE = 4 << 20  # characters; ~300k samples at 12 characters per value
+FLUSH_ROWS = 2048
+MISSING = {'', 'na', 'nan', 'null', 'none', 'n/a'}
+NPY_HEADER_SIZE = 128
+GENES_FILE = 'genes.txt'
+
+
+class ExpressionFormatError(ValueError):
+    pass
+
+
+def npy_header(length):
+    """A version 1.0 .npy header for a float32 vector of `length`, always NPY_HEADER_SIZE bytes."""
+    header = "{'descr': '<f4', 'fortran_order': False, 'shape': (%d,), }" % length
+    header = header.ljust(NPY_HEADER_SIZE - 11) + '\n'
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+def sample_filename(position):
+    return f'sample-{position:05d}.npy'
+
+
+def _unquote(field):
+    return field.strip().strip('"').strip()
+
+
+def _to_float(field, line_number):
+    value = _unquote(field)
+    if value.lower() in MISSING:
+        return np.nan
+    try:
+        return float(value)
+    except ValueError:
+        raise ExpressionFormatError(f"Line {line_number}: not a number: {value[:40]!r}") from None
+
+
+class ExpressionParser:
+    """
+    feed(data) any number of times, then close(). Writes into `directory`,
+    which is emptied first. `consumed` counts the bytes fed so far.
+    """
+
+    def __init__(self, directory, flush_rows=FLUSH_ROWS):
+        self.directory = directory
+        self.flush_rows = flush_rows
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+        self.consumed = 0
+        self.gene_column = None
+        self.samples = []
+        self.rows = 0
+        self._start = b''  # bytes before gzip detection
+        self._inflater = None  # None: not decided yet, False: plain text
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._tail = []  # pieces of the unfinished last line
+        self._tail_size = 0
+        self._line_number = 0
+        self._genes = []
+        self._block = []
+
+    # --- Bytes ---
+
+    def feed(self, data):
+        self.consumed += len(data)
+        if self._inflater is None:
+            self._start += data
+            if len(self._start) < len(GZIP_MAGIC):
+                return
+            data, self._start = self._start, b''
+            self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS) if data.startswith(GZIP_MAGIC) else False
+
+        if self._inflater is False:
+            self._text(data)
+        else:
+            self._inflate(data)
+
+    def _inflate(self, data):
+        while data:
+            if self._inflater.eof:  # next gzip member
+                self._inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            try:
+                self._text(self._inflater.decompress(data, DECOMPRESS_STEP))
+            except zlib.error as e:
+                raise ExpressionFormatError(f"Corrupt gzip data: {e}") from None
+            data = self._inflater.unconsumed_tail or self._inflater.unused_data
+
+    def close(self):
+        """Parses what is left and finalizes the .npy files. Returns the number of genes (rows)."""
+        if self._inflater is None:
+            data, self._start = self._start, b''
+            self._inflater = False
+            self._text(data)
+        elif self._inflater:
+            self._text(self._inflater.flush())
+            if not self._inflater.eof:
+                raise ExpressionFormatError("The gzip stream is truncated")
+        self._text(b'', final=True)
+        if self._tail_size:
+            self._line(''.join(self._tail))
+            self._tail, self._tail_size = [], 0
+        if self.gene_column is None:
+            raise ExpressionFormatError("No header line found")
+        if not self.samples:
+            raise ExpressionFormatError("The header has no sample columns")
+        self._flush()
+        if not self.rows:
+            raise ExpressionFormatError("The table has no rows")
+
+        header = npy_header(self.rows)
+        for position in range(len(self.samples)):
+            with open(os.path.join(self.directory, sample_filename(position)), 'r+b') as f:
+                f.write(header)
+        return self.rows
+
+    # --- Lines ---
+
+    def _text(self, data, final=False):
+        text = self._decoder.decode(data, final)
+        if '\n' not in text:  # keep the pieces, joining them on every feed would be quadratic
+            self._tail.append(text)
+            self._tail_size += len(text)
+            self._check_length(self._tail_size)
+            return
+        lines = text.split('\n')
+        lines[0] = ''.join(self._tail) + lines[0]
+        tail = lines.pop()
+        self._tail, self._tail_size = [tail], len(tail)
+        self._check_length(max(self._tail_size, *map(len, lines)))
+        for line in lines:
+            self._line(line)
+
+    def _check_length(self, length):
+        if length > MAX_LINE:
+            raise ExpressionFormatError(f"Line {self._line_number + 1} is longer than {MAX_LINE} characters "
+                                        "(not a tab-separated table?)")
+
+    def _line(self, line):
+        self._line_number += 1
+        line = line.rstrip('\r')
+        if not line.strip() or line.startswith(('!', '#')):
+            return
+        fields = line.split('\t')
+        if self.gene_column is None:
+            self._header(fields)
+            return
+
+        gene = _unquote(fields[0])
+        if not gene:
+            return  # unannotated probe
+        values = fields[1:]
+        if len(values) > len(self.samples):
+            raise ExpressionFormatError(
+                f"Line {self._line_number}: {len(values)} values for {len(self.samples)} samples")
+        values += [''] * (len(self.samples) - len(values))  # trailing empty cells dropped by the writer
+        try:
+            row = np.array(values, dtype=np.float32)  # fast path: plain numbers
+        except ValueError:
+            row = np.array([_to_float(v, self._line_number) for v in values], dtype=np.float32)
+        self._genes.append(gene)
+        self._block.append(row)
+        if len(self._block) >= self.flush_rows:
+            self._flush()
+
+    def _header(self, fields):
+        self.gene_column = _unquote(fields[0]) or 'ID_REF'
+        self.samples = [_unquote(f) for f in fields[1:]]
+        while self.samples and not self.samples[-1]:
+            self.samples.pop()
+        placeholder = npy_header(0)
+        for position in range(len(self.samples)):
+            with open(os.path.join(self.directory, sample_filename(position)), 'wb') as f:
+                f.write(placeholder)
+
+    # --- Output ---
+
+    def _flush(self):
+        if not self._block:
+            return
+        block = np.vstack(self._block).astype('<f4', copy=False)
+        for position in range(len(self.samples)):
+            with open(os.path.join(self.directory, sample_filename(position)), 'ab') as f:
+                f.write(block[:, position].tobytes())
+        with open(os.path.join(self.directory, GENES_FILE), 'a', encoding='utf-8') as f:
+            f.write(''.join(gene + '\n' for gene in self._genes))
+        self.rows += len(self._block)
+        self._block, self._genes = [], []
@@ -0,0 +1,282 @@
+"""
+Load-test harness for the GeneX backend (manage.py loadtest).
+
+seed_dataset() writes a deterministic synthetic population (patients with
+medicines and symptom reports, doctors linked to patients) under a
+username prefix, so it can be dropped and re-created without touching real
+accounts. run_scenario() drives one endpoint over HTTP from a thread pool
+and returns throughput, latency percentiles and SQL queries per request;
+the query count comes from the server's own /metrics (see
+backend.metrics), so it reflects exactly what the view ran.
+"""
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from . import rollups, search
+from .caching import bump_user_versions
+from .models import User, Medicine, SymptomReport, DoctorPatient
+
+PREFIX = 'loadtest-'
+PASSWORD = 'loadtest-password'
+
+MEDICINE_NAMES = ['Methotrexate', 'Hydroxychloroquine', 'Prednisone', 'Sulfasalazine', 'Leflunomide',
+                  'Ibuprofen', 'Naproxen', 'Folic acid', 'Adalimumab', 'Etanercept']
+SYMPTOM_NAMES = ['Joint pain', 'Morning stiffness', 'Fatigue', 'Dry eyes', 'Dry mouth', 'Rash',
+                 'Fever', 'Swelling', 'Back pain', 'Hair loss']
+FREQUENCIES = ['Daily', 'Weekly', 'Occasionally', 'Constant']
+
+
+def seed_dataset(patients=200, doctors=20, medicines=5, symptoms=20, links=10, seed=42, prefix=PREFIX):
+    """
+    Replaces any previous seeded data under `prefix` with a fresh population.
+    Each doctor gets `links` accepted patients (plus one pending request).
+    Returns {'patients': [...ids], 'doctors': [...ids], 'links': {doctor_id: [patient_ids]}}.
+    """
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)  # hash once, not per user
+
+    with transaction.atomic():
+        clear_dataset(prefix)
+        User.objects.bulk_create([
+            User(username=f'{prefix}patient-{i:05d}@genex.test', email=f'{prefix}patient-{i:05d}@genex.test',
+                 first_name=f'Patient {i}', password=password, role='patient',
+                 age=rng.randint(18, 85), gender=rng.choice(['Female', 'Male']),
+                 weight=round(rng.uniform(45, 110), 1), height=round(rng.uniform(150, 195), 1))
+            for i in range(patients)
+        ])
+        User.objects.bulk_create([
+            User(username=f'{prefix}doctor-{i:04d}@genex.test', email=f'{prefix}doctor-{i:04d}@genex.test',
+                 first_name=f'Doctor {i}', password=password, role='doctor')
+            for i in range(doctors)
+        ])
+        patient_users = list(User.objects.filter(username__startswith=f'{prefix}patient-').order_by('id'))
+        doctor_users = list(User.objects.filter(username__startswith=f'{prefix}doctor-').order_by('id'))
+        search.index_users(patient_users)  # bulk_create skips the save signal
+
+        Medicine.objects.bulk_create([
+            Medicine(user=p, name=rng.choice(MEDICINE_NAMES)) for p in patient_users for _ in range(medicines)
+        ], batch_size=1000)
+        SymptomReport.objects.bulk_create([
+            SymptomReport(user=p, symptom_name=rng.choice(SYMPTOM_NAMES), severity=rng.randint(0, 10),
+                          frequency=rng.choice(FREQUENCIES), notes=rng.choice(['', 'Worse after exercise', None]))
+            for p in patient_users for _ in range(symptoms)
+        ], batch_size=1000)
+        rollups.rebuild(user_ids=[p.id for p in patient_users])
+
+        rows = []
+        for d in doctor_users:
+            chosen = rng.sample(patient_users, min(links + 1, len(patient_users)))
+            accepted, pending = chosen[:links], chosen[links:]
+            rows += [DoctorPatient(doctor=d, patient=p, doctor_username=d.username, patient_username=p.username,
+                                   status='accepted') for p in accepted]
+            rows += [DoctorPatient(doctor=d, patient=p, doctor_username=d.username, patient_username=p.username,
+                                   status='pending') for p in pending]
+        for row in rows:
+            row.fill_keys()
+        DoctorPatient.objects.bulk_create(rows, batch_size=1000)
+        # bulk_create sends no signals: invalidate cached responses by hand
+        bump_user_versions([u.id for u in patient_users + doctor_users])
+
+    return load_dataset(prefix)
+
+
+def load_dataset(prefix=PREFIX):
+    """Ids of a previously seeded population (see seed_dataset)."""
+    patients = list(User.objects.filter(username__startswith=f'{prefix}patient-')
+                    .order_by('id').values_list('id', flat=True))
+    doctors = list(User.objects.filter(username__startswith=f'{prefix}doctor-')
+                   .order_by('id').values_list('id', flat=True))
+    links = {doctor_id: [] for doctor_id in doctors}
+    for doctor_id, patient_id in DoctorPatient.objects.filter(
+            doctor_id__in=doctors, patient__isnull=False, status='accepted').values_list('doctor_id', 'patient_id'):
+        links[doctor_id].append(patient_id)
+    return {'patients': patients, 'doctors': doctors, 'links': links}
+
+
+def clear_dataset(prefix=PREFIX):
+    DoctorPatient.objects.filter(doctor_username__startswith=prefix).delete()
+    DoctorPatient.objects.filter(patient_username__startswith=prefix).delete()
+    User.objects.filter(username__startswith=prefix).delete()
+
+
+def build_scenarios(dataset, payloads, tokens):
+    """
+    Scenario name -> make_request(i) for run_scenario. `tokens` maps user id to
+    an access token; `payloads` are predict_xai bodies.
+    """
+    patients, doctors = dataset['patients'], dataset['doctors']
+    usernames = dict(User.objects.filter(id__in=patients).values_list('id', 'username'))
+    pairs = [(d, p) for d in doctors for p in dataset['links'][d]]
+    if not patients or not doctors or not pairs:
+        raise ValueError('Seeded dataset is empty; run without --no-seed first.')
+
+    def signin(i):
+        return 'POST', '/api/signin/', {'username': usernames[patients[i % len(patients)]], 'password': PASSWORD}, None
+
+    def predict_xai(i):
+        return 'POST', '/predict_xai/', payloads[i % len(payloads)], None
+
+    def my_patients(i):
+        return 'GET', '/api/doctor/my-patients/', None, tokens[doctors[i % len(doctors)]]
+
+    def patient_records(i):
+        doctor, patient = pairs[i % len(pairs)]
+        return 'GET', f'/api/doctor/patient-records/{patient}/', None, tokens[doctor]
+
+    def dashboard(i):
+        return 'GET', '/api/doctor/dashboard/', None, tokens[doctors[i % len(doctors)]]
+
+    def search_patients(i):
+        term = f'patient-{i % 100:02d}'  # prefix of several patients' usernames
+        return 'GET', f'/api/search-patients/?query={term}', None, tokens[doctors[i % len(doctors)]]
+
+    def patient_trends(i):
+        doctor, patient = pairs[i % len(pairs)]
+        return 'GET', f'/api/doctor/patient-trends/{patient}/', None, tokens[doctor]
+
+    def medicines(i):
+        return 'GET', '/api/medicines/', None, tokens[patients[i % len(patients)]]
+
+    def symptoms(i):
+        return 'GET', '/api/symptoms/', None, tokens[patients[i % len(patients)]]
+
+    return {
+        'signin': signin,
+        'predict_xai': predict_xai,
+        'my_patients': my_patients,
+        'patient_records': patient_records,
+        'dashboard': dashboard,
+        'search_patients': search_patients,
+        'patient_trends': patient_trends,
+        'medicines': medicines,
+        'symptoms': symptoms,
+    }
+
+
+# --- HTTP driver ---
+
+def _request(base_url, method, path, body=None, token=None, timeout=30):
+    data = None if body is None else json.dumps(body).encode('utf-8')
+    request = urllib.request.Request(base_url + path, data=data, method=method)
+    request.add_header('Content-Type', 'application/json')
+    if token:
+        request.add_header('Authorization', f'Bearer {token}')
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+
+
+_QUERY_SAMPLE = re.compile(r'^genex_db_queries_per_request_(sum|count)\{route="([^"]*)"\} (\S+)$', re.M)
+
+
+def scrape_queries(base_url):
+    """Total (queries, requests) recorded by the server, excluding /metrics itself. None if unavailable."""
+    try:
+        with urllib.request.urlopen(base_url + '/metrics', timeout=10) as response:
+            text = response.read().decode('utf-8')
+    except (urllib.error.URLError, OSError):
+        return None
+    totals = {'sum': 0.0, 'count': 0.0}
+    for kind, route, value in _QUERY_SAMPLE.findall(text):
+        if route != 'metrics':
+            totals[kind] += float(value)
+    return totals['sum'], totals['count']
+
+
+def run_scenario(base_url, make_request, concurrency, requests, warmup=10):
+    """
+    Sends `requests` calls from `concurrency` threads (closed loop).
+    make_request(i) -> (method, path, body, token).
+    """
+    for i in range(warmup):
+        _request(base_url, *make_request(i))
+
+    before = scrape_queries(base_url)
+    latencies = []
+    errors = [0]
+    counter = iter(range(requests))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            method, path, body, token = make_request(warmup + i)
+            started = time.perf_counter()
+            try:
+                status = _request(base_url, method, path, body, token)
+            except (urllib.error.URLError, OSError):
+                status = 0
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if not 200 <= status < 300:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+    after = scrape_queries(base_url)
+
+    queries = None
+    if before is not None and after is not None and after[1] > before[1]:
+        queries = (after[0] - before[0]) / (after[1] - before[1])
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': round(len(latencies) / wall, 2),
+        'mean_ms': round(float(np.mean(latencies)) * 1000, 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'queries_per_request': None if queries is None else round(queries, 2),
+    }
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Lines describing changes from `baseline` to `current` results, plus a list of
+    regressions (p95 latency up by more than `threshold`, or more queries per request).
+    """
+    lines, regressions = [], []
+    for scenario, levels in current.items():
+        for level, result in levels.items():
+            before = baseline.get(scenario, {}).get(level)
+            if before is None:
+                lines.append(f"{scenario} @{level}: new (no baseline)")
+                continue
+            p95_change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+            rps_change = ((result['throughput_rps'] - before['throughput_rps']) / before['throughput_rps']
+                          if before['throughput_rps'] else 0.0)
+            line = (f"{scenario} @{level}: p95 {before['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms "
+                    f"({p95_change:+.0%}), rps {before['throughput_rps']:.0f} -> {result['throughput_rps']:.0f} "
+                    f"({rps_change:+.0%})")
+            q_before, q_after = before.get('queries_per_request'), result.get('queries_per_request')
+            if q_before is not None and q_after is not None:
+                line += f", queries {q_before:g} -> {q_after:g}"
+                if q_after > q_before:
+                    regressions.append(f"{scenario} @{level}: queries per request {q_before:g} -> {q_after:g}")
+            if p95_change > threshold:
+                regressions.append(f"{scenario} @{level}: p95 up {p95_change:.0%}")
+            lines.append(line)
+    return lines, regressions
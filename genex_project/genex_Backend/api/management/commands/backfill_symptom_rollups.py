@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api import rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the weekly symptom rollups from the symptom reports (after writes that skip signals)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users',
+                            help='Only this user id (repeatable). Default: everyone.')
+
+    def handle(self, *args, **options):
+        written = rollups.rebuild(user_ids=options['users'])
+        self.stdout.write(self.style.SUCCESS(f'Symptom rollups rebuilt ({written} weekly rows).'))
@@ -0,0 +1,237 @@
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db.backends.signals import connection_created
+
+from api import caching, loadtest
+from api.models import User
+from api.views import get_tokens_for_user
+from ml_api.synthetic import synthetic_payloads
+
+# Scenario -> (sync path, async path); tokens/bodies are filled in per request.
+SCENARIOS = {
+    'profile': ('/api/profile/', '/api/async/profile/'),
+    'medicines': ('/api/medicines/', '/api/async/medicines/'),
+    'symptoms': ('/api/symptoms/', '/api/async/symptoms/'),
+    'patient_requests': ('/api/patient/requests/', '/api/async/patient/requests/'),
+    'dashboard': ('/api/doctor/dashboard/', '/api/async/doctor/dashboard/'),
+    'predict_xai': ('/predict_xai/', '/predict_xai/async/'),
+}
+MODES = ['wsgi-sync', 'asgi-sync', 'asgi-async']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares requests per second of the sync endpoints behind a threaded WSGI "
+        "server with the /api/async/ endpoints under ASGI, at several client counts. "
+        "Requests go through Django's WSGIHandler/ASGIHandler in this process (full "
+        "middleware, URL routing and database access, no sockets), so the numbers "
+        "compare the request paths rather than any particular server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default=','.join(MODES), help=f"Comma-separated, from: {', '.join(MODES)}.")
+        parser.add_argument('--scenarios', default='profile,medicines,dashboard,predict_xai',
+                            help=f"Comma-separated, from: {', '.join(SCENARIOS)}.")
+        parser.add_argument('--concurrency', default='1,16,64,256', help='Comma-separated client counts.')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per scenario, mode and concurrency.')
+        parser.add_argument('--wsgi-threads', type=int, default=16,
+                            help='Worker threads of the simulated WSGI server (e.g. gunicorn --threads).')
+        parser.add_argument('--db-latency-ms', type=float, default=0,
+                            help='Sleep this long in every SQL query, like a database across the network '
+                                 '(SQLite answers in microseconds, so waits never pile up without it).')
+        parser.add_argument('--response-cache', action='store_true',
+                            help='Turn API_RESPONSE_CACHE on in this process, with the default cache if it is '
+                                 'off in settings (by default every request reaches the database).')
+        # Dataset (see the loadtest command)
+        parser.add_argument('--no-seed', action='store_true', help='Reuse the data seeded by loadtest/bench_async.')
+        parser.add_argument('--patients', type=int, default=200)
+        parser.add_argument('--doctors', type=int, default=20)
+        parser.add_argument('--clear', action='store_true', help='Delete the seeded data afterwards.')
+        parser.add_argument('--output', help='Write results to this JSON file.')
+
+    def handle(self, *args, **options):
+        modes = options['modes'].split(',')
+        names = options['scenarios'].split(',')
+        levels = [int(c) for c in options['concurrency'].split(',')]
+        unknown = (set(modes) - set(MODES)) | (set(names) - set(SCENARIOS))
+        if unknown:
+            raise CommandError(f"Unknown modes/scenarios: {', '.join(sorted(unknown))}")
+
+        if options['no_seed']:
+            dataset = loadtest.load_dataset()
+        else:
+            self.stdout.write(f"Seeding {options['patients']} patients, {options['doctors']} doctors ...")
+            dataset = loadtest.seed_dataset(patients=options['patients'], doctors=options['doctors'])
+        if not dataset['patients'] or not dataset['doctors']:
+            raise CommandError('Seeded dataset is empty; run without --no-seed first.')
+        users = list(User.objects.filter(id__in=dataset['patients'] + dataset['doctors']))
+        # This process only: measure the views, not the payload cache, unless asked to
+        cache_options = (caching.options() or {'ALIAS': 'default', 'TTL': 300}) if options['response_cache'] else None
+        settings.API_RESPONSE_CACHE = cache_options
+        if options['db_latency_ms']:
+            connection_created.connect(_add_latency(options['db_latency_ms'] / 1000), weak=False)
+
+        header = f"{'scenario':>16} {'mode':>10} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        results = {}
+        try:
+            for name in names:
+                for mode in modes:
+                    for level in levels:
+                        # Fresh tokens per run: a long benchmark outlives the access token lifetime
+                        tokens = {user.id: get_tokens_for_user(user)['access'] for user in users}
+                        requests = self._requests(name, dataset, tokens, options['requests'])
+                        r = asyncio.run(self._measure(mode, requests, level, options['wsgi_threads']))
+                        results.setdefault(name, {}).setdefault(mode, {})[str(level)] = r
+                        self.stdout.write(
+                            f"{name:>16} {mode:>10} {level:>5} {r['throughput_rps']:>9.1f} {r['p50_ms']:>9.2f} "
+                            f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['errors']:>7}"
+                        )
+        finally:
+            if options['clear']:
+                loadtest.clear_dataset()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'requests': options['requests'], 'wsgi_threads': options['wsgi_threads'],
+                           'db_latency_ms': options['db_latency_ms'], 'results': results}, f, indent=2)
+            self.stdout.write(f"Saved results to {options['output']}")
+
+    @staticmethod
+    def _requests(name, dataset, tokens, count):
+        """(sync request, async request) pairs; each request is (method, path, body, token)."""
+        sync_path, async_path = SCENARIOS[name]
+        patients, doctors = dataset['patients'], dataset['doctors']
+        payloads = synthetic_payloads(min(count, 1000), seed=3)
+        pairs = []
+        for i in range(count):
+            if name == 'predict_xai':
+                method, body, token = 'POST', payloads[i % len(payloads)], None
+            else:
+                users = doctors if name == 'dashboard' else patients
+                method, body, token = 'GET', None, tokens[users[i % len(users)]]
+            pairs.append(((method, sync_path, body, token), (method, async_path, body, token)))
+        return pairs
+
+    # --- Measurement ---
+
+    async def _measure(self, mode, requests, concurrency, wsgi_threads):
+        """Closed loop: `concurrency` clients send the requests as fast as they are answered."""
+        if mode == 'wsgi-sync':
+            handler, pool = WSGIHandler(), ThreadPoolExecutor(max_workers=wsgi_threads)
+            loop = asyncio.get_running_loop()
+
+            async def call(request):
+                return await loop.run_in_executor(pool, _call_wsgi, handler, *request)
+        else:
+            handler, pool = ASGIHandler(), None
+
+            async def call(request):
+                return await _call_asgi(handler, *request)
+
+        index = 1 if mode == 'asgi-async' else 0
+        queue = iter(requests)
+        latencies, errors = [], [0]
+
+        async def client():
+            for pair in queue:
+                started = time.perf_counter()
+                try:
+                    status = await call(pair[index])
+                except Exception:
+                    status = 0
+                latencies.append(time.perf_counter() - started)
+                if not 200 <= status < 300:
+                    errors[0] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+        if pool is not None:
+            pool.shutdown()
+
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        return {
+            'requests': len(latencies),
+            'errors': errors[0],
+            'throughput_rps': round(len(latencies) / wall, 2),
+            'p50_ms': round(float(p50), 3),
+            'p95_ms': round(float(p95), 3),
+            'p99_ms': round(float(p99), 3),
+        }
+
+
+def _add_latency(seconds):
+    """connection_created receiver: every query on the new connection waits `seconds` first."""
+    def wait(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def receiver(sender, connection, **kwargs):
+        if wait not in connection.execute_wrappers:  # the wrapper object outlives reconnects
+            connection.execute_wrappers.append(wait)
+
+    return receiver
+
+
+def _call_wsgi(handler, method, path, body, token):
+    data = b'' if body is None else json.dumps(body).encode()
+    environ = {
+        'REQUEST_METHOD': method, 'PATH_INFO': path, 'SCRIPT_NAME': '', 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': 'localhost',
+        'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(data)),
+        'wsgi.input': io.BytesIO(data), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    if token:
+        environ['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+    status = []
+    response = handler(environ, lambda s, headers, exc_info=None: status.append(s))
+    try:
+        for _ in response:
+            pass
+    finally:
+        response.close()
+    return int(status[0].split()[0])
+
+
+async def _call_asgi(handler, method, path, body, token):
+    data = b'' if body is None else json.dumps(body).encode()
+    headers = [(b'host', b'localhost'), (b'content-type', b'application/json'),
+               (b'content-length', str(len(data)).encode())]
+    if token:
+        headers.append((b'authorization', f'Bearer {token}'.encode()))
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+        'method': method, 'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': b'',
+        'headers': headers, 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+    messages = iter([{'type': 'http.request', 'body': data, 'more_body': False}])
+    disconnected = asyncio.Event()
+
+    async def receive():
+        message = next(messages, None)
+        if message is None:
+            await disconnected.wait()  # the client stays connected until the response is sent
+            return {'type': 'http.disconnect'}
+        return message
+
+    status = []
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await handler(scope, receive, send)
+    disconnected.set()
+    return status[0]
@@ -0,0 +1,155 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+
+from api.models import SymptomReport, User
+
+# Environment overrides per mode (see backend/database.py). PostgreSQL modes
+# use the GENEX_DB_NAME/_USER/... of the calling environment.
+MODES = {
+    # Django's stock SQLite settings: rollback journal, fsync per commit, deferred transactions
+    'sqlite-default': {
+        'GENEX_DB_ENGINE': 'sqlite', 'GENEX_SQLITE_JOURNAL_MODE': 'DELETE', 'GENEX_SQLITE_SYNCHRONOUS': 'FULL',
+        'GENEX_SQLITE_BUSY_TIMEOUT': '5', 'GENEX_SQLITE_TRANSACTION_MODE': 'DEFERRED',
+    },
+    'sqlite-wal': {'GENEX_DB_ENGINE': 'sqlite'},
+    'postgresql': {'GENEX_DB_ENGINE': 'postgresql', 'GENEX_DB_POOL': '0'},
+    'postgresql-pool': {'GENEX_DB_ENGINE': 'postgresql', 'GENEX_DB_POOL': '1'},
+}
+BENCH_USER = 'bench-db-writes@genex.test'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures concurrent write throughput (symptom posts and doctor-note appends) "
+        "for each database mode, each in its own process. SQLite modes use a fresh "
+        "temporary database; PostgreSQL modes write to the already migrated database "
+        "named by GENEX_DB_* and remove their rows afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', default='sqlite-default,sqlite-wal',
+                            help=f"Comma-separated, from: {', '.join(MODES)}.")
+        parser.add_argument('--threads', default='1,4,16', help='Comma-separated writer counts.')
+        parser.add_argument('--writes', type=int, default=400, help='Writes per mode and thread count.')
+        parser.add_argument('--output', help='Write results to this JSON file.')
+        parser.add_argument('--worker', action='store_true', help='Internal: run one mode in this process.')
+
+    def handle(self, *args, **options):
+        levels = [int(t) for t in options['threads'].split(',')]
+        if options['worker']:
+            results = {str(level): self._measure(level, options['writes']) for level in levels}
+            self.stdout.write(json.dumps(results))
+            return
+
+        modes = options['modes'].split(',')
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))} (choose from {', '.join(MODES)})")
+
+        header = f"{'mode':>16} {'threads':>7} {'writes/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        results = {}
+        for mode in modes:
+            try:
+                results[mode] = self._run_mode(mode, options)
+            except CommandError as e:
+                self.stdout.write(self.style.WARNING(f'{mode:>16} skipped: {e}'))
+                continue
+            for level, r in results[mode].items():
+                self.stdout.write(
+                    f"{mode:>16} {level:>7} {r['throughput_wps']:>9.1f} {r['p50_ms']:>9.2f} "
+                    f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['errors']:>7}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'writes': options['writes'], 'results': results}, f, indent=2)
+            self.stdout.write(f"Saved results to {options['output']}")
+
+    def _run_mode(self, mode, options):
+        env = {**os.environ, **MODES[mode]}
+        with tempfile.TemporaryDirectory() as tmp:
+            if env['GENEX_DB_ENGINE'] == 'sqlite':
+                env['GENEX_DB_NAME'] = os.path.join(tmp, 'bench.sqlite3')
+            manage = os.path.join(settings.BASE_DIR, 'manage.py')
+            if env['GENEX_DB_ENGINE'] == 'sqlite':
+                self._call([sys.executable, manage, 'migrate', '--verbosity', '0'], env)
+            out = self._call([sys.executable, manage, 'bench_db_writes', '--worker',
+                              '--threads', options['threads'], '--writes', str(options['writes'])], env)
+        return json.loads(out.strip().splitlines()[-1])
+
+    @staticmethod
+    def _call(args, env):
+        proc = subprocess.run(args, env=env, capture_output=True, text=True, cwd=settings.BASE_DIR)
+        if proc.returncode != 0:
+            raise CommandError((proc.stderr.strip().splitlines() or ['failed'])[-1])
+        return proc.stdout
+
+    # --- Worker (runs inside the subprocess for one mode) ---
+
+    def _measure(self, threads, writes):
+        user, _ = User.objects.get_or_create(username=BENCH_USER, defaults={'role': 'patient'})
+        reports = [SymptomReport.objects.create(user=user, symptom_name='Fatigue', severity=3, frequency='Daily')
+                   for _ in range(threads)]
+        close_old_connections()
+
+        latencies, errors = [], [0]
+        lock = threading.Lock()
+        per_thread = max(1, writes // threads)
+
+        def writer(index):
+            report_id = reports[index].id
+            for i in range(per_thread):
+                start = time.perf_counter()
+                try:
+                    if i % 2:
+                        # Same reads and write as add_doctor_note
+                        report = SymptomReport.objects.get(id=report_id)
+                        report.notes = f"{report.notes or ''}\n\n Doctor: note {i}".strip()[-2000:]
+                        report.save()
+                    else:
+                        SymptomReport.objects.create(user_id=user.id, symptom_name='Joint pain',
+                                                     severity=i % 10, frequency='Daily')
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        latencies.append(elapsed)
+                except OperationalError:  # "database is locked" after the busy timeout
+                    with lock:
+                        errors[0] += 1
+                finally:
+                    close_old_connections()  # end of "request": pooled/persistent connections are kept
+            connection.close()
+
+        started = time.perf_counter()
+        pool = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        wall = time.perf_counter() - started
+
+        SymptomReport.all_objects.filter(user=user).delete()
+        if connection.vendor != 'sqlite':
+            user.delete()  # the SQLite database is thrown away anyway
+
+        ms = np.array(latencies or [0.0]) * 1000
+        return {
+            'threads': threads,
+            'writes': len(latencies),
+            'errors': errors[0],
+            'throughput_wps': len(latencies) / wall if wall else 0.0,
+            'p50_ms': float(np.percentile(ms, 50)),
+            'p95_ms': float(np.percentile(ms, 95)),
+            'p99_ms': float(np.percentile(ms, 99)),
+        }
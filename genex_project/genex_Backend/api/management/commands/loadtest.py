@@ -0,0 +1,156 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api import loadtest
+from api.models import User
+from api.views import get_tokens_for_user
+from ml_api.synthetic import synthetic_payloads
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a synthetic population and load-tests the main endpoints over HTTP "
+        "(throughput, p50/p95/p99 latency, SQL queries per request). Saves the "
+        "results as a JSON baseline and can diff against a previous one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000',
+                            help='Server to test. It must use the same database as this command.')
+        parser.add_argument('--serve', action='store_true',
+                            help='Start "runserver --noreload" on --base-url for the duration of the run.')
+        parser.add_argument('--scenarios', default='signin,predict_xai,my_patients,patient_records,dashboard,search_patients,patient_trends,medicines,symptoms',
+                            help='Comma-separated scenario names.')
+        parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated client counts.')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario and concurrency.')
+        parser.add_argument('--warmup', type=int, default=10)
+        # Dataset
+        parser.add_argument('--no-seed', action='store_true', help='Reuse the previously seeded data.')
+        parser.add_argument('--patients', type=int, default=200)
+        parser.add_argument('--doctors', type=int, default=20)
+        parser.add_argument('--medicines', type=int, default=5, help='Per patient.')
+        parser.add_argument('--symptoms', type=int, default=20, help='Per patient.')
+        parser.add_argument('--links', type=int, default=10, help='Accepted patients per doctor.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--clear', action='store_true', help='Delete the seeded data afterwards.')
+        # Baselines
+        parser.add_argument('--output', help='Write results to this JSON file.')
+        parser.add_argument('--compare', help='Baseline JSON file to diff against.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative p95 increase reported as a regression (default 0.2).')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'].rstrip('/')
+        levels = [int(c) for c in options['concurrency'].split(',')]
+        names = options['scenarios'].split(',')
+        dataset_options = {key: options[key] for key in ('patients', 'doctors', 'medicines', 'symptoms', 'links', 'seed')}
+
+        if options['no_seed']:
+            dataset = loadtest.load_dataset()
+        else:
+            self.stdout.write(f"Seeding {options['patients']} patients, {options['doctors']} doctors ...")
+            dataset = loadtest.seed_dataset(**dataset_options)
+
+        tokens = {
+            user.id: get_tokens_for_user(user)['access']
+            for user in User.objects.filter(id__in=dataset['patients'] + dataset['doctors'])
+        }
+        try:
+            scenarios = loadtest.build_scenarios(dataset, synthetic_payloads(1000, seed=3), tokens)
+        except ValueError as e:
+            raise CommandError(str(e))
+        unknown = set(names) - set(scenarios)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))} (choose from {', '.join(scenarios)})")
+
+        server = self._start_server(base_url) if options['serve'] else None
+        try:
+            self._wait_for(base_url, timeout=30 if server else 2)
+            results = self._run(base_url, scenarios, names, levels, options)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+            if options['clear']:
+                loadtest.clear_dataset()
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'dataset': dataset_options,
+            'requests': options['requests'],
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Saved results to {options['output']}")
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            lines, regressions = loadtest.compare(baseline['results'], results, options['threshold'])
+            self.stdout.write(f"\nCompared with {options['compare']} ({baseline.get('created', '?')}):")
+            for line in lines:
+                self.stdout.write('  ' + line)
+            for regression in regressions:
+                self.stdout.write(self.style.WARNING('  REGRESSION ' + regression))
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} regression(s) against {options["compare"]}')
+
+    def _run(self, base_url, scenarios, names, levels, options):
+        header = (f"{'scenario':>16} {'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+                  f"{'p99 ms':>9} {'queries':>8} {'errors':>7}")
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        results = {}
+        for name in names:
+            for level in levels:
+                result = loadtest.run_scenario(
+                    base_url, scenarios[name], level, options['requests'], warmup=options['warmup'],
+                )
+                results.setdefault(name, {})[str(level)] = result
+                queries = result['queries_per_request']
+                self.stdout.write(
+                    f"{name:>16} {level:>5} {result['throughput_rps']:>9.1f} {result['p50_ms']:>9.2f} "
+                    f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+                    f"{'-' if queries is None else f'{queries:g}':>8} {result['errors']:>7}"
+                )
+        return results
+
+    @staticmethod
+    def _start_server(base_url):
+        address = base_url.split('://', 1)[-1]
+        manage = os.path.join(settings.BASE_DIR, 'manage.py')
+        return subprocess.Popen(
+            [sys.executable, manage, 'runserver', '--noreload', address],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    @staticmethod
+    def _wait_for(base_url, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                urllib.request.urlopen(base_url + '/api/', timeout=2).read()
+                return
+            except urllib.error.HTTPError:
+                return  # it answered
+            except (urllib.error.URLError, OSError):
+                if time.monotonic() > deadline:
+                    raise CommandError(f'No server answering at {base_url} (start one or pass --serve)')
+                time.sleep(0.2)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api import sync
+
+
+class Command(BaseCommand):
+    help = "Removes soft-deleted rows older than API_SYNC['TOMBSTONE_DAYS'] (clients with older cursors resync fully)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help="Override the retention period.")
+
+    def handle(self, *args, **options):
+        for label, count in sync.purge_tombstones(options['days']).items():
+            self.stdout.write(f'{label}: {count} removed')
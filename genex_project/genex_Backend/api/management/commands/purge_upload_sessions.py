@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api import uploads
+
+
+class Command(BaseCommand):
+    help = "Removes unfinished upload sessions idle for more than API_UPLOADS['EXPIRE_HOURS'], with their files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=None, help="Override the expiry period.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{uploads.purge_stale(options["hours"])} upload sessions removed')
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:37
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+def link_users(apps, schema_editor):
+    """Fills the case-folded keys and resolves both usernames to users (case-insensitively)."""
+    User = apps.get_model('api', 'User')
+    DoctorPatient = apps.get_model('api', 'DoctorPatient')
+
+    user_ids = {}
+    for user_id, username in User.objects.order_by('-id').values_list('id', 'username').iterator():
+        user_ids[username.strip().lower()] = user_id  # lowest id wins on case-only duplicates
+
+    batch = []
+    for link in DoctorPatient.objects.order_by('id').iterator(chunk_size=2000):
+        link.doctor_key = (link.doctor_username or '').strip().lower()
+        link.patient_key = (link.patient_username or '').strip().lower()
+        link.doctor_id = user_ids.get(link.doctor_key)
+        link.patient_id = user_ids.get(link.patient_key)
+        batch.append(link)
+        if len(batch) >= 2000:
+            DoctorPatient.objects.bulk_update(batch, ['doctor_key', 'patient_key', 'doctor', 'patient'])
+            batch = []
+    if batch:
+        DoctorPatient.objects.bulk_update(batch, ['doctor_key', 'patient_key', 'doctor', 'patient'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_doctorpatient'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctorpatient',
+            name='doctor',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='patient_links', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='doctorpatient',
+            name='doctor_key',
+            field=models.CharField(default='', max_length=150),
+        ),
+        migrations.AddField(
+            model_name='doctorpatient',
+            name='patient',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='doctor_links', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='doctorpatient',
+            name='patient_key',
+            field=models.CharField(default='', max_length=150),
+        ),
+        # Populate before the indexes exist, so the backfill doesn't maintain them row by row.
+        migrations.RunPython(link_users, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='doctorpatient',
+            index=models.Index(fields=['doctor', 'status'], name='api_dp_doctor_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctorpatient',
+            index=models.Index(fields=['patient', 'status'], name='api_dp_patient_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctorpatient',
+            index=models.Index(condition=models.Q(('patient__isnull', True)), fields=['patient_key'], name='api_dp_unlinked_patient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(django.db.models.functions.text.Lower('username'), name='api_user_username_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_doctorpatient_user_links'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(fields=['user', 'added_at'], name='api_med_user_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptomreport',
+            index=models.Index(fields=['user', 'created_at'], name='api_symptom_user_created_idx'),
+        ),
+    ]
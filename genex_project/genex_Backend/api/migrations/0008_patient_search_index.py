@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from api import search
+
+
+def create_index(apps, schema_editor):
+    search.create_index(schema_editor)
+
+
+def drop_index(apps, schema_editor):
+    search.drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+    """FTS5 table on SQLite, pg_trgm GIN index on PostgreSQL (see api/search.py)."""
+
+    dependencies = [
+        ('api', '0007_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_client_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctorpatient',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='doctorpatient',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='medicine',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='medicine',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='symptomreport',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='symptomreport',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(fields=['user', 'updated_at'], name='api_med_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='symptomreport',
+            index=models.Index(fields=['user', 'updated_at'], name='api_symptom_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from api.rollups import accumulate
+
+
+def backfill(apps, schema_editor):
+    SymptomReport = apps.get_model('api', 'SymptomReport')
+    SymptomWeeklyRollup = apps.get_model('api', 'SymptomWeeklyRollup')
+    rows = (SymptomReport.objects.filter(deleted_at__isnull=True).order_by('created_at', 'id')
+            .values_list('user_id', 'symptom_name', 'severity', 'frequency', 'created_at').iterator(chunk_size=2000))
+    SymptomWeeklyRollup.objects.bulk_create([
+        SymptomWeeklyRollup(user_id=user_id, symptom_name=name, week=week, **values)
+        for (user_id, name, week), values in accumulate(rows).items()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_sync_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SymptomWeeklyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symptom_name', models.CharField(max_length=100)),
+                ('week', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('severity_sum', models.IntegerField(default=0)),
+                ('max_severity', models.IntegerField(default=0)),
+                ('last_frequency', models.CharField(blank=True, default='', max_length=50)),
+                ('last_reported_at', models.DateTimeField(null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='symptom_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'week'], name='api_rollup_user_week_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'symptom_name', 'week'), name='api_rollup_user_symptom_week_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
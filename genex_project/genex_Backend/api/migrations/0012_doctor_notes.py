@@ -0,0 +1,68 @@
+# Generated by Django 5.2.8 on 2026-10-18 03:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+from api.models import NOTE_SEPARATOR, compose_notes, split_notes
+
+
+def move_notes_out(apps, schema_editor):
+    """Splits the doctor notes appended to SymptomReport.notes into DoctorNote rows."""
+    SymptomReport = apps.get_model('api', 'SymptomReport')
+    DoctorNote = apps.get_model('api', 'DoctorNote')
+
+    reports, notes = [], []
+    candidates = SymptomReport.objects.filter(
+        models.Q(notes__contains=NOTE_SEPARATOR) | models.Q(notes__startswith=NOTE_SEPARATOR.lstrip()))
+    for report in candidates.order_by('id').iterator(chunk_size=2000):
+        patient, doctor = split_notes(report.notes)
+        # Author and time weren't recorded; the report's last update is the best guess
+        notes += [DoctorNote(symptom_id=report.id, text=text, created_at=report.updated_at) for text in doctor]
+        report.notes = patient
+        reports.append(report)
+        if len(reports) >= 2000:
+            DoctorNote.objects.bulk_create(notes)
+            SymptomReport.objects.bulk_update(reports, ['notes'])
+            reports, notes = [], []
+    DoctorNote.objects.bulk_create(notes)
+    SymptomReport.objects.bulk_update(reports, ['notes'])
+
+
+def fold_notes_back(apps, schema_editor):
+    SymptomReport = apps.get_model('api', 'SymptomReport')
+    DoctorNote = apps.get_model('api', 'DoctorNote')
+
+    texts = {}
+    for symptom_id, text in DoctorNote.objects.order_by('created_at', 'id').values_list('symptom_id', 'text'):
+        texts.setdefault(symptom_id, []).append(text)
+    reports = list(SymptomReport.objects.filter(id__in=texts))
+    for report in reports:
+        report.notes = compose_notes(report.notes, texts[report.id])
+    SymptomReport.objects.bulk_update(reports, ['notes'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_symptom_weekly_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorNote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author_name', models.CharField(blank=True, default='', max_length=150)),
+                ('text', models.TextField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('author', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='authored_notes', to=settings.AUTH_USER_MODEL)),
+                ('symptom', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='doctor_notes', to='api.symptomreport')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['symptom', 'created_at'], name='api_note_symptom_created_idx')],
+            },
+        ),
+        migrations.RunPython(move_notes_out, fold_notes_back),
+    ]
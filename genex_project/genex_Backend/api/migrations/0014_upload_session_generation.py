@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='generation',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_upload_session_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='streaming',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_upload_session_streaming'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResponseVersion',
+            fields=[
+                ('user_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('token', models.CharField(max_length=32)),
+                ('modified', models.BigIntegerField()),
+            ],
+        ),
+    ]
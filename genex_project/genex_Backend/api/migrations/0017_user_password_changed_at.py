@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_response_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='password_changed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -1,7 +1,16 @@
+import uuid
+
+import numpy as np
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth import get_user_model
 
 from django.db import models
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+# Enables username__lower=... lookups, which can use the LOWER(username) index below
+# (username__iexact compiles to LIKE on SQLite and can't).
+models.CharField.register_lookup(Lower)
 
 class User(AbstractUser):
     ROLE_CHOICES = (
@@ -17,47 +26,327 @@ class User(AbstractUser):
     weight = models.FloatField(null=True, blank=True)  # Weight in kg
     height = models.FloatField(null=True, blank=True)  # Height in cm
     gender = models.CharField(max_length=10, null=True, blank=True)  # Gender (optional)
+    # Set by set_password; tokens without a version claim are refused once it is (api.authentication)
+    password_changed_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(Lower('username'), name='api_user_username_lower_idx'),
+        ]
 
-   
     def __str__(self):
         return f"{self.username} ({self.role})"
+
+    def set_password(self, raw_password):
+        super().set_password(raw_password)
+        self.password_changed_at = timezone.now()
     
     # FileUpload model to store files associated with the user
 class FileUpload(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)  # Link file to a user (patient)
     file = models.FileField(upload_to='uploads/')  # File upload path
     uploaded_at = models.DateTimeField(auto_now_add=True)  # Timestamp when file is uploaded
+    # Expression tables uploaded through UploadSession: gene/probe ids, one per line,
+    # in the order of every ExpressionSample's values
+    genes = models.FileField(upload_to='uploads/expression/', blank=True)
 
     def __str__(self):
         return f"File uploaded by {self.user.username} at {self.uploaded_at}"
 
+
+class ExpressionSample(models.Model):
+    """One sample (column) of an uploaded expression table, as a float32 .npy vector."""
+    upload = models.ForeignKey(FileUpload, on_delete=models.CASCADE, related_name='samples')
+    name = models.CharField(max_length=255)  # column header, e.g. a GSM accession
+    position = models.PositiveIntegerField()  # column index in the table
+    values = models.FileField(upload_to='uploads/expression/', max_length=255)
+
+    class Meta:
+        ordering = ['position']
+        constraints = [
+            models.UniqueConstraint(fields=['upload', 'position'], name='api_expr_sample_upload_pos_uniq'),
+        ]
+
+    def load(self, mmap_mode='r'):
+        return np.load(self.values.path, mmap_mode=mmap_mode)
+
+
+class UploadSession(models.Model):
+    """
+    A chunked, resumable upload (api/uploads.py). Chunks are appended in
+    order at `received`; the expression table is parsed as they arrive and
+    the FileUpload is created when the last byte is in.
+    """
+    STATUS_CHOICES = (
+        ('open', 'Open'),
+        ('complete', 'Complete'),
+        ('failed', 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()  # total bytes announced by the client
+    received = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open')
+    error = models.TextField(blank=True)
+    generation = models.UUIDField(null=True, editable=False)  # new for every parser, names its directory
+    streaming = models.BooleanField(default=True)  # False: parsed once from the stored file after the last chunk
+    gene_count = models.PositiveIntegerField(default=0)  # set when complete
+    sample_count = models.PositiveIntegerField(default=0)
+    upload = models.OneToOneField(FileUpload, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='session')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload {self.id} of {self.filename} ({self.received}/{self.size}, {self.status})"
+
 User= get_user_model()
-class Medicine(models.Model):
+
+
+class LiveManager(models.Manager):
+    """Default manager of SyncedModel: hides soft-deleted rows."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class SyncedModel(models.Model):
+    """
+    Rows the app keeps an offline copy of, served incrementally by /api/sync/.
+    updated_at moves on every save. delete() only stamps deleted_at, leaving a
+    tombstone that sync reports to clients (purge_tombstones removes old ones).
+    QuerySet.delete() and QuerySet.update() bypass this: they hard-delete, and
+    update() must set updated_at itself.
+    """
+    updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()  # includes tombstones
+
+    class Meta:
+        abstract = True
+
+    def delete(self, using=None, keep_parents=False):
+        self.deleted_at = timezone.now()
+        self.save(using=using, update_fields=['deleted_at', 'updated_at'])
+        return 1, {self._meta.label: 1}
+
+    def hard_delete(self, using=None, keep_parents=False):
+        return super().delete(using=using, keep_parents=keep_parents)
+
+
+class Medicine(SyncedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='medicines')
     name = models.CharField(max_length=100)
     added_at = models.DateTimeField(auto_now_add=True)
+    # Idempotency key chosen by the app, so retried uploads don't duplicate rows
+    client_id = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Serves the per-user list and its (added_at, id) cursor pages
+            models.Index(fields=['user', 'added_at'], name='api_med_user_added_idx'),
+            models.Index(fields=['user', 'updated_at'], name='api_med_user_updated_idx'),  # sync
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'client_id'], condition=models.Q(client_id__isnull=False),
+                                    name='api_med_user_client_id_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.name} for {self.user.username}"
 
 
-class SymptomReport(models.Model):
+class SymptomReport(SyncedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="symptoms")
     symptom_name = models.CharField(max_length=100)
     severity = models.IntegerField()  # 0 to 10 scale
     frequency = models.CharField(max_length=50) 
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Idempotency key chosen by the app, so retried uploads don't duplicate rows
+    client_id = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Serves the per-user history and its (created_at, id) cursor pages
+            models.Index(fields=['user', 'created_at'], name='api_symptom_user_created_idx'),
+            models.Index(fields=['user', 'updated_at'], name='api_symptom_user_updated_idx'),  # sync
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'client_id'], condition=models.Q(client_id__isnull=False),
+                                    name='api_symptom_user_client_id_uniq'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.symptom_name} ({self.severity}/10)"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the weekly rollup last saw of this report (see api.rollups)
+        instance._rollup_state = rollup_state(instance)
+        return instance
+
+    @property
+    def full_notes(self):
+        """
+        The patient's notes followed by the doctors' notes, in the text format
+        add_doctor_note used to write into `notes`. Prefetch doctor_notes
+        (ordered by created_at, id) when reading many reports.
+        """
+        return compose_notes(self.notes, [note.text for note in self.doctor_notes.all()])
+
+
+# Doctor notes used to be appended to SymptomReport.notes as "<notes>\n\n Doctor: <note>"
+NOTE_SEPARATOR = '\n\n Doctor: '
+
+
+def compose_notes(notes, doctor_notes):
+    for text in doctor_notes:
+        notes = f"{notes or ''}{NOTE_SEPARATOR}{text}".strip()
+    return notes
+
+
+def split_notes(notes):
+    """Inverse of compose_notes: (patient notes, [doctor notes])."""
+    parts = (notes or '').split(NOTE_SEPARATOR)
+    patient, doctor = parts[0], parts[1:]
+    if patient.startswith(NOTE_SEPARATOR.lstrip()):  # the first note, added to empty notes
+        doctor.insert(0, patient[len(NOTE_SEPARATOR.lstrip()):])
+        patient = ''
+    return patient, doctor
+
+
+def rollup_state(report):
+    """The SymptomReport fields SymptomWeeklyRollup depends on (None where deferred)."""
+    return tuple(report.__dict__.get(name) for name in
+                 ('user_id', 'symptom_name', 'severity', 'frequency', 'created_at', 'deleted_at'))
+
+
+class DoctorNote(models.Model):
+    """A doctor's note on a symptom report. Notes are only ever inserted."""
+    # No single-column FK index: the (symptom, created_at) index covers it
+    symptom = models.ForeignKey(SymptomReport, on_delete=models.CASCADE, db_index=False, related_name='doctor_notes')
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='authored_notes')
+    author_name = models.CharField(max_length=150, blank=True, default='')  # kept for display if the author is deleted
+    text = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)  # not auto_now_add: migrated notes keep their report's time
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['symptom', 'created_at'], name='api_note_symptom_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Note by {self.author_name} on symptom {self.symptom_id}"
+
+
+def doctor_notes_prefetch():
+    """prefetch_related() argument for SymptomReport.full_notes, in note order."""
+    return models.Prefetch('doctor_notes', queryset=DoctorNote.objects.order_by('created_at', 'id'))
+
+
+class SymptomWeeklyRollup(models.Model):
+    """
+    Per patient, symptom and week (starting Monday, TIME_ZONE): how often it
+    was reported and how severe. Maintained by api.rollups from SymptomReport
+    saves and deletes; `manage.py backfill_symptom_rollups` rebuilds it.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='symptom_rollups')
+    symptom_name = models.CharField(max_length=100)
+    week = models.DateField()
+    count = models.IntegerField(default=0)
+    severity_sum = models.IntegerField(default=0)  # mean = severity_sum / count
+    max_severity = models.IntegerField(default=0)
+    last_frequency = models.CharField(max_length=50, blank=True, default='')
+    last_reported_at = models.DateTimeField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'symptom_name', 'week'], name='api_rollup_user_symptom_week_uniq'),
+        ]
+        indexes = [
+            # Serves the trends read: one patient, a range of weeks, all symptoms
+            models.Index(fields=['user', 'week'], name='api_rollup_user_week_idx'),
+        ]
+
+    @property
+    def mean_severity(self):
+        return self.severity_sum / self.count if self.count else None
+
+    def __str__(self):
+        return f"{self.user_id} - {self.symptom_name} week of {self.week} ({self.count})"
     
-class DoctorPatient(models.Model):
-    # These match your screenshot columns
+class DoctorPatient(SyncedModel):
+    # Linked users. patient is null while the request names a username that
+    # hasn't signed up yet; signup attaches it (see attach_pending_links).
+    # No single-column FK indexes: the (doctor, status) / (patient, status) indexes cover them.
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, null=True, db_index=False, related_name='patient_links')
+    patient = models.ForeignKey(User, on_delete=models.CASCADE, null=True, db_index=False, related_name='doctor_links')
+
+    # These match your screenshot columns (kept as entered, for display)
     doctor_username = models.CharField(max_length=150)
     patient_username = models.CharField(max_length=150)
-    status = models.CharField(max_length=20, default='pending') # pending, confirmed, declined
+    # Case-folded usernames, so lookups are plain equality and can use an index
+    doctor_key = models.CharField(max_length=150, default='')
+    patient_key = models.CharField(max_length=150, default='')
+
+    status = models.CharField(max_length=20, default='pending') # pending, accepted, rejected
     appointment_date = models.CharField(max_length=50, null=True, blank=True) # Text column
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'status'], name='api_dp_doctor_status_idx'),
+            models.Index(fields=['patient', 'status'], name='api_dp_patient_status_idx'),
+            models.Index(fields=['patient_key'], condition=models.Q(patient__isnull=True),
+                         name='api_dp_unlinked_patient_idx'),
+        ]
+
+    @staticmethod
+    def lookup_key(username):
+        return (username or '').strip().lower()
+
+    def fill_keys(self):
+        """Sets the case-folded keys (and usernames from linked users). save() calls this; bulk_create doesn't."""
+        if self.doctor_id and not self.doctor_username:
+            self.doctor_username = self.doctor.username
+        if self.patient_id and not self.patient_username:
+            self.patient_username = self.patient.username
+        self.doctor_key = self.lookup_key(self.doctor_username)
+        self.patient_key = self.lookup_key(self.patient_username)
+
+    def save(self, *args, **kwargs):
+        self.fill_keys()
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def attach_pending_links(cls, user):
+        """Links requests that were sent to `user`'s username before the account existed."""
+        from .caching import bump_user_versions
+        pending = cls.objects.filter(patient__isnull=True, patient_key=cls.lookup_key(user.username))
+        doctor_ids = list(pending.values_list('doctor_id', flat=True))
+        if not doctor_ids:
+            return 0
+        linked = pending.update(patient=user, updated_at=timezone.now())
+        bump_user_versions(doctor_ids + [user.id])  # update() sends no signals
+        return linked
+
+    def __str__(self):
+        return f"{self.doctor_username} -> {self.patient_username} ({self.status})"
+
+class ResponseVersion(models.Model):
+    """
+    Per-user validator for conditional GETs (api/caching.py) when the
+    response cache is off: bumped with the data it describes, in the same
+    transaction. Not a foreign key: deleting a user bumps its version too.
+    """
+    user_id = models.BigIntegerField(primary_key=True)
+    token = models.CharField(max_length=32)
+    modified = models.BigIntegerField()  # epoch seconds, for Last-Modified
+
     def __str__(self):
-        return f"{self.doctor_username} -> {self.patient_username} ({self.status})"
\ No newline at end of file
+        return f"Response version {self.token} of user {self.user_id}"
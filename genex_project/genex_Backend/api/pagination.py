@@ -0,0 +1,91 @@
+import json
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class OptionalCursorPagination(CursorPagination):
+    """
+    Keyset (cursor) pagination that only kicks in when the client asks for it
+    with ?page_size= or ?cursor=. Without either, the view returns the plain
+    list the existing Flutter screens expect.
+
+    Pages are fetched with WHERE (created_at, id) < (last seen values) on the
+    ordering below, so cost doesn't grow with how deep the client has scrolled
+    (unlike LIMIT/OFFSET). DRF's CursorPagination only filters on the first
+    ordering field and steps over ties with an offset; here the cursor holds
+    every ordering field, so rows sharing a timestamp are still a keyset seek.
+    The ordering must be unique (end it with id).
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        # CursorPagination.paginate_queryset, with the keyset filter on all fields
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, position = self.cursor or (0, False, None)
+
+        queryset = queryset.order_by(*(_reverse_ordering(self.ordering) if reverse else self.ordering))
+        if position is not None:
+            queryset = queryset.filter(self._after(position, reverse))
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following = None
+        if len(results) > len(self.page):
+            following = self._get_position_from_instance(results[-1], self.ordering)
+        seeked = position is not None or offset > 0
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = seeked, following is not None
+            self.next_position, self.previous_position = position, following
+        else:
+            self.has_next, self.has_previous = following is not None, seeked
+            self.next_position, self.previous_position = following, position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _after(self, position, reverse):
+        """Rows past `position` in the (possibly reversed) ordering: a lexicographic comparison on every field."""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message) from None
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        fields = [order.lstrip('-') for order in self.ordering]
+        terms = []
+        for i, order in enumerate(self.ordering):
+            lookup = 'lt' if reverse != order.startswith('-') else 'gt'
+            terms.append(Q(**dict(zip(fields[:i], values[:i])), **{f'{fields[i]}__{lookup}': values[i]}))
+        return reduce(or_, terms)
+
+    def _get_position_from_instance(self, instance, ordering):
+        fields = [order.lstrip('-') for order in ordering]
+        if isinstance(instance, dict):
+            return json.dumps([str(instance[field]) for field in fields])
+        return json.dumps([str(getattr(instance, field)) for field in fields])
+
+
+class MedicinePagination(OptionalCursorPagination):
+    ordering = ('-added_at', '-id')
+
+
+class PatientSearchPagination(OptionalCursorPagination):
+    # username is unique, so it's a complete keyset on its own
+    ordering = ('username',)
@@ -0,0 +1,180 @@
+"""
+Weekly symptom rollups (SymptomWeeklyRollup) behind the doctor trends chart.
+
+- A new report adds itself to its week's row with one UPDATE of F()
+  expressions (count + 1, severity_sum + severity, max, last frequency);
+  concurrent posts can't lose increments.
+- An edited, soft-deleted or deleted report can't be subtracted out (max and
+  last frequency aren't reversible), so the affected week is rebuilt from
+  the reports in it: an indexed read over (user, created_at) and an upsert.
+- bulk_create sends no signals: callers pass the rows to refresh(), which
+  rebuilds all weeks the batch touched in the same two statements.
+
+api.signals connects report_saved/report_deleted. Writes that skip signals
+(QuerySet.update/delete, raw SQL) need `manage.py backfill_symptom_rollups`.
+"""
+import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import SymptomReport, SymptomWeeklyRollup, rollup_state
+
+
+def week_of(moment):
+    """Monday of the week `moment` falls in, in the current time zone."""
+    day = timezone.localdate(moment)
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def _week_bounds(week):
+    start = timezone.make_aware(datetime.datetime.combine(week, datetime.time.min))
+    return start, start + datetime.timedelta(days=7)
+
+
+def accumulate(rows):
+    """
+    Rollup values from (user_id, symptom_name, severity, frequency, created_at)
+    tuples in created_at order: {(user_id, symptom_name, week): dict}.
+    Plain data in and out, so migrations can use it with historical models.
+    """
+    buckets = {}
+    for user_id, name, severity, frequency, created_at in rows:
+        bucket = buckets.setdefault((user_id, name, week_of(created_at)), {
+            'count': 0, 'severity_sum': 0, 'max_severity': severity,
+        })
+        bucket['count'] += 1
+        bucket['severity_sum'] += severity
+        bucket['max_severity'] = max(bucket['max_severity'], severity)
+        bucket['last_frequency'] = frequency
+        bucket['last_reported_at'] = created_at
+    return buckets
+
+
+# --- Incremental maintenance ---
+
+def add(report):
+    """Counts a newly created report into its week."""
+    key = {'user_id': report.user_id, 'symptom_name': report.symptom_name, 'week': week_of(report.created_at)}
+    changes = {
+        'count': F('count') + 1,
+        'severity_sum': F('severity_sum') + report.severity,
+        'max_severity': Greatest('max_severity', Value(report.severity)),
+        'last_frequency': report.frequency,
+        'last_reported_at': report.created_at,
+    }
+    if SymptomWeeklyRollup.objects.filter(**key).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            SymptomWeeklyRollup.objects.create(
+                **key, count=1, severity_sum=report.severity, max_severity=report.severity,
+                last_frequency=report.frequency, last_reported_at=report.created_at,
+            )
+    except IntegrityError:
+        # Another request created the row in the meantime
+        SymptomWeeklyRollup.objects.filter(**key).update(**changes)
+
+
+def refresh_weeks(keys):
+    """
+    Rebuilds the rollup rows of the given (user_id, symptom_name, week) keys
+    from the live reports in them: one read of those reports and one upsert,
+    however many keys.
+    """
+    keys = set(keys)
+    if not keys:
+        return
+    start, _ = _week_bounds(min(week for _, _, week in keys))
+    _, end = _week_bounds(max(week for _, _, week in keys))
+    rows = (SymptomReport.objects
+            .filter(user_id__in={k[0] for k in keys}, symptom_name__in={k[1] for k in keys},
+                    created_at__gte=start, created_at__lt=end)
+            .order_by('created_at', 'id')
+            .values_list('user_id', 'symptom_name', 'severity', 'frequency', 'created_at'))
+    buckets = {key: values for key, values in accumulate(rows).items() if key in keys}
+
+    SymptomWeeklyRollup.objects.bulk_create(
+        [SymptomWeeklyRollup(user_id=user_id, symptom_name=name, week=week, **values)
+         for (user_id, name, week), values in buckets.items()],
+        update_conflicts=True, unique_fields=['user', 'symptom_name', 'week'],
+        update_fields=['count', 'severity_sum', 'max_severity', 'last_frequency', 'last_reported_at'],
+    )
+    for user_id, name, week in keys - buckets.keys():  # no reports left in that week
+        SymptomWeeklyRollup.objects.filter(user_id=user_id, symptom_name=name, week=week).delete()
+
+
+def refresh(reports):
+    """Rebuilds every week the given reports fall in (after bulk writes)."""
+    refresh_weeks((r.user_id, r.symptom_name, week_of(r.created_at)) for r in reports)
+
+
+def report_saved(report, created):
+    current = rollup_state(report)
+    previous = getattr(report, '_rollup_state', None)
+    report._rollup_state = current
+    if created:
+        if report.deleted_at is None:
+            add(report)
+        return
+    if previous == current:
+        return  # e.g. a doctor note: nothing the rollup depends on changed
+
+    # Both the week the report was in and the one it is in now (symptom renamed)
+    refresh_weeks(
+        (user_id, symptom_name, week_of(created_at))
+        for user_id, symptom_name, _, _, created_at, _ in filter(None, (current, previous))
+        if None not in (user_id, symptom_name, created_at)
+    )
+
+
+def report_deleted(report):
+    refresh([report])
+
+
+# --- Backfill ---
+
+def rebuild(user_ids=None, batch_size=2000):
+    """Recreates the rollups of `user_ids` (all users when None) from their reports. Returns rows written."""
+    rollups = SymptomWeeklyRollup.objects.all()
+    reports = SymptomReport.objects.all()
+    if user_ids is not None:
+        rollups = rollups.filter(user_id__in=user_ids)
+        reports = reports.filter(user_id__in=user_ids)
+
+    rows = reports.order_by('created_at', 'id').values_list(
+        'user_id', 'symptom_name', 'severity', 'frequency', 'created_at').iterator(chunk_size=batch_size)
+    buckets = accumulate(rows)
+    with transaction.atomic():
+        rollups.delete()
+        SymptomWeeklyRollup.objects.bulk_create([
+            SymptomWeeklyRollup(user_id=user_id, symptom_name=name, week=week, **values)
+            for (user_id, name, week), values in buckets.items()
+        ], batch_size=batch_size)
+    return len(buckets)
+
+
+# --- Read ---
+
+def trends(user_id, weeks, symptom_name=None, today=None):
+    """
+    {symptom_name: [{week, count, mean_severity, max_severity, last_frequency}, ...]}
+    for the last `weeks` weeks (the current one included), oldest week first.
+    """
+    first_week = week_of(today or timezone.now()) - datetime.timedelta(weeks=weeks - 1)
+    rows = SymptomWeeklyRollup.objects.filter(user_id=user_id, week__gte=first_week)
+    if symptom_name:
+        rows = rows.filter(symptom_name=symptom_name)
+
+    series = {}
+    for row in rows.order_by('symptom_name', 'week'):
+        series.setdefault(row.symptom_name, []).append({
+            "week": row.week,
+            "count": row.count,
+            "mean_severity": round(row.mean_severity, 2),
+            "max_severity": row.max_severity,
+            "last_frequency": row.last_frequency,
+        })
+    return series
@@ -0,0 +1,159 @@
+"""
+Patient search index (username, first name, email), ranked and prefix-capable.
+
+- SQLite: an FTS5 table, api_user_search, keyed by user id (rowid). Only
+  patients are indexed. Each search term is matched as a token prefix and
+  results are ranked by bm25.
+- PostgreSQL: a pg_trgm GIN index on the lower-cased search text. Substring
+  matches are served by the index and ranked by trigram similarity.
+- Short queries (no term of MIN_RANKED_TERM letters) are ordered by username
+  instead, usernames starting with the first term first.
+- Other backends fall back to username__icontains.
+
+Migration 0008 creates and fills the index. api.signals keeps it in sync on
+user save/delete. Bulk writes that skip signals (bulk_create, update())
+must call index_users() themselves, or run `manage.py rebuild_search_index`.
+"""
+import re
+
+from django.db import connection
+
+FTS_TABLE = 'api_user_search'
+TRGM_INDEX = 'api_user_search_trgm'
+DEFAULT_LIMIT = 50
+
+# bm25 scores every match before LIMIT applies; a 1-2 letter prefix can match
+# most of the table (~300 ms at 1M patients), and trigram similarity says
+# nothing about terms shorter than a trigram. Such queries are ordered by
+# username (prefix matches first) instead. From 3 letters on, ranking costs a
+# few ms.
+MIN_RANKED_TERM = 3
+
+# Expression the PostgreSQL trigram index is built on; queries must repeat it verbatim.
+PG_SEARCH_TEXT = "lower(username || ' ' || first_name || ' ' || email)"
+
+
+def _terms(query):
+    return re.findall(r'\w+', (query or '').lower())
+
+
+def _prefix_pattern(term):
+    """LIKE pattern for values starting with `term`. Terms are word characters, so _ is the only wildcard."""
+    return term.replace('_', '\\_') + '%'
+
+
+# --- Schema (used by migration 0008) ---
+
+def create_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        # Emails tokenize into parts (jane.doe@genex.test -> jane, doe, genex, test);
+        # the prefix indexes keep 1-3 character prefix queries (first keystrokes) fast.
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(username, first_name, email, prefix='1 2 3')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, username, first_name, email) "
+            "SELECT id, username, first_name, email FROM api_user WHERE role = 'patient'"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TRGM_INDEX} ON api_user "
+            f"USING gin (({PG_SEARCH_TEXT}) gin_trgm_ops) WHERE role = 'patient'"
+        )
+
+
+def drop_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {TRGM_INDEX}")
+
+
+_fts_ready = False
+
+
+def _has_fts_table():
+    # Only a positive answer is cached, so a later migrate in this process is picked up.
+    global _fts_ready
+    if not _fts_ready:
+        _fts_ready = FTS_TABLE in connection.introspection.table_names()
+    return _fts_ready
+
+
+# --- Sync ---
+
+def index_users(users):
+    """(Re)indexes the given users. Non-patients are removed from the index."""
+    if connection.vendor != 'sqlite' or not _has_fts_table():
+        return  # PostgreSQL's expression index maintains itself
+    users = list(users)
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(u.id,) for u in users])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE}(rowid, username, first_name, email) VALUES (%s, %s, %s, %s)",
+            [(u.id, u.username, u.first_name, u.email) for u in users if u.role == 'patient'],
+        )
+
+
+def remove_users(user_ids):
+    if connection.vendor != 'sqlite' or not _has_fts_table():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(i,) for i in user_ids])
+
+
+def rebuild_index():
+    if connection.vendor != 'sqlite' or not _has_fts_table():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, username, first_name, email) "
+            "SELECT id, username, first_name, email FROM api_user WHERE role = 'patient'"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+# --- Query ---
+
+def search_patient_ids(query, limit=DEFAULT_LIMIT):
+    """Ids of patients matching `query`, best match first."""
+    terms = _terms(query)
+    if not terms:
+        return []
+    ranked = max(map(len, terms)) >= MIN_RANKED_TERM
+
+    if connection.vendor == 'sqlite' and _has_fts_table():
+        # Every term must match as a token prefix: "jan doe" -> "jan"* AND "doe"*
+        match = ' '.join(f'"{term}"*' for term in terms)
+        if ranked:
+            order, params = 'rank', []
+        else:
+            order, params = "username NOT LIKE %s ESCAPE '\\', username", [_prefix_pattern(terms[0])]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY {order} LIMIT %s",
+                [match, *params, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    if connection.vendor == 'postgresql':
+        if ranked:
+            order, params = f"similarity({PG_SEARCH_TEXT}, %s) DESC, id", [' '.join(terms)]
+        else:
+            order, params = "lower(username) NOT LIKE %s, username", [_prefix_pattern(terms[0])]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM api_user WHERE role = 'patient' AND {PG_SEARCH_TEXT} LIKE %s "
+                f"ORDER BY {order} LIMIT %s",
+                ['%' + '%'.join(terms) + '%', *params, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    from .models import User
+    return list(User.objects.filter(role='patient', username__icontains=query)
+                .order_by('username').values_list('id', flat=True)[:limit])
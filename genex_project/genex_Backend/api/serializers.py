@@ -7,6 +7,30 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import DoctorPatient
 User = get_user_model()
+
+
+class SparseFieldsetMixin:
+    """
+    Lets clients ask for a subset of fields with ?fields=id,name (comma-separated).
+    Unknown names are ignored; without the parameter every field is returned.
+    Only applies to reads, so writes still validate the full serializer.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        requested = request.query_params.get('fields')
+        if not requested:
+            return
+        wanted = {name.strip() for name in requested.split(',')}
+        if not wanted & set(self.fields):
+            return
+        for name in set(self.fields) - wanted:
+            self.fields.pop(name)
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -24,7 +48,7 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'email', 'role', 'first_name']
 
 # ✅ ADD THIS CLASS
-class PatientSerializer(serializers.ModelSerializer):
+class PatientSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         # These are the fields the Flutter app will receive
@@ -37,17 +61,25 @@ class PatientSerializer(serializers.ModelSerializer):
             'gender',
             'weight',
             'height',]
-class MedicineSerializer(serializers.ModelSerializer):
+class MedicineSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Medicine
-        fields = ['id', 'name', 'added_at']
+        fields = ['id', 'name', 'added_at', 'client_id']
         read_only_fields = ['id', 'added_at']
+        extra_kwargs = {'client_id': {'allow_blank': False}}  # "" would collide as a key
 
-class SymptomReportSerializer(serializers.ModelSerializer):
+class SymptomReportSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = SymptomReport
-        fields = ['id', 'symptom_name', 'severity', 'frequency', 'notes', 'created_at']
+        fields = ['id', 'symptom_name', 'severity', 'frequency', 'notes', 'created_at', 'client_id']
         read_only_fields = ['id', 'created_at']
+        extra_kwargs = {'client_id': {'allow_blank': False}}  # "" would collide as a key
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'notes' in data:
+            data['notes'] = instance.full_notes  # the patient's notes + doctor notes, as one text
+        return data
 
 class DoctorPatientSerializer(serializers.ModelSerializer):
     class Meta:
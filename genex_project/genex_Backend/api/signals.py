@@ -0,0 +1,72 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import rollups, search
+from .authentication import user_cache
+from .caching import bump_user_versions
+from .models import DoctorNote, DoctorPatient, Medicine, SymptomReport, User
+
+
+# --- Patient search index ---
+
+SEARCH_FIELDS = {'username', 'first_name', 'email', 'role'}
+
+
+@receiver(post_save, sender=User, dispatch_uid='api_user_search_save')
+def index_user(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return  # e.g. last_login updates
+    search.index_users([instance])
+
+
+@receiver(post_delete, sender=User, dispatch_uid='api_user_search_delete')
+def unindex_user(sender, instance, **kwargs):
+    search.remove_users([instance.id])
+
+
+# --- Weekly symptom rollups ---
+
+@receiver(post_save, sender=SymptomReport, dispatch_uid='api_symptom_rollup_save')
+def roll_up_report(sender, instance, created, **kwargs):
+    rollups.report_saved(instance, created)
+
+
+@receiver(post_delete, sender=SymptomReport, dispatch_uid='api_symptom_rollup_delete')
+def roll_up_deleted_report(sender, instance, **kwargs):
+    rollups.report_deleted(instance)
+
+
+# --- Per-user response cache / ETag invalidation ---
+
+@receiver([post_save, post_delete], sender=User, dispatch_uid='api_user_version_user')
+def bump_user(sender, instance, **kwargs):
+    bump_user_versions([instance.id])
+
+
+@receiver([post_save, post_delete], sender=Medicine, dispatch_uid='api_user_version_medicine')
+@receiver([post_save, post_delete], sender=SymptomReport, dispatch_uid='api_user_version_symptom')
+def bump_owner(sender, instance, **kwargs):
+    bump_user_versions([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=DoctorNote, dispatch_uid='api_user_version_note')
+def touch_noted_report(sender, instance, **kwargs):
+    # Notes are part of the report as the patient sees it: move updated_at for /sync/.
+    # A single-column UPDATE, not a rewrite of the row.
+    report = SymptomReport.all_objects.filter(id=instance.symptom_id)
+    report.update(updated_at=timezone.now())
+    bump_user_versions(report.values_list('user_id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=DoctorPatient, dispatch_uid='api_user_version_link')
+def bump_link_users(sender, instance, **kwargs):
+    bump_user_versions([instance.doctor_id, instance.patient_id])
+
+
+# --- Cached JWT user resolution ---
+
+@receiver([post_save, post_delete], sender=User, dispatch_uid='api_auth_user_cache')
+def drop_cached_user(sender, instance, **kwargs):
+    if user_cache is not None:
+        user_cache.invalidate(instance.id)
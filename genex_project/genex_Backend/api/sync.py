@@ -0,0 +1,88 @@
+"""
+Delta sync for the mobile app (GET /api/sync/?since=<cursor>).
+
+Without `since` the response holds the user's full state. With a cursor from
+an earlier response it holds only the medicines, symptom reports and doctor
+links created, updated or deleted (tombstones) since then, plus a new cursor.
+
+The cursor is the server time the previous response was built at (opaque to
+clients). Rows are selected with updated_at >= cursor - OVERLAP_SECONDS: a
+transaction that stamped updated_at before the cursor but committed after the
+previous read would otherwise never be sent. Clients therefore see some rows
+twice and must apply changes as upserts by id.
+
+Tombstones older than TOMBSTONE_DAYS are purged (manage.py purge_tombstones);
+a cursor older than that gets a full response ("full": true) and the client
+must replace its local copy.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DoctorPatient, Medicine, SymptomReport, doctor_notes_prefetch
+
+OPTIONS = getattr(settings, 'API_SYNC', {})
+OVERLAP_SECONDS = OPTIONS.get('OVERLAP_SECONDS', 5)
+TOMBSTONE_DAYS = OPTIONS.get('TOMBSTONE_DAYS', 90)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(moment):
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def decode_cursor(cursor):
+    try:
+        return datetime.fromtimestamp(int(cursor) / 1_000_000, tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError) as e:
+        raise InvalidCursor(f"Invalid sync cursor: {cursor!r}") from e
+
+
+def _changes(queryset, since):
+    """(live rows, ids of deleted rows) of `queryset` changed since `since` (None: all live rows)."""
+    if since is None:
+        return list(queryset.filter(deleted_at__isnull=True)), []
+    updated, deleted = [], []
+    for row in queryset.filter(updated_at__gte=since):
+        if row.deleted_at is None:
+            updated.append(row)
+        else:
+            deleted.append(row.id)
+    return updated, deleted
+
+
+def collect(user, cursor=None, now=None):
+    """
+    Changes visible to `user` since `cursor`, as a dict:
+    cursor, full, medicines, symptoms, links -- each of the last three an
+    (updated rows, deleted ids) pair. Raises InvalidCursor.
+    """
+    now = now or timezone.now()
+    since = None
+    if cursor:
+        since = decode_cursor(cursor) - timedelta(seconds=OVERLAP_SECONDS)
+        if since < now - timedelta(days=TOMBSTONE_DAYS):
+            since = None  # tombstones may be gone: start over
+
+    return {
+        'cursor': encode_cursor(now),
+        'full': since is None,
+        'medicines': _changes(Medicine.all_objects.filter(user=user).order_by('id'), since),
+        'symptoms': _changes(SymptomReport.all_objects.filter(user=user).order_by('id')
+                             .prefetch_related(doctor_notes_prefetch()), since),
+        'links': _changes(DoctorPatient.all_objects.filter(Q(patient=user) | Q(doctor=user)).order_by('id'), since),
+    }
+
+
+def purge_tombstones(days=None):
+    """Hard-deletes rows soft-deleted more than `days` (default TOMBSTONE_DAYS) ago."""
+    cutoff = timezone.now() - timedelta(days=TOMBSTONE_DAYS if days is None else days)
+    return {
+        model._meta.label: model.all_objects.filter(deleted_at__lt=cutoff).delete()[0]
+        for model in (Medicine, SymptomReport, DoctorPatient)
+    }
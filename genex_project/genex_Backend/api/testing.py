@@ -0,0 +1,81 @@
+"""
+Per-endpoint SQL query budgets for the API tests.
+
+A test case mixing in QueryBudgetMixin declares `query_budgets`, the most
+queries each (method, route) may run, and sends requests through
+request_within_budget(). The request fails the test if it runs more queries
+than its budget (the message lists the SQL) or if the route has no budget.
+Routes are URL patterns as reported by /metrics, e.g.
+'api/doctor/patient-records/<int:patient_id>/' or 'api/medicines/$'.
+
+Requests are measured with cold caches (no cached JWT user, no cached
+payloads), so a budget is the worst case rather than depending on test
+order. unbudgeted_routes() lists api routes nobody has declared a budget
+for, so a new endpoint can't skip the check.
+
+auth_headers() is the JWT Authorization header the API tests send as a
+given user.
+"""
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver
+
+from . import caching
+from .authentication import user_cache
+from .views import get_tokens_for_user
+
+
+def bearer(user):
+    """Authorization header value with a fresh access token for `user`."""
+    return f"Bearer {get_tokens_for_user(user)['access']}"
+
+
+def auth_headers(user):
+    """Client request kwargs authenticating as `user`, e.g. client.get(path, **auth_headers(user))."""
+    return {'HTTP_AUTHORIZATION': bearer(user)}
+
+
+def reset_caches():
+    """Drops the cached JWT users and per-user response payloads/versions."""
+    if user_cache is not None:
+        user_cache.clear()
+    if caching.options() is not None:
+        caches[caching.options().get('ALIAS', 'default')].clear()
+
+
+def api_routes(prefix='api/', urlconf=None):
+    """Route patterns under `prefix`, without DRF's format-suffix (.json) variants."""
+    def walk(patterns, base):
+        for pattern in patterns:
+            route = base + str(pattern.pattern).removeprefix('^')  # joined like ResolverMatch.route
+            if isinstance(pattern, URLResolver):
+                yield from walk(pattern.url_patterns, route)
+            elif isinstance(pattern, URLPattern) and 'format' not in pattern.pattern.regex.groupindex:
+                yield route
+
+    return sorted({route for route in walk(get_resolver(urlconf).url_patterns, '') if route.startswith(prefix)})
+
+
+def unbudgeted_routes(budgets, prefix='api/', urlconf=None):
+    budgeted = {route for _, route in budgets}
+    return [route for route in api_routes(prefix, urlconf) if route not in budgeted]
+
+
+class QueryBudgetMixin:
+    """TestCase mixin; set query_budgets = {(method, route): max_queries}."""
+    query_budgets = {}
+
+    def request_within_budget(self, method, path, **kwargs):
+        reset_caches()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method.lower())(path, **kwargs)
+
+        route = response.resolver_match.route
+        budget = self.query_budgets.get((method.upper(), route))
+        if budget is None:
+            self.fail(f"No query budget declared for {method.upper()} {route}")
+        if len(queries) > budget:
+            sql = '\n'.join(f'{i}. {q["sql"]}' for i, q in enumerate(queries.captured_queries, 1))
+            self.fail(f"{method.upper()} {path} ({route}) ran {len(queries)} queries, budget is {budget}:\n{sql}")
+        return response
@@ -1,3 +1,979 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import QuerySet
+from django.test import AsyncClient, Client, LiveServerTestCase, SimpleTestCase, TestCase, TransactionTestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import loadtest, uploads
+from .authentication import UserCache
+from .expression import ExpressionFormatError, ExpressionParser, sample_filename
+from .testing import QueryBudgetMixin, auth_headers, bearer, unbudgeted_routes
+from .models import DoctorNote, DoctorPatient, Medicine, SymptomReport, SymptomWeeklyRollup, User
+from .models import ExpressionSample, FileUpload, UploadSession
+from .models import compose_notes, split_notes
+
+# The payload cache is off in settings (the default cache is per process)
+RESPONSE_CACHE = {'ALIAS': 'default', 'TTL': 300}
+
+
+class LoadTestCommandTests(LiveServerTestCase):
+    def test_seeds_runs_and_compares_against_baseline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = os.path.join(tmp, 'baseline.json')
+            options = dict(base_url=self.live_server_url, concurrency='2', requests=6, warmup=1,
+                           scenarios='my_patients,patient_records,medicines', stdout=io.StringIO())
+            call_command('loadtest', patients=6, doctors=2, medicines=2, symptoms=3, links=2,
+                         output=baseline, **options)
+
+            self.assertEqual(User.objects.filter(username__startswith=loadtest.PREFIX).count(), 8)
+            self.assertEqual(Medicine.objects.count(), 12)
+            self.assertEqual(SymptomReport.objects.count(), 18)
+            self.assertEqual(DoctorPatient.objects.filter(status='accepted').count(), 4)
+
+            with open(baseline) as f:
+                report = json.load(f)
+            for scenario in ('my_patients', 'patient_records', 'medicines'):
+                result = report['results'][scenario]['2']
+                self.assertEqual(result['requests'], 6)
+                self.assertEqual(result['errors'], 0)
+                self.assertGreater(result['queries_per_request'], 0)
+
+            call_command('loadtest', no_seed=True, compare=baseline, clear=True, **options)
+            self.assertFalse(User.objects.filter(username__startswith=loadtest.PREFIX).exists())
+
+
+class CompareTests(SimpleTestCase):
+    def test_flags_latency_and_query_regressions(self):
+        before = {'medicines': {'8': {'p95_ms': 10.0, 'throughput_rps': 100.0, 'queries_per_request': 2}}}
+        after = {'medicines': {'8': {'p95_ms': 15.0, 'throughput_rps': 90.0, 'queries_per_request': 3}}}
+        _, regressions = loadtest.compare(before, after, threshold=0.2)
+        self.assertEqual(len(regressions), 2)
+        _, regressions = loadtest.compare(before, before)
+        self.assertEqual(regressions, [])
+
+
+class DoctorPatientLinkTests(TestCase):
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+        self.doctor = User.objects.create_user(username='Dr.House@genex.test', password='x', role='doctor')
+        self.patient = User.objects.create_user(username='jane@genex.test', password='x', first_name='Jane')
+        self.other = User.objects.create_user(username='bob@genex.test', password='x')
+
+    def test_request_flow_matches_usernames_case_insensitively(self):
+        response = self.client.post('/api/send-request/', {'patient_username': ' JANE@genex.test'},
+                                    content_type='application/json', **auth_headers(self.doctor))
+        self.assertEqual(response.status_code, 201)
+        link = DoctorPatient.objects.get()
+        self.assertEqual((link.doctor, link.patient, link.patient_key), (self.doctor, self.patient, 'jane@genex.test'))
+
+        requests = self.client.get('/api/patient/requests/', **auth_headers(self.patient)).json()
+        self.assertEqual([r['id'] for r in requests], [link.id])
+        self.client.post(f'/api/patient/requests/{link.id}/update/', {'action': 'accept'},
+                         content_type='application/json', **auth_headers(self.patient))
+
+        patients = self.client.get('/api/doctor/my-patients/', **auth_headers(self.doctor)).json()
+        self.assertEqual([p['id'] for p in patients], [self.patient.id])
+
+    def test_signup_attaches_requests_sent_before_the_account_existed(self):
+        DoctorPatient.objects.create(doctor=self.doctor, doctor_username=self.doctor.username,
+                                     patient_username='New@genex.test')
+        self.client.post('/api/signup/', {'email': 'new@genex.test', 'password': 'x', 'name': 'New'},
+                         content_type='application/json')
+        self.assertEqual(DoctorPatient.objects.get().patient.username, 'new@genex.test')
+
+    def test_dashboards_are_single_indexed_queries(self):
+        for i in range(30):
+            patient = User.objects.create(username=f'p{i}@genex.test')
+            DoctorPatient.objects.create(doctor=self.doctor, patient=patient,
+                                         status='accepted' if i % 2 else 'pending')
+        headers = auth_headers(self.doctor)
+        # One query authenticates the token's user, one builds the list.
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self.client.get('/api/doctor/my-patients/', **headers).json()), 15)
+        with self.assertNumQueries(3):  # and the response version for the ETag
+            self.client.get('/api/patient/requests/', **auth_headers(self.patient))
+
+        plan = User.objects.filter(doctor_links__doctor=self.doctor, doctor_links__status='accepted').explain()
+        self.assertIn('api_dp_doctor_status_idx', plan)
+        plan = DoctorPatient.objects.filter(patient=self.patient).explain()
+        self.assertIn('api_dp_patient_status_idx', plan)
+
+
+class DoctorPatientMigrationTests(TransactionTestCase):
+    def test_existing_links_are_resolved_to_users(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('api', '0005_doctorpatient')])
+        apps = executor.loader.project_state([('api', '0005_doctorpatient')]).apps
+        OldUser = apps.get_model('api', 'User')
+        OldLink = apps.get_model('api', 'DoctorPatient')
+        doctor = OldUser.objects.create(username='Doc@genex.test')
+        patient = OldUser.objects.create(username='pat@genex.test')
+        OldLink.objects.create(doctor_username='doc@genex.test', patient_username='PAT@genex.test ', status='accepted')
+        OldLink.objects.create(doctor_username='Doc@genex.test', patient_username='ghost@genex.test')
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+        accepted, unlinked = DoctorPatient.objects.order_by('id')
+        self.assertEqual((accepted.doctor_id, accepted.patient_id), (doctor.id, patient.id))
+        self.assertEqual(accepted.patient_key, 'pat@genex.test')
+        self.assertEqual((unlinked.doctor_id, unlinked.patient_id), (doctor.id, None))
+
+
+class ListPaginationTests(TestCase):
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+        self.patient = User.objects.create_user(username='jane@genex.test', password='x')
+        self.headers = auth_headers(self.patient)
+        SymptomReport.objects.bulk_create([
+            SymptomReport(user=self.patient, symptom_name=f's{i}', severity=i % 10, frequency='Daily')
+            for i in range(25)
+        ])
+        # Half the history shares one timestamp, so pages must break ties on id.
+        tied = SymptomReport.objects.order_by('id').values_list('id', flat=True)[:12]
+        SymptomReport.objects.filter(id__in=list(tied)).update(created_at=timezone.now())
+
+    def test_plain_list_without_pagination_params(self):
+        data = self.client.get('/api/symptoms/', **self.headers).json()
+        self.assertIsInstance(data, list)
+        self.assertEqual(len(data), 25)
+
+    def test_cursor_pages_cover_history_once_in_order(self):
+        url, seen = '/api/symptoms/?page_size=7', []
+        while url:
+            page = self.client.get(url, **self.headers).json()
+            self.assertLessEqual(len(page['results']), 7)
+            seen += page['results']
+            url = page['next']
+        expected = list(SymptomReport.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual([s['id'] for s in seen], expected)
+
+    def test_tied_timestamps_are_a_keyset_seek_both_ways(self):
+        first = self.client.get('/api/symptoms/?page_size=5', **self.headers).json()
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(first['next'], **self.headers).json()
+        page_sql = [q['sql'] for q in queries.captured_queries if 'api_symptomreport' in q['sql']][0]
+        self.assertNotIn('OFFSET', page_sql)
+        self.assertIn('"created_at" = ', page_sql)  # ties continue on id
+        back = self.client.get(second['previous'], **self.headers).json()
+        self.assertEqual([s['id'] for s in back['results']], [s['id'] for s in first['results']])
+
+    def test_sparse_fieldsets(self):
+        data = self.client.get('/api/symptoms/?fields=id,severity', **self.headers).json()
+        self.assertEqual(set(data[0]), {'id', 'severity'})
+        page = self.client.get('/api/medicines/?page_size=5&fields=name', **self.headers).json()
+        self.assertEqual(page['results'], [])
+
+    def test_history_query_uses_composite_index(self):
+        plan = SymptomReport.objects.filter(user=self.patient).order_by('-created_at', '-id')[:50].explain()
+        self.assertIn('api_symptom_user_created_idx', plan)
+
+
+class PatientSearchTests(TestCase):
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+        self.doctor = User.objects.create(username='house@genex.test', role='doctor', first_name='Greg')
+        self.headers = auth_headers(self.doctor)
+        self.jane = User.objects.create(username='jane.doe@genex.test', email='jane.doe@genex.test', first_name='Jane')
+        self.janet = User.objects.create(username='janet@mail.test', first_name='Janet')
+        self.john = User.objects.create(username='jdoe@mail.test', first_name='John')
+
+    def search(self, query):
+        response = self.client.get('/api/search-patients/', {'query': query}, **self.headers)
+        return [u['username'] for u in response.json()]
+
+    def test_prefix_matches_on_username_name_and_email(self):
+        self.assertEqual(set(self.search('jan')), {'jane.doe@genex.test', 'janet@mail.test'})
+        self.assertEqual(self.search('john'), ['jdoe@mail.test'])
+        self.assertEqual(self.search('jane do'), ['jane.doe@genex.test'])
+        self.assertEqual(self.search('house'), [])  # doctors aren't searchable patients
+
+    def test_short_queries_are_ordered_by_username_prefix_matches_first(self):
+        User.objects.create(username='zz@mail.test', first_name='Jack')
+        User.objects.create(username='jab@mail.test')
+        self.assertEqual(self.search('ja'), ['jab@mail.test', 'jane.doe@genex.test', 'janet@mail.test', 'zz@mail.test'])
+        self.assertEqual(self.search('j'), ['jab@mail.test', 'jane.doe@genex.test', 'janet@mail.test',
+                                            'jdoe@mail.test', 'zz@mail.test'])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.john.first_name = 'Jonathan'
+        self.john.save()
+        self.assertEqual(self.search('jonat'), ['jdoe@mail.test'])
+        self.janet.role = 'doctor'
+        self.janet.save()
+        self.assertEqual(self.search('jan'), ['jane.doe@genex.test'])
+        self.jane.delete()
+        self.assertEqual(self.search('jan'), [])
+
+    def test_without_query_lists_all_patients(self):
+        self.assertEqual(self.search(''), ['jane.doe@genex.test', 'janet@mail.test', 'jdoe@mail.test'])
+
+
+class DoctorDashboardTests(TestCase):
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+        self.doctor = User.objects.create(username='house@genex.test', role='doctor')
+        self.headers = auth_headers(self.doctor)
+
+    def add_patients(self, n, start=0):
+        for i in range(start, start + n):
+            patient = User.objects.create(username=f'p{i}@genex.test')
+            DoctorPatient.objects.create(doctor=self.doctor, patient=patient, status='accepted')
+            Medicine.objects.create(user=patient, name='Methotrexate')
+            SymptomReport.objects.bulk_create([
+                SymptomReport(user=patient, symptom_name=f'{patient.username}-{k}', severity=k, frequency='Daily')
+                for k in range(8)
+            ])
+
+    def test_query_count_is_constant(self):
+        self.add_patients(1)
+        with self.assertNumQueries(5):  # auth (cold), patients, medicines, symptoms, doctor notes
+            self.assertEqual(len(self.client.get('/api/doctor/dashboard/', **self.headers).json()), 1)
+        self.add_patients(15, start=1)
+        with self.assertNumQueries(4):  # the doctor now comes from the auth cache
+            self.assertEqual(len(self.client.get('/api/doctor/dashboard/', **self.headers).json()), 16)
+
+    def test_latest_symptoms_per_patient(self):
+        self.add_patients(3)
+        pending = User.objects.create(username='pending@genex.test')
+        DoctorPatient.objects.create(doctor=self.doctor, patient=pending)
+
+        data = self.client.get('/api/doctor/dashboard/?symptoms=3', **self.headers).json()
+        self.assertEqual([p['email'] for p in data], ['p0@genex.test', 'p1@genex.test', 'p2@genex.test'])
+        for patient in data:
+            expected = list(SymptomReport.objects.filter(user_id=patient['id'])
+                            .order_by('-created_at', '-id').values_list('id', flat=True)[:3])
+            self.assertEqual([s['id'] for s in patient['symptoms']], expected)
+            self.assertEqual([m['name'] for m in patient['medicines']], ['Methotrexate'])
+
+
+@override_settings(API_RESPONSE_CACHE=RESPONSE_CACHE)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client(HTTP_HOST='localhost')
+        self.patient = User.objects.create(username='jane@genex.test')
+        self.headers = auth_headers(self.patient)
+        Medicine.objects.create(user=self.patient, name='Methotrexate')
+
+    def test_unchanged_list_revalidates_with_304_without_touching_data(self):
+        first = self.client.get('/api/medicines/', **self.headers)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):  # user from the auth cache, 304 from the version token
+            second = self.client.get('/api/medicines/', HTTP_IF_NONE_MATCH=first['ETag'], **self.headers)
+        self.assertEqual(second.status_code, 304)
+        with self.assertNumQueries(0):  # served from the payload cache
+            third = self.client.get('/api/medicines/', **self.headers)
+        self.assertEqual(third.json(), first.json())
+        since = self.client.get('/api/medicines/', HTTP_IF_MODIFIED_SINCE=first['Last-Modified'], **self.headers)
+        self.assertEqual(since.status_code, 304)
+
+    def test_writes_invalidate(self):
+        etag = self.client.get('/api/medicines/', **self.headers)['ETag']
+        self.client.post('/api/medicines/', {'name': 'Prednisone'}, content_type='application/json', **self.headers)
+        response = self.client.get('/api/medicines/', HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({m['name'] for m in response.json()}, {'Methotrexate', 'Prednisone'})
+
+        etag = self.client.get('/api/profile/', **self.headers)['ETag']
+        self.client.patch('/api/profile/', {'age': 41}, content_type='application/json', **self.headers)
+        response = self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(response.json()['age'], 41)
+
+        etag = self.client.get('/api/patient/requests/', **self.headers)['ETag']
+        doctor = User.objects.create(username='house@genex.test', role='doctor')
+        DoctorPatient.objects.create(doctor=doctor, patient=self.patient)
+        response = self.client.get('/api/patient/requests/', HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(len(response.json()), 1)
+
+    def test_query_string_and_user_are_part_of_the_key(self):
+        full = self.client.get('/api/medicines/', **self.headers).json()
+        sparse = self.client.get('/api/medicines/?fields=name', **self.headers).json()
+        self.assertEqual(set(full[0]), {'id', 'name', 'added_at', 'client_id'})
+        self.assertEqual(set(sparse[0]), {'name'})
+        other = User.objects.create(username='bob@genex.test')
+        self.assertEqual(self.client.get('/api/medicines/', **auth_headers(other)).json(), [])
+
+    def test_per_process_cache_is_flagged(self):
+        self.assertEqual([m.id for m in checks.run_checks(tags=[checks.Tags.caches])], ['api.W001'])
+        with override_settings(API_RESPONSE_CACHE=None):
+            self.assertEqual(checks.run_checks(tags=[checks.Tags.caches]), [])
+
+    @override_settings(API_RESPONSE_CACHE=None)
+    def test_validators_without_the_payload_cache(self):
+        first = self.client.get('/api/medicines/', **self.headers)
+        with self.assertNumQueries(1):  # the version row; no payload cache needed for a 304
+            second = self.client.get('/api/medicines/', HTTP_IF_NONE_MATCH=first['ETag'], **self.headers)
+        self.assertEqual(second.status_code, 304)
+
+        Medicine.objects.filter(user=self.patient).update(name='Prednisone')  # no signal, no version bump
+        self.assertEqual(self.client.get('/api/medicines/', **self.headers).json()[0]['name'], 'Prednisone')
+        self.client.post('/api/medicines/', {'name': 'Folic acid'}, content_type='application/json', **self.headers)
+        third = self.client.get('/api/medicines/', HTTP_IF_NONE_MATCH=first['ETag'], **self.headers)
+        self.assertEqual(third.status_code, 200)
+        self.assertNotEqual(third['ETag'], first['ETag'])
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+        self.user = User.objects.create_user(username='jane@genex.test', password='old-password')
+        self.headers = auth_headers(self.user)
+
+    def test_identity_comes_from_the_cache_after_first_request(self):
+        self.client.get('/api/patient/requests/', **self.headers)
+        cache.clear()  # force the view itself to run
+        with self.assertNumQueries(2):  # response version and the requests list; no user lookup
+            self.client.get('/api/patient/requests/', **self.headers)
+
+    def test_saving_the_user_drops_the_cached_identity(self):
+        self.client.get('/api/profile/', **self.headers)
+        User.objects.filter(pk=self.user.pk).update(role='doctor')  # no signal: still cached
+        self.assertEqual(self.client.get('/api/doctor/my-patients/', **self.headers).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/profile/', **self.headers).status_code, 401)
+
+    def test_password_change_revokes_earlier_tokens(self):
+        self.assertEqual(self.client.get('/api/profile/', **self.headers).status_code, 200)
+        self.user.set_password('new-password')
+        self.user.save()
+        self.assertEqual(self.client.get('/api/profile/', **self.headers).status_code, 401)
+        fresh = auth_headers(self.user)
+        self.assertEqual(self.client.get('/api/profile/', **fresh).status_code, 200)
+
+    def test_password_change_revokes_tokens_without_a_version(self):
+        refresh = RefreshToken.for_user(self.user)  # as issued before the `tv` claim
+        legacy = {'HTTP_AUTHORIZATION': f'Bearer {refresh.access_token}'}
+        self.assertEqual(self.client.get('/api/profile/', **legacy).status_code, 200)
+        self.user.set_password('new-password')
+        self.user.save()
+        self.assertEqual(self.client.get('/api/profile/', **legacy).status_code, 401)
+
+    def test_profile_patch_does_not_write_back_the_cached_user(self):
+        self.client.get('/api/profile/', **self.headers)  # the user is now cached
+        User.objects.filter(pk=self.user.pk).update(is_active=False, first_name='Jane')  # e.g. another worker
+        response = self.client.patch('/api/profile/', {'age': 41}, content_type='application/json', **self.headers)
+        self.assertEqual(response.json()['age'], 41)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.age, self.user.is_active, self.user.first_name), (41, False, 'Jane'))
+
+    def test_user_cache_is_bounded_and_expires(self):
+        now = [0.0]
+        users = UserCache(max_entries=2, ttl=10, clock=lambda: now[0])
+        for i in range(3):
+            users.set(i, 'v', i)
+        self.assertIsNone(users.get(0))
+        self.assertEqual(users.get('2'), ('v', 2))
+        now[0] = 11
+        self.assertIsNone(users.get(2))
+
+
+class BulkCreateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client(HTTP_HOST='localhost')
+        self.patient = User.objects.create(username='jane@genex.test')
+        self.headers = auth_headers(self.patient)
+
+    def post(self, url, body):
+        return self.client.post(url, body, content_type='application/json', **self.headers)
+
+    def test_batch_is_validated_and_inserted_together(self):
+        batch = [{'symptom_name': f's{i}', 'severity': i, 'frequency': 'Daily', 'client_id': f'c{i}'} for i in range(20)]
+        batch.append({'symptom_name': 'no key', 'severity': 1, 'frequency': 'Daily'})
+        self.client.get('/api/symptoms/', **self.headers)  # warm the auth cache
+        # savepoint, keyed insert, read back, unkeyed insert, rollup read + upsert, doctor notes, release,
+        # response version
+        with self.assertNumQueries(9):
+            response = self.post('/api/symptoms/', batch)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r['symptom_name'] for r in response.json()], [b['symptom_name'] for b in batch])
+        self.assertEqual(SymptomReport.objects.filter(user=self.patient).count(), 21)
+
+    def test_invalid_item_rejects_the_whole_batch(self):
+        response = self.post('/api/symptoms/', [
+            {'symptom_name': 'ok', 'severity': 1, 'frequency': 'Daily'},
+            {'symptom_name': 'bad', 'frequency': 'Daily'},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0], {})
+        self.assertIn('severity', response.json()[1])
+        self.assertFalse(SymptomReport.objects.exists())
+
+    def test_retries_do_not_duplicate(self):
+        batch = [{'name': 'Methotrexate', 'client_id': 'a'}, {'name': 'Prednisone', 'client_id': 'b'},
+                 {'name': 'Prednisone', 'client_id': 'b'}]
+        first = self.post('/api/medicines/', batch).json()
+        again = self.post('/api/medicines/', batch + [{'name': 'Folic acid', 'client_id': 'c'}]).json()
+        self.assertEqual([m['id'] for m in again[:3]], [m['id'] for m in first])
+        single = self.post('/api/medicines/', {'name': 'Methotrexate', 'client_id': 'a'})
+        self.assertEqual((single.status_code, single.json()['id']), (200, first[0]['id']))
+        self.assertEqual(Medicine.objects.count(), 3)
+        # Keys are per user
+        other = User.objects.create(username='bob@genex.test')
+        self.client.post('/api/medicines/', batch, content_type='application/json', **auth_headers(other))
+        self.assertEqual(Medicine.objects.count(), 5)
+
+    def test_concurrent_single_retry_returns_the_stored_row(self):
+        real_first, checks = QuerySet.first, []
+
+        def first(queryset):
+            found = real_first(queryset)
+            if queryset.model is Medicine and not checks:
+                checks.append(found)
+                # the other request's insert lands between the client_id check and this one
+                Medicine.objects.create(user=self.patient, name='Methotrexate', client_id='a')
+            return found
+
+        with mock.patch.object(QuerySet, 'first', first):
+            response = self.post('/api/medicines/', {'name': 'Methotrexate', 'client_id': 'a'})
+        self.assertEqual(checks, [None])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], Medicine.objects.get().id)
+
+    @override_settings(API_RESPONSE_CACHE=RESPONSE_CACHE)
+    def test_batch_invalidates_cached_lists(self):
+        etag = self.client.get('/api/medicines/', **self.headers)['ETag']
+        self.post('/api/medicines/', [{'name': 'Methotrexate'}])
+        response = self.client.get('/api/medicines/', HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(len(response.json()), 1)
+
+
+class SyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client(HTTP_HOST='localhost')
+        self.patient = User.objects.create(username='jane@genex.test')
+        self.doctor = User.objects.create(username='dr.house@genex.test', role='doctor')
+        self.headers = auth_headers(self.patient)
+        self.kept = Medicine.objects.create(user=self.patient, name='Methotrexate')
+        self.dropped = Medicine.objects.create(user=self.patient, name='Prednisone')
+        self.symptom = SymptomReport.objects.create(user=self.patient, symptom_name='Fatigue', severity=4, frequency='Daily')
+        self.link = DoctorPatient.objects.create(doctor=self.doctor, patient=self.patient)
+        # Existing rows were last touched well before any cursor the tests get
+        an_hour_ago = timezone.now() - timezone.timedelta(hours=1)
+        for model in (Medicine, SymptomReport, DoctorPatient):
+            model.all_objects.update(updated_at=an_hour_ago)
+
+    def sync(self, since=None):
+        response = self.client.get('/api/sync/', {'since': since} if since else {}, **self.headers)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_then_delta(self):
+        full = self.sync()
+        self.assertTrue(full['full'])
+        self.assertEqual(full['profile']['username'], 'jane@genex.test')
+        self.assertEqual([m['id'] for m in full['medicines']['updated']], [self.kept.id, self.dropped.id])
+        self.assertEqual([r['doctor_name'] for r in full['requests']['updated']], ['dr.house@genex.test'])
+
+        self.assertEqual(self.client.delete(f'/api/medicines/{self.dropped.id}/', **self.headers).status_code, 204)
+        self.client.post('/api/symptoms/', {'symptom_name': 'Rash', 'severity': 2, 'frequency': 'Weekly'},
+                         content_type='application/json', **self.headers)
+        self.client.post(f'/api/patient/requests/{self.link.id}/update/', {'action': 'accept'},
+                         content_type='application/json', **self.headers)
+
+        delta = self.sync(full['cursor'])
+        self.assertFalse(delta['full'])
+        self.assertEqual(delta['medicines'], {'updated': [], 'deleted': [self.dropped.id]})
+        self.assertEqual([s['symptom_name'] for s in delta['symptoms']['updated']], ['Rash'])
+        self.assertEqual([r['status'] for r in delta['requests']['updated']], ['accepted'])
+
+        # Tombstones stay out of everything else
+        self.assertEqual([m['id'] for m in self.client.get('/api/medicines/', **self.headers).json()], [self.kept.id])
+        self.assertTrue(Medicine.all_objects.filter(id=self.dropped.id).exists())
+
+    def test_stale_or_bad_cursor(self):
+        stale = str(int((timezone.now() - timezone.timedelta(days=365)).timestamp() * 1_000_000))
+        self.assertTrue(self.sync(stale)['full'])
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'yesterday'}, **self.headers).status_code, 400)
+
+    def test_purge_tombstones(self):
+        self.dropped.delete()
+        Medicine.all_objects.filter(id=self.dropped.id).update(deleted_at=timezone.now() - timezone.timedelta(days=91))
+        call_command('purge_tombstones', stdout=io.StringIO())
+        self.assertEqual(list(Medicine.all_objects.values_list('id', flat=True)), [self.kept.id])
+
+
+class SymptomRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client(HTTP_HOST='localhost')
+        self.patient = User.objects.create(username='jane@genex.test')
+        self.doctor = User.objects.create(username='dr.house@genex.test', role='doctor')
+        DoctorPatient.objects.create(doctor=self.doctor, patient=self.patient, status='accepted')
+        self.headers = auth_headers(self.patient)
+
+    def post(self, body):
+        return self.client.post('/api/symptoms/', body, content_type='application/json', **self.headers)
+
+    def rollups(self):
+        return list(SymptomWeeklyRollup.objects.order_by('symptom_name', 'week').values_list(
+            'symptom_name', 'count', 'severity_sum', 'max_severity', 'last_frequency'))
+
+    def test_maintained_on_create_update_and_delete(self):
+        first = self.post({'symptom_name': 'Fatigue', 'severity': 7, 'frequency': 'Daily'}).json()
+        self.post([{'symptom_name': 'Fatigue', 'severity': 3, 'frequency': 'Weekly'},
+                   {'symptom_name': 'Rash', 'severity': 2, 'frequency': 'Daily'}])
+        self.assertEqual(self.rollups(), [('Fatigue', 2, 10, 7, 'Weekly'), ('Rash', 1, 2, 2, 'Daily')])
+
+        self.client.patch(f"/api/symptoms/{first['id']}/", {'severity': 1},
+                          content_type='application/json', **self.headers)
+        self.assertEqual(self.rollups()[0], ('Fatigue', 2, 4, 3, 'Weekly'))
+
+        # A doctor note doesn't touch the rollup
+        report = SymptomReport.objects.get(id=first['id'])
+        report.notes = 'Doctor: rest'
+        with self.assertNumQueries(2):  # the update and the response version
+            report.save()
+
+        self.client.delete(f"/api/symptoms/{first['id']}/", **self.headers)
+        rash = SymptomReport.objects.get(symptom_name='Rash')
+        rash.hard_delete()
+        self.assertEqual(self.rollups(), [('Fatigue', 1, 3, 3, 'Weekly')])
+
+        incremental = self.rollups()
+        call_command('backfill_symptom_rollups', stdout=io.StringIO())
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_trends_endpoint(self):
+        for severity in (2, 6):
+            SymptomReport.objects.create(user=self.patient, symptom_name='Fatigue', severity=severity, frequency='Daily')
+        old = SymptomReport.objects.create(user=self.patient, symptom_name='Fatigue', severity=9, frequency='Daily')
+        SymptomReport.objects.filter(id=old.id).update(created_at=timezone.now() - timezone.timedelta(weeks=20))
+        call_command('backfill_symptom_rollups', stdout=io.StringIO())
+
+        response = self.client.get(f'/api/doctor/patient-trends/{self.patient.id}/', **auth_headers(self.doctor))
+        self.assertEqual(response.status_code, 200)
+        [week] = response.json()['symptoms']['Fatigue']
+        self.assertEqual((week['count'], week['mean_severity'], week['max_severity']), (2, 4.0, 6))
+
+        response = self.client.get(f'/api/doctor/patient-trends/{self.patient.id}/?weeks=52', **self.headers)
+        self.assertEqual(len(response.json()['symptoms']['Fatigue']), 2)
+
+        stranger = User.objects.create(username='dr.who@genex.test', role='doctor')
+        response = self.client.get(f'/api/doctor/patient-trends/{self.patient.id}/', **auth_headers(stranger))
+        self.assertEqual(response.status_code, 403)
+
+
+class DoctorNoteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client(HTTP_HOST='localhost')
+        self.patient = User.objects.create(username='jane@genex.test')
+        self.doctor = User.objects.create(username='dr.house@genex.test', first_name='Gregory', role='doctor')
+        DoctorPatient.objects.create(doctor=self.doctor, patient=self.patient, status='accepted')
+        self.report = SymptomReport.objects.create(user=self.patient, symptom_name='Fatigue', severity=4,
+                                                   frequency='Daily', notes='Worse at night')
+        self.headers = auth_headers(self.doctor)
+
+    def add_note(self, text):
+        return self.client.post(f'/api/doctor/add-note/{self.report.id}/', {'note': text},
+                                content_type='application/json', **self.headers)
+
+    def test_notes_are_inserted_and_composed_on_read(self):
+        self.add_note('Rest more')
+        response = self.add_note('Check iron levels')
+        self.assertEqual(response.json()['new_notes'],
+                         'Worse at night\n\n Doctor: Rest more\n\n Doctor: Check iron levels')
+        self.report.refresh_from_db()
+        self.assertEqual(self.report.notes, 'Worse at night')  # the report itself isn't rewritten
+        self.assertEqual(list(DoctorNote.objects.values_list('author_name', flat=True)), ['Gregory', 'Gregory'])
+
+        records = self.client.get(f'/api/doctor/patient-records/{self.patient.id}/',
+                                  **self.headers).json()
+        [symptom] = records['symptoms']
+        self.assertEqual(symptom['notes'], response.json()['new_notes'])
+        self.assertEqual([n['text'] for n in symptom['doctor_notes']], ['Rest more', 'Check iron levels'])
+
+        [own] = self.client.get('/api/symptoms/', **auth_headers(self.patient)).json()
+        self.assertEqual(own['notes'], response.json()['new_notes'])
+
+    def test_split_and_compose_round_trip(self):
+        for patient, doctor in [('Worse at night', ['Rest', 'Iron']), ('', ['Rest']), ('Just mine', [])]:
+            composed = compose_notes(patient, doctor)
+            self.assertEqual(split_notes(composed), (patient, doctor))
+
+
+class DoctorNoteMigrationTests(TransactionTestCase):
+    def test_embedded_notes_are_moved_out(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('api', '0011_symptom_weekly_rollup')])
+        apps = executor.loader.project_state([('api', '0011_symptom_weekly_rollup')]).apps
+        patient = apps.get_model('api', 'User').objects.create(username='jane@genex.test')
+        OldReport = apps.get_model('api', 'SymptomReport')
+        for notes in ['Worse at night\n\n Doctor: Rest\n\n Doctor: Iron', 'Doctor: Rest', 'Just mine', None]:
+            OldReport.objects.create(user_id=patient.id, symptom_name='Fatigue', severity=3, frequency='Daily', notes=notes)
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+        reports = SymptomReport.objects.order_by('id')
+        self.assertEqual([r.notes for r in reports], ['Worse at night', '', 'Just mine', None])
+        self.assertEqual([[n.text for n in r.doctor_notes.order_by('id')] for r in reports],
+                         [['Rest', 'Iron'], ['Rest'], [], []])
+        self.assertEqual(reports[0].full_notes, 'Worse at night\n\n Doctor: Rest\n\n Doctor: Iron')
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client(HTTP_HOST='localhost')
+        self.async_client = AsyncClient(HTTP_HOST='localhost')
+        self.doctor = User.objects.create(username='house@genex.test', role='doctor')
+        self.patient = User.objects.create(username='jane@genex.test', age=40)
+        DoctorPatient.objects.create(doctor=self.doctor, patient=self.patient, status='accepted')
+        Medicine.objects.create(user=self.patient, name='Methotrexate')
+        report = SymptomReport.objects.create(user=self.patient, symptom_name='Rash', severity=3, frequency='Daily')
+        DoctorNote.objects.create(symptom=report, author=self.doctor, text='Rest')
+
+    def auth(self, user):
+        # AsyncClient takes headers by name; extra kwargs go into the ASGI scope
+        return {'Authorization': bearer(user)}
+
+    async def test_responses_match_the_sync_endpoints(self):
+        cases = [
+            (self.patient, 'profile'), (self.patient, 'medicines'), (self.patient, 'symptoms'),
+            (self.patient, 'patient/requests'), (self.doctor, 'doctor/my-patients'), (self.doctor, 'doctor/dashboard'),
+        ]
+        for user, path in cases:
+            headers = await sync_to_async(self.auth)(user)
+            expected = (await sync_to_async(self.client.get)(f'/api/{path}/', headers=headers)).json()
+            response = await self.async_client.get(f'/api/async/{path}/', headers=headers)
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(response.json(), expected, path)
+
+    async def test_conditional_get_and_errors(self):  # validators from ResponseVersion (cache off)
+        headers = await sync_to_async(self.auth)(self.patient)
+        first = await self.async_client.get('/api/async/medicines/', headers=headers)
+        second = await self.async_client.get('/api/async/medicines/', headers={**headers, 'If-None-Match': first['ETag']})
+        self.assertEqual(second.status_code, 304)
+
+        self.assertEqual((await self.async_client.get('/api/async/profile/')).status_code, 401)
+        bad = await self.async_client.get('/api/async/profile/', headers={'Authorization': 'Bearer nope'})
+        self.assertEqual(bad.status_code, 401)
+        self.assertEqual((await self.async_client.post('/api/async/profile/', headers=headers)).status_code, 405)
+
+
+class BenchAsyncCommandTests(TransactionTestCase):
+    def test_every_mode_answers(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'bench.json')
+            call_command('bench_async', patients=4, doctors=2, concurrency='1,4', requests=8, scenarios='medicines',
+                         response_cache=True, clear=True, output=output, stdout=io.StringIO())
+            with open(output) as f:
+                results = json.load(f)['results']['medicines']
+        for mode in ('wsgi-sync', 'asgi-sync', 'asgi-async'):
+            self.assertEqual((results[mode]['4']['requests'], results[mode]['4']['errors']), (8, 0), mode)
+
+
+def expression_table(genes, samples, seed=0):
+    """A GEO series matrix as text, and its values as a (genes, samples) float32 array (NaN: "null")."""
+    values = np.random.default_rng(seed).normal(8, 2, size=(genes, samples)).astype(np.float32)
+    values[1, 0] = np.nan
+    lines = ['!Series_title\t"RA synovium"', '!series_matrix_table_begin',
+             '\t'.join(['"ID_REF"'] + [f'"GSM{900 + j}"' for j in range(samples)])]
+    for i, row in enumerate(values):
+        lines.append('\t'.join([f'"{1007 + i}_s_at"'] + ['null' if np.isnan(v) else repr(float(v)) for v in row]))
+    lines.append('!series_matrix_table_end')
+    return '\n'.join(lines) + '\n', values
+
+
+class ExpressionParserTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'out')
+
+    def parse(self, data, step):
+        parser = ExpressionParser(self.directory, flush_rows=3)
+        for i in range(0, len(data), step):
+            parser.feed(data[i:i + step])
+        parser.close()
+        return parser
+
+    def test_any_chunking_of_plain_or_gzip_input_gives_the_same_vectors(self):
+        text, values = expression_table(genes=10, samples=3)
+        for data in (text.encode(), gzip.compress(text.encode()) + gzip.compress(b'')):
+            for step in (1, 7, len(data)):
+                parser = self.parse(data, step)
+                self.assertEqual((parser.rows, parser.samples), (10, ['GSM900', 'GSM901', 'GSM902']))
+                for j in range(3):
+                    vector = np.load(os.path.join(self.directory, sample_filename(j)), mmap_mode='r')
+                    self.assertEqual(vector.dtype, np.float32)
+                    np.testing.assert_array_equal(vector, values[:, j])
+                with open(os.path.join(self.directory, 'genes.txt')) as f:
+                    self.assertEqual(f.read().split(), [f'{1007 + i}_s_at' for i in range(10)])
+
+    def test_rabc_tsv_with_comments_missing_cells_and_crlf(self):
+        data = b'# RABC2\r\nGeneSymbol\tS1\tS2\r\nTNF\t1.5\tNA\r\n\t9\t9\r\nIL6\t2\r\n'
+        parser = self.parse(data, 5)
+        self.assertEqual((parser.gene_column, parser.rows), ('GeneSymbol', 2))  # row without a symbol dropped
+        np.testing.assert_array_equal(np.load(os.path.join(self.directory, sample_filename(0))), [1.5, 2])
+        self.assertTrue(np.isnan(np.load(os.path.join(self.directory, sample_filename(1)))).all())
+
+    def test_errors(self):
+        for data, message in [
+            (b'ID\tS1\nTNF\thigh\n', 'Line 2: not a number'),
+            (b'ID\tS1\nTNF\t1\t2\n', '2 values for 1 samples'),
+            (gzip.compress(b'ID\tS1\nTNF\t1\n')[:-6], 'truncated'),
+            (b'# only a comment\n', 'No header'),
+        ]:
+            with self.assertRaisesRegex(ExpressionFormatError, message):
+                self.parse(data, 4)
+
+    def test_line_length_is_capped(self):
+        with mock.patch('api.expression.MAX_LINE', 16):
+            self.assertEqual(self.parse(b'ID\tS1\nTNF\t1.25\n', 3).rows, 1)
+            for data, step in [(b'x' * 100, 1), (b'ID\tS1\n' + b'9' * 40 + b'\n', 100)]:
+                with self.assertRaisesRegex(ExpressionFormatError, 'longer than 16 characters'):
+                    self.parse(data, step)
+
+
+class UploadSessionTests(TestCase):
+    def setUp(self):
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        self.client = Client(HTTP_HOST='localhost')
+        self.patient = User.objects.create(username='jane@genex.test')
+        self.headers = auth_headers(self.patient)
+
+    def start(self, data, filename='GSE203024_series_matrix.txt.gz'):
+        response = self.client.post('/api/uploads/', {'filename': filename, 'size': len(data)},
+                                    content_type='application/json', **self.headers)
+        self.assertEqual(response.status_code, 201, response.content)
+        return f"/api/uploads/{response.json()['id']}/"
+
+    def put(self, url, data, offset):
+        return self.client.put(url, data, content_type='application/offset+octet-stream',
+                               HTTP_UPLOAD_OFFSET=str(offset), **self.headers)
+
+    def test_chunked_upload_resumes_and_builds_per_sample_vectors(self):
+        text, values = expression_table(genes=500, samples=4)
+        data = gzip.compress(text.encode())
+        url = self.start(data)
+        chunk = len(data) // 3 + 1
+
+        self.assertEqual(self.put(url, data[:chunk], 0).json()['offset'], chunk)
+        retried = self.put(url, data[:chunk], 0)  # response was lost; the client sends it again
+        self.assertEqual((retried.status_code, retried.json()['offset']), (409, chunk))
+        self.assertEqual(self.client.get(url, **self.headers).json()['offset'], chunk)
+
+        uploads._parsers.clear()  # next chunk lands on another worker: parsed once at the end
+        self.assertEqual(self.put(url, data[chunk:2 * chunk], chunk).status_code, 200)
+        done = self.put(url, data[2 * chunk:], 2 * chunk)
+        self.assertEqual(done.status_code, 201, done.content)
+        self.assertEqual((done.json()['status'], done.json()['genes'], done.json()['samples']), ('complete', 500, 4))
+
+        session = UploadSession.objects.get()
+        with session.upload.file.open('rb') as f:
+            self.assertEqual(f.read(), data)  # the original file is kept as uploaded
+        samples = list(ExpressionSample.objects.filter(upload=session.upload))
+        self.assertEqual([s.name for s in samples], ['GSM900', 'GSM901', 'GSM902', 'GSM903'])
+        for sample in samples:
+            np.testing.assert_array_equal(sample.load(), values[:, sample.position])
+        self.assertEqual(self.put(url, b'x', len(data)).status_code, 409)
+
+    def test_cached_parser_survives_another_workers_rolled_back_chunk(self):
+        text, values = expression_table(genes=7000, samples=2)  # chunks span several FLUSH_ROWS blocks
+        data = text.encode()
+        url = self.start(data, filename='matrix.tsv')
+        chunk = len(data) // 3 + 1
+        self.put(url, data[:chunk], 0)
+        session = UploadSession.objects.get()
+        this_worker = dict(uploads._parsers)
+
+        uploads._parsers.clear()  # another worker gets the chunk, then its transaction rolls back
+        with mock.patch.object(UploadSession, 'save', side_effect=DatabaseError('connection lost')):
+            with self.assertRaises(DatabaseError):
+                uploads.append(session.id, self.patient, chunk, data[chunk:2 * chunk])
+        uploads._parsers.update(this_worker)
+
+        self.assertEqual(self.put(url, data[chunk:2 * chunk], chunk).status_code, 200)
+        self.assertEqual(self.put(url, data[2 * chunk:], 2 * chunk).status_code, 201)
+        session.refresh_from_db()
+        for sample in ExpressionSample.objects.filter(upload=session.upload):
+            np.testing.assert_array_equal(sample.load(), values[:, sample.position])
+        generations = os.listdir(os.path.join(settings.MEDIA_ROOT, uploads.expression_root(session)))
+        self.assertEqual(generations, [session.generation.hex])
+
+    def test_chunks_on_other_workers_are_not_replayed(self):
+        text, values = expression_table(genes=3000, samples=2)
+        data = gzip.compress(text.encode())
+        url = self.start(data)
+        chunk = len(data) // 4 + 1
+        fed = []
+        real_feed = ExpressionParser.feed
+
+        def feed(parser, block):
+            fed.append(len(block))
+            return real_feed(parser, block)
+
+        with mock.patch.object(ExpressionParser, 'feed', feed):
+            for offset in range(0, len(data), chunk):
+                uploads._parsers.clear()  # every chunk lands on a different worker
+                self.assertIn(self.put(url, data[offset:offset + chunk], offset).status_code, (200, 201))
+        self.assertEqual(sum(fed), chunk + len(data))  # the first chunk streamed, then one full parse
+        session = UploadSession.objects.get()
+        self.assertEqual((session.status, session.streaming), ('complete', False))
+        for sample in ExpressionSample.objects.filter(upload=session.upload):
+            np.testing.assert_array_equal(sample.load(), values[:, sample.position])
+
+    def test_unparseable_table_fails_the_session(self):
+        data = b'ID_REF\tGSM1\nTNF\thigh\n'
+        url = self.start(data, filename='bad.tsv')
+        response = self.put(url, data, 0)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['status'], 'failed')
+        self.assertIn('Line 2', response.json()['error'])
+        self.assertFalse(FileUpload.objects.exists())
+
+    def test_limits_and_ownership(self):
+        data = b'ID_REF\tGSM1\nTNF\t1\n'
+        url = self.start(data)
+        self.assertEqual(self.put(url, data + b'extra', 0).status_code, 400)  # past the announced size
+        with mock.patch.object(uploads, 'MAX_CHUNK_SIZE', 4):
+            self.assertEqual(self.put(url, data, 0).status_code, 413)
+        other = User.objects.create(username='bob@genex.test')
+        self.assertEqual(self.client.get(url, **auth_headers(other)).status_code, 404)
+
+        self.put(url, data[:10], 0)
+        self.assertEqual(self.client.delete(url, **self.headers).status_code, 204)
+        self.assertFalse(UploadSession.objects.exists())
+        for root, _, files in os.walk(settings.MEDIA_ROOT):
+            self.assertEqual(files, [], root)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Every api endpoint with its worst-case (cold cache) query count. The data
+    has several patients, rows and notes per list, so a per-row query would
+    break the budget. Raise a budget only together with the reason.
+    """
+    query_budgets = {
+        ('GET', 'api/'): 0,
+        ('GET', 'api/$'): 0,  # DRF router root, shadowed by api_root
+        ('POST', 'api/signup/'): 6,  # exists check, insert, response version, pending links, search index (2)
+        ('POST', 'api/signin/'): 1,
+        ('GET', 'api/profile/'): 2,  # auth, response version (ETag)
+        ('PATCH', 'api/profile/'): 6,  # auth, current row, update, response version, search index (2)
+        # Reads and writes of per-user data also read or bump the response version
+        ('GET', 'api/medicines/$'): 3,
+        ('POST', 'api/medicines/$'): 3,
+        ('DELETE', 'api/medicines/(?P<pk>[^/.]+)/$'): 4,  # auth, get, soft delete, version
+        ('GET', 'api/symptoms/$'): 4,  # auth, version, reports, doctor notes
+        ('POST', 'api/symptoms/$'): 9,  # a batch: see BulkCreateTests
+        ('PATCH', 'api/symptoms/(?P<pk>[^/.]+)/$'): 8,  # auth, get, notes, update, rollup read + upsert, version, response
+        ('GET', 'api/search-patients/'): 3,
+        ('POST', 'api/send-request/'): 5,
+        ('GET', 'api/patient/requests/'): 3,
+        ('POST', 'api/patient/requests/<int:request_id>/update/'): 4,
+        ('GET', 'api/doctor/my-patients/'): 2,
+        ('GET', 'api/doctor/dashboard/'): 5,
+        ('GET', 'api/doctor/patient-records/<int:patient_id>/'): 5,  # auth, patient + access, medicines, symptoms, notes
+        ('GET', 'api/doctor/patient-trends/<int:patient_id>/'): 3,
+        ('GET', 'api/sync/'): 5,
+        ('POST', 'api/doctor/add-note/<int:symptom_id>/'): 7,  # auth, report, insert, touch report (2), version, notes
+        ('POST', 'api/uploads/'): 2,
+        ('GET', 'api/uploads/<uuid:session_id>/'): 2,
+        ('PUT', 'api/uploads/<uuid:session_id>/'): 7,  # auth, locked session (+ savepoint pair), update; last: file + samples
+        ('DELETE', 'api/uploads/<uuid:session_id>/'): 3,
+        ('GET', 'api/async/profile/'): 2,
+        ('GET', 'api/async/medicines/'): 3,
+        ('GET', 'api/async/symptoms/'): 4,
+        ('GET', 'api/async/patient/requests/'): 3,
+        ('GET', 'api/async/doctor/my-patients/'): 2,
+        ('GET', 'api/async/doctor/dashboard/'): 5,
+    }
+
+    def setUp(self):
+        self.client = Client(HTTP_HOST='localhost')
+        self.doctor = User.objects.create_user(username='dr.house@genex.test', password='x', role='doctor')
+        self.patients = [User.objects.create(username=f'p{i}@genex.test') for i in range(3)]
+        for patient in self.patients:
+            DoctorPatient.objects.create(doctor=self.doctor, patient=patient, status='accepted')
+            for name in ('Methotrexate', 'Prednisone'):
+                Medicine.objects.create(user=patient, name=name)
+            for name in ('Fatigue', 'Rash'):
+                report = SymptomReport.objects.create(user=patient, symptom_name=name, severity=3, frequency='Daily')
+                DoctorNote.objects.create(symptom=report, author=self.doctor, text='Rest')
+        self.patient = self.patients[0]
+
+    def check(self, method, path, user=None, data=None, offset=None):
+        kwargs = auth_headers(user) if user else {}
+        if offset is not None:  # an upload chunk
+            kwargs.update(data=data, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+        elif data is not None:
+            kwargs.update(data=data, content_type='application/json')
+        response = self.request_within_budget(method, path, **kwargs)
+        self.assertLess(response.status_code, 400, response.content)
+        return response
+
+    def test_every_api_route_has_a_budget(self):
+        self.assertEqual(unbudgeted_routes(self.query_budgets), [])
+
+    def test_account_endpoints(self):
+        self.check('GET', '/api/')
+        self.check('POST', '/api/signup/', data={'email': 'new@genex.test', 'password': 'x', 'name': 'New'})
+        self.check('POST', '/api/signin/', data={'username': 'dr.house@genex.test', 'password': 'x'})
+        self.check('GET', '/api/profile/', self.patient)
+        self.check('PATCH', '/api/profile/', self.patient, {'age': 40})
+        self.check('GET', '/api/sync/', self.patient)
+
+    def test_patient_log_endpoints(self):
+        medicine = Medicine.objects.filter(user=self.patient).first()
+        symptom = SymptomReport.objects.filter(user=self.patient).first()
+        self.check('GET', '/api/medicines/', self.patient)
+        self.check('POST', '/api/medicines/', self.patient, {'name': 'Folic acid'})
+        self.check('DELETE', f'/api/medicines/{medicine.id}/', self.patient)
+        self.check('GET', '/api/symptoms/', self.patient)
+        self.check('POST', '/api/symptoms/', self.patient, {'symptom_name': 'Rash', 'severity': 2, 'frequency': 'Daily'})
+        self.check('POST', '/api/symptoms/', self.patient, [
+            {'symptom_name': f's{i}', 'severity': 2, 'frequency': 'Daily', 'client_id': f'c{i}'} for i in range(5)])
+        self.check('PATCH', f'/api/symptoms/{symptom.id}/', self.patient, {'severity': 5})
+
+    def test_doctor_endpoints(self):
+        self.check('GET', '/api/search-patients/?query=p1', self.doctor)
+        self.check('POST', '/api/send-request/', self.doctor, {'patient_username': 'someone@genex.test'})
+        self.check('GET', '/api/doctor/my-patients/', self.doctor)
+        self.check('GET', '/api/doctor/dashboard/', self.doctor)
+        self.check('GET', f'/api/doctor/patient-records/{self.patient.id}/', self.doctor)
+        self.check('GET', f'/api/doctor/patient-trends/{self.patient.id}/', self.doctor)
+        symptom = SymptomReport.objects.filter(user=self.patient).first()
+        self.check('POST', f'/api/doctor/add-note/{symptom.id}/', self.doctor, {'note': 'Iron'})
+
+    def test_request_endpoints(self):
+        link = DoctorPatient.objects.create(doctor=self.doctor, patient=self.patients[1], status='pending')
+        self.check('GET', '/api/patient/requests/', self.patients[1])
+        self.check('POST', f'/api/patient/requests/{link.id}/update/', self.patients[1], {'action': 'accept'})
+
+    def test_upload_endpoints(self):
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        data = gzip.compress(expression_table(genes=50, samples=6)[0].encode())
+        url = f"/api/uploads/{self.check('POST', '/api/uploads/', self.patient, {'filename': 'a.gz', 'size': len(data)}).json()['id']}/"
+        self.check('PUT', url, self.patient, data[:100], offset=0)
+        self.check('GET', url, self.patient)
+        self.check('PUT', url, self.patient, data[100:], offset=100)  # last chunk: completes the upload
+        self.check('DELETE', url, self.patient)
+
+    def test_async_endpoints(self):
+        for path in ('profile', 'medicines', 'symptoms', 'patient/requests'):
+            self.check('GET', f'/api/async/{path}/', self.patient)
+        self.check('GET', '/api/async/doctor/my-patients/', self.doctor)
+        self.check('GET', '/api/async/doctor/dashboard/', self.doctor)
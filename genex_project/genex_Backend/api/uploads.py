@@ -0,0 +1,224 @@
+"""
+Chunked, resumable uploads of expression tables (UploadSession).
+
+    POST   /api/uploads/        {"filename", "size"}  -> 201, "id" and "offset": 0
+    PUT    /api/uploads/<id>/   raw bytes, header Upload-Offset: <offset>
+                                -> 200 with the new offset; 201 with "upload" after the last byte
+    GET    /api/uploads/<id>/   -> where to resume ("offset") after a dropped connection
+    DELETE /api/uploads/<id>/   abandons the upload
+
+A chunk is only accepted at the session's current offset (otherwise 409 with
+the offset to resume from), so resending a chunk whose response was lost is
+harmless. Each chunk is appended to the stored file and fed to the session's
+ExpressionParser (api/expression.py) in the same request: the per-sample
+float32 vectors grow while the upload is in progress, and the last chunk
+only finalizes them and creates the FileUpload and its ExpressionSamples.
+
+Parsers are kept in the process that received the first chunk (a zlib
+stream can't be saved to the database), so uploads should be routed to one
+worker per session (sticky sessions, e.g. on the session id in the URL).
+A chunk that reaches a worker without the session's current parser (another
+worker, a restart, an evicted parser, a chunk whose transaction rolled back)
+doesn't replay what was received: the session stops streaming and the stored
+file is parsed once, from the start, after the last chunk. Whatever the
+routing, every byte is read at most twice. Each parser writes to a directory
+of its own, named by the session's `generation`, and a cached parser is only
+used while the session still streams with its generation.
+
+Files are appended to in place, so the default storage must be the local
+FileSystemStorage. Abandoned sessions are removed after EXPIRE_HOURS
+(manage.py purge_upload_sessions).
+"""
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .expression import GENES_FILE, ExpressionFormatError, ExpressionParser, sample_filename
+from .models import ExpressionSample, FileUpload, UploadSession
+
+OPTIONS = getattr(settings, 'API_UPLOADS', {})
+CHUNK_SIZE = OPTIONS.get('CHUNK_SIZE', 4 << 20)
+MAX_CHUNK_SIZE = OPTIONS.get('MAX_CHUNK_SIZE', 16 << 20)
+MAX_SIZE = OPTIONS.get('MAX_SIZE', 2 << 30)
+PARSERS = OPTIONS.get('PARSERS', 16)
+EXPIRE_HOURS = OPTIONS.get('EXPIRE_HOURS', 48)
+READ_BLOCK = 1 << 20
+
+
+class UploadError(ValueError):
+    status_code = 400
+
+
+class UploadConflict(UploadError):
+    """The chunk doesn't start at the session's offset, or the session is closed."""
+    status_code = 409
+
+
+# --- Storage names ---
+
+def file_name(session):
+    """Storage name of the uploaded file; the FileUpload keeps it once complete."""
+    return f'uploads/{session.id.hex}-{get_valid_filename(session.filename) or "upload"}'
+
+
+def expression_root(session):
+    return f'uploads/expression/{session.id.hex}'
+
+
+def expression_dir(session):
+    """Where the parser of the session's current generation writes its vectors."""
+    return f'{expression_root(session)}/{session.generation.hex}'
+
+
+# --- Parsers of open sessions in this process ---
+
+_parsers = OrderedDict()
+_lock = threading.Lock()
+
+
+def _parser(session):
+    """
+    The session's parser, positioned at session.received, or None once the
+    session no longer streams (the caller saves the session's changes).
+    """
+    if not session.streaming:
+        return None
+    with _lock:
+        generation, parser = _parsers.get(session.id, (None, None))
+        if parser is not None:
+            _parsers.move_to_end(session.id)
+    if parser is not None and generation == session.generation and parser.consumed == session.received:
+        return parser
+    if session.received:  # this worker doesn't have the bytes parsed so far
+        session.streaming = False
+        _forget(session)
+        return None
+    return _new_parser(session)
+
+
+def _new_parser(session):
+    session.generation = uuid.uuid4()
+    parser = ExpressionParser(default_storage.path(expression_dir(session)))
+    with _lock:
+        _parsers[session.id] = (session.generation, parser)
+        while len(_parsers) > PARSERS:
+            _parsers.popitem(last=False)
+    return parser
+
+
+def _parse_stored(session):
+    """A new parser fed the whole stored file (sessions that stopped streaming)."""
+    parser = _new_parser(session)
+    with open(default_storage.path(file_name(session)), 'rb') as f:
+        for block in iter(lambda: f.read(READ_BLOCK), b''):
+            parser.feed(block)
+    if parser.consumed != session.received:
+        raise UploadError("Stored upload doesn't match its offset")
+    return parser
+
+
+def _forget(session):
+    with _lock:
+        _parsers.pop(session.id, None)
+
+
+# --- Protocol ---
+
+def start(user, filename, size):
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError("size must be an integer") from None
+    if not filename:
+        raise UploadError("filename is required")
+    if not 0 < size <= MAX_SIZE:
+        raise UploadError(f"size must be between 1 and {MAX_SIZE} bytes")
+
+    session = UploadSession(user=user, filename=str(filename)[:255], size=size)
+    path = default_storage.path(file_name(session))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    session.save(force_insert=True)
+    return session
+
+
+def append(session_id, user, offset, data):
+    """
+    Appends `data` at `offset` and parses it. Returns the session, which is
+    'complete' after the last chunk and 'failed' if the table can't be parsed.
+    Raises UploadSession.DoesNotExist, UploadError.
+    """
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(id=session_id, user=user)
+        if session.status != 'open':
+            raise UploadConflict(f"Upload is {session.status}")
+        if offset != session.received:
+            raise UploadConflict(f"Expected offset {session.received}, got {offset}")
+        if session.received + len(data) > session.size:
+            raise UploadError("Chunk extends past the announced size")
+
+        with open(default_storage.path(file_name(session)), 'ab') as f:
+            f.truncate(session.received)  # drop bytes of an earlier attempt that wasn't committed
+            f.write(data)
+        try:
+            parser = _parser(session)
+            if parser is not None:
+                parser.feed(data)
+            session.received += len(data)
+            if session.received == session.size:
+                _finish(session, parser or _parse_stored(session))
+        except ExpressionFormatError as e:
+            _discard_files(session)
+            session.status, session.error = 'failed', str(e)
+        session.save()
+    return session
+
+
+def _finish(session, parser):
+    session.gene_count = parser.close()
+    session.sample_count = len(parser.samples)
+    directory = expression_dir(session)
+    upload = FileUpload.objects.create(user_id=session.user_id, file=file_name(session),
+                                       genes=f'{directory}/{GENES_FILE}')
+    ExpressionSample.objects.bulk_create([
+        ExpressionSample(upload=upload, name=name[:255], position=position,
+                         values=f'{directory}/{sample_filename(position)}')
+        for position, name in enumerate(parser.samples)
+    ], batch_size=500)
+    session.upload = upload
+    session.status = 'complete'
+    _forget(session)
+    for entry in os.scandir(default_storage.path(expression_root(session))):
+        if entry.name != session.generation.hex:  # the streaming parser's, once the file was parsed again
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _discard_files(session):
+    _forget(session)
+    shutil.rmtree(default_storage.path(expression_root(session)), ignore_errors=True)
+    default_storage.delete(file_name(session))
+
+
+def abort(session):
+    """Deletes an unfinished session and its files (a complete one keeps its FileUpload)."""
+    if session.status != 'complete':
+        _discard_files(session)
+    session.delete()
+
+
+def purge_stale(hours=None):
+    """Aborts open sessions without a chunk in `hours` (default EXPIRE_HOURS). Returns how many."""
+    cutoff = timezone.now() - timedelta(hours=EXPIRE_HOURS if hours is None else hours)
+    stale = list(UploadSession.objects.filter(status='open', updated_at__lt=cutoff))
+    for session in stale:
+        abort(session)
+    return len(stale)
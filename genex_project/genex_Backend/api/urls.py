@@ -5,6 +5,7 @@ from .views import api_root, signup, signin, ProfileView, MedicineViewSet, Sympt
 from .views import PatientSearchView
 from .views import send_patient_request # Import the new view
 from . import views  # <--- THIS LINE IS MISSING
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'medicines', MedicineViewSet, basename='medicine')
@@ -21,6 +22,19 @@ urlpatterns = [
     path('patient/requests/', views.get_patient_requests, name='patient-requests'),
     path('patient/requests/<int:request_id>/update/', views.update_request_status, name='update-request'),
     path('doctor/my-patients/', views.get_my_patients, name='doctor-patients'),
+    path('doctor/dashboard/', views.get_doctor_dashboard, name='doctor-dashboard'),
     path('doctor/patient-records/<int:patient_id>/', views.get_patient_medical_details),
+    path('doctor/patient-trends/<int:patient_id>/', views.get_patient_trends, name='patient-trends'),
+    path('sync/', views.sync_changes, name='sync'),
     path('doctor/add-note/<int:symptom_id>/', views.add_doctor_note, name='add-doctor-note'),
+    path('uploads/', views.start_upload, name='start-upload'),
+    path('uploads/<uuid:session_id>/', views.upload_session, name='upload-session'),
+
+    # Async (ASGI) versions of the read-heavy GETs above (api/async_views.py)
+    path('async/profile/', async_views.profile, name='async-profile'),
+    path('async/medicines/', async_views.medicines, name='async-medicines'),
+    path('async/symptoms/', async_views.symptoms, name='async-symptoms'),
+    path('async/patient/requests/', async_views.patient_requests, name='async-patient-requests'),
+    path('async/doctor/my-patients/', async_views.my_patients, name='async-doctor-patients'),
+    path('async/doctor/dashboard/', async_views.doctor_dashboard, name='async-doctor-dashboard'),
 ]
\ No newline at end of file
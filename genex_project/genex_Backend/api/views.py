@@ -4,11 +4,15 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.db import connection
+from django.db.models import Exists, OuterRef, Prefetch, prefetch_related_objects
 
 # ✅ IMPORTS: Ensure all your models and serializers are here
-from .models import User, Medicine, SymptomReport, DoctorPatient
+from .models import User, Medicine, SymptomReport, DoctorPatient, DoctorNote, UploadSession, doctor_notes_prefetch
+from . import caching, rollups, search, sync, uploads
+from .bulk import BulkCreateMixin
+from .authentication import CachedJWTAuthentication, TOKEN_VERSION_CLAIM, token_version
+from .pagination import OptionalCursorPagination, MedicinePagination, PatientSearchPagination
 from .serializers import (
     UserSerializer, 
     MedicineSerializer, 
@@ -21,11 +25,65 @@ print("\n\n🔥 RELOADING VIEWS.PY - IF YOU SEE THIS, THE NEW CODE IS ACTIVE! 
 def get_tokens_for_user(user):
     """Generates an access token for a specific user."""
     refresh = RefreshToken.for_user(user)
+    # Token version: tokens issued before a password change stop authenticating
+    refresh[TOKEN_VERSION_CLAIM] = token_version(user)
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token),
     }
 
+# --- Helpers: response shapes shared by the doctor views ---
+def patient_summary(p):
+    return {
+        "id": p.id,  # <--- THIS WAS MISSING! CRITICAL FIX.
+        "name": p.first_name if p.first_name else p.username, # Fallback if name is empty
+        "email": p.username,
+        "age": p.age,
+        "gender": p.gender,
+        "weight": p.weight,
+        "height": p.height,
+    }
+
+
+def symptom_payload(s):
+    # Prefetch doctor_notes (with_doctor_notes) when building many of these
+    return {
+        "id": s.id,
+        # ✅ SEND BOTH KEYS so Flutter never misses it
+        "symptom": s.symptom_name,       
+        "symptom_name": s.symptom_name,  
+        "severity": s.severity,
+        "frequency": s.frequency,
+        "notes": s.full_notes,
+        "doctor_notes": [note_payload(n) for n in s.doctor_notes.all()],
+        "created_at": s.created_at,
+    }
+
+
+def note_payload(n):
+    return {"id": n.id, "author": n.author_name, "text": n.text, "created_at": n.created_at}
+
+
+def with_doctor_notes(symptoms):
+    return symptoms.prefetch_related(doctor_notes_prefetch())
+
+
+def medicine_payload(m):
+    # The keys Medicine.objects.values() returned before the sync/idempotency columns
+    return {"id": m.id, "user_id": m.user_id, "name": m.name, "added_at": m.added_at}
+
+
+def link_payload(link):
+    return {
+        "id": link.id,
+        "doctor_id": link.doctor_id,
+        "doctor_name": link.doctor_username,
+        "patient_id": link.patient_id,
+        "patient_name": link.patient_username,
+        "status": link.status,
+        "appointment_date": link.appointment_date,
+    }
+
 # --- API Root ---
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -67,6 +125,8 @@ def signup(request):
         height=data.get('height'),
         weight=data.get('weight'),
     )
+    # Doctors may have sent requests to this email before the account existed
+    DoctorPatient.attach_pending_links(user)
 
     tokens = get_tokens_for_user(user)
     return Response({
@@ -112,15 +172,18 @@ def signin(request):
 
 class ProfileView(views.APIView):
     """View to retrieve or update the authenticated user's profile."""
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        serializer = UserSerializer(request.user)
-        return Response(serializer.data)
+        # ETag/Last-Modified + per-user payload cache (api/caching.py)
+        return caching.respond(request, 'profile', lambda: Response(UserSerializer(request.user).data))
 
     def patch(self, request):
-        serializer = UserSerializer(request.user, data=request.data, partial=True)
+        # request.user may be a cached copy (CachedJWTAuthentication) and save() writes every
+        # column: start from the current row so a stale password/is_active isn't written back.
+        user = User.objects.get(pk=request.user.pk)
+        serializer = UserSerializer(user, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -129,50 +192,101 @@ class ProfileView(views.APIView):
 
 # --- Medicine Views ---
 
-class MedicineViewSet(viewsets.ModelViewSet):
-    """Handles List, Create, and Delete for Patient Medicines."""
-    authentication_classes = [JWTAuthentication]
+class MedicineViewSet(caching.CachedListMixin, BulkCreateMixin, viewsets.ModelViewSet):
+    """Handles List, Create (one or a list), and Delete for Patient Medicines."""
+    cache_resource = 'medicines'  # list() is conditional/cached per user
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = MedicineSerializer
+    pagination_class = MedicinePagination  # opt-in: ?page_size= / ?cursor=
 
     def get_queryset(self):
-        return Medicine.objects.filter(user=self.request.user).order_by('-added_at')
+        return Medicine.objects.filter(user=self.request.user).order_by('-added_at', '-id')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class SymptomViewSet(viewsets.ModelViewSet):
-    """Handles List and Create for Patient Symptoms."""
-    authentication_classes = [JWTAuthentication]
+class SymptomViewSet(caching.CachedListMixin, BulkCreateMixin, viewsets.ModelViewSet):
+    """Handles List and Create (one or a list) for Patient Symptoms."""
+    cache_resource = 'symptoms'  # list() is conditional/cached per user
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = SymptomReportSerializer
+    pagination_class = OptionalCursorPagination  # opt-in: ?page_size= / ?cursor=
 
     def get_queryset(self):
-        return SymptomReport.objects.filter(user=self.request.user).order_by('-created_at')
+        return with_doctor_notes(SymptomReport.objects.filter(user=self.request.user).order_by('-created_at', '-id'))
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def after_bulk_create(self, rows):
+        rollups.refresh(rows)  # bulk_create skips the post_save receiver
+        # Retried keys may already have notes; one query for the response's notes
+        prefetch_related_objects(rows, doctor_notes_prefetch())
+
+
+# --- Delta Sync ---
+
+@api_view(['GET'])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def sync_changes(request):
+    """
+    Profile plus the medicines, symptom reports and doctor links changed since
+    ?since=<cursor> (everything when omitted). Deleted rows are listed by id.
+    Store the returned cursor and send it next time (api/sync.py).
+    """
+    try:
+        changes = sync.collect(request.user, request.query_params.get('since'))
+    except sync.InvalidCursor as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    medicines, deleted_medicines = changes['medicines']
+    symptoms, deleted_symptoms = changes['symptoms']
+    links, deleted_links = changes['links']
+    return Response({
+        "cursor": changes['cursor'],
+        "full": changes['full'],  # true: replace the local copy instead of merging
+        "profile": UserSerializer(request.user).data,
+        "medicines": {"updated": MedicineSerializer(medicines, many=True).data, "deleted": deleted_medicines},
+        "symptoms": {"updated": SymptomReportSerializer(symptoms, many=True).data, "deleted": deleted_symptoms},
+        "requests": {"updated": [link_payload(l) for l in links], "deleted": deleted_links},
+    }, status=status.HTTP_200_OK)
+
 
 # --- Doctor / Patient Interaction Views ---
 
 class PatientSearchView(generics.ListAPIView):
     """API View specifically for searching patients."""
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated] 
     serializer_class = PatientSerializer
+    pagination_class = PatientSearchPagination  # opt-in: ?page_size= / ?cursor=
 
     def get_queryset(self):
-        queryset = User.objects.filter(role='patient')
         search_query = self.request.query_params.get('query', None)
         if search_query:
-            queryset = queryset.filter(username__icontains=search_query)
-        return queryset
+            # Ranked prefix search on username, first name and email (api/search.py)
+            try:
+                limit = max(1, min(int(self.request.query_params.get('limit', search.DEFAULT_LIMIT)), 200))
+            except ValueError:
+                limit = search.DEFAULT_LIMIT
+            ids = search.search_patient_ids(search_query, limit=limit)
+            users = User.objects.in_bulk(ids)
+            return [users[i] for i in ids if i in users]
+        return User.objects.filter(role='patient').order_by('username')
+
+    def paginate_queryset(self, queryset):
+        # Search results come back ranked and already limited
+        if isinstance(queryset, list):
+            return None
+        return super().paginate_queryset(queryset)
 
 
 @api_view(['POST'])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def send_patient_request(request):
     """Allows a Doctor to send a connection request to a Patient."""
@@ -185,80 +299,57 @@ def send_patient_request(request):
         return Response({'error': 'Patient username is required'}, status=status.HTTP_400_BAD_REQUEST)
 
     # Check if Request Already Exists
-    # We use __iexact to ensure case-insensitive matching
-    if DoctorPatient.objects.filter(
-        doctor_username=doctor_user.username, 
-        patient_username__iexact=patient_username
-    ).exists():
+    # Case-insensitive: keys are stored case-folded, so this is an indexed equality match
+    patient_key = DoctorPatient.lookup_key(patient_username)
+    if DoctorPatient.objects.filter(doctor=doctor_user, patient_key=patient_key).exists():
         return Response({'message': 'Request already exists'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Save the Request
+    # Save the Request (the patient may not have signed up yet; signup links it later)
     try:
+        patient = User.objects.filter(username__lower=patient_key).order_by('id').first()
         DoctorPatient.objects.create(
+            doctor=doctor_user,
+            patient=patient,
             doctor_username=doctor_user.username,
             patient_username=patient_username,
             status='pending'
         )
-        print(f"SUCCESS: Linked Doctor {doctor_user.username} with Patient {patient_username}")
         return Response({'message': 'Request sent successfully'}, status=status.HTTP_201_CREATED)
     except Exception as e:
         print(f"Error saving: {e}")
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET'])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def get_patient_requests(request):
-    print("\n========== 🕵️ NUCLEAR DEBUG MODE ==========")
-    
-    # 1. Who are you?
-    current_user = request.user.username
-    print(f"👤 YOU ARE LOGGED IN AS: '{current_user}'")
-
-    # 2. What is in the database? (Print EVERYTHING)
-    all_requests = DoctorPatient.objects.all()
-    print(f"📦 TOTAL ROWS IN DB: {all_requests.count()}")
-    
-    for req in all_requests:
-        print(f"   -> Row ID {req.id}: Patient='{req.patient_username}' | Doctor='{req.doctor_username}'")
-        
-        # Check if it matches manually
-        if req.patient_username.lower().strip() == current_user.lower().strip():
-             print("      ✅ MATCH FOUND (Python comparison)")
-        else:
-             print("      ❌ NO MATCH")
-
-    # 3. actually filter
-    my_requests = DoctorPatient.objects.filter(
-        patient_username__iexact=current_user
-    ).order_by('-id')
-
-    print(f"📉 DJANGO FILTER FOUND: {my_requests.count()}")
+    """Connection requests sent to the logged-in patient, newest first."""
+    def build():
+        # One query on the (patient, status) index
+        my_requests = DoctorPatient.objects.filter(patient=request.user).order_by('-id')
+
+        data = []
+        for req in my_requests:
+            data.append({
+                "id": req.id,
+                "doctor_name": req.doctor_username,
+                "status": req.status,
+                "date": "Today"
+            })
+        return Response(data, status=status.HTTP_200_OK)
 
-    # 4. Return whatever we found
-    data = []
-    for req in my_requests:
-        data.append({
-            "id": req.id,
-            "doctor_name": req.doctor_username,
-            "status": req.status,
-            "date": "Today"
-        })
-    
-    return Response(data, status=status.HTTP_200_OK)
+    return caching.respond(request, 'patient-requests', build)
 
 @api_view(['POST'])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def update_request_status(request, request_id):
     """Allows Patient to Accept/Reject a request."""
-    user_email = request.user.username
-    
     try:
         # Find the request AND ensure it belongs to this patient
         connection = DoctorPatient.objects.get(
             id=request_id, 
-            patient_username__iexact=user_email
+            patient=request.user
         )
     except DoctorPatient.DoesNotExist:
         return Response({"error": "Request not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -277,111 +368,118 @@ def update_request_status(request, request_id):
 # --- Doctor Dashboard Views ---
 
 @api_view(['GET'])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def get_my_patients(request):
-    print("\n========== 👨‍⚕️ DOCTOR DEBUG MODE ==========")
-    
-    # 1. Who is asking?
-    current_doctor = request.user.username
-    print(f"🩺 LOGGED IN AS: '{current_doctor}'")
+    """Patients who accepted the logged-in doctor's request."""
+    # One JOIN query driven by the (doctor, status) index
+    patients = User.objects.filter(
+        doctor_links__doctor=request.user,
+        doctor_links__status='accepted',
+        doctor_links__deleted_at__isnull=True,
+    ).distinct().order_by('id')
 
-    # 2. What is in the database? (Print EVERYTHING)
-    all_connections = DoctorPatient.objects.all()
-    print(f"📦 TOTAL CONNECTIONS IN DB: {all_connections.count()}")
+    data = [patient_summary(p) for p in patients]
 
-    found_any = False
-    
-    for c in all_connections:
-        print(f"   -> ID {c.id}: Doctor='{c.doctor_username}' | Patient='{c.patient_username}' | Status='{c.status}'")
-        
-        # Check strict match
-        if c.doctor_username == current_doctor:
-            print("      ✅ STRICT MATCH: Doctor username matches exactly.")
-            if c.status == 'accepted':
-                 print("      🎉 STATUS MATCH: This should appear in your list!")
-                 found_any = True
-            else:
-                 print(f"      ⚠️ STATUS MISMATCH: Status is '{c.status}', not 'accepted'.")
-        
-        # Check case-insensitive match (The likely fix)
-        elif c.doctor_username.lower() == current_doctor.lower():
-            print("      ⚠️ CASE MISMATCH: Names match but capitalization is different.")
-            if c.status == 'accepted':
-                 found_any = True
-
-    # 3. actually filter using the robust method (Case Insensitive)
-    connections = DoctorPatient.objects.filter(
-        doctor_username__iexact=current_doctor, # Fixes capitalization issues
-        status='accepted'
-    )
-    
-    print(f"📉 FINAL QUERY RESULT: Found {connections.count()} patients.")
+    return Response(data, status=status.HTTP_200_OK)
 
-    # 4. Get the patient details
-    patient_usernames = [c.patient_username for c in connections]
-    patients = User.objects.filter(username__in=patient_usernames)
+
+# Latest symptom reports included per patient on the dashboard (?symptoms=N)
+DASHBOARD_SYMPTOMS = 5
+DASHBOARD_MAX_SYMPTOMS = 50
+
+
+@api_view(['GET'])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def get_doctor_dashboard(request):
+    """
+    Every accepted patient with their medicines and latest N symptom reports,
+    in one call. Replaces my-patients + one patient-records call per patient.
+    Always five queries (auth, patients, medicines, symptoms, doctor notes),
+    however many patients the doctor has; the per-patient symptom limit is
+    applied in SQL with a window function (Django's sliced Prefetch).
+    """
+    try:
+        limit = max(0, min(int(request.query_params.get('symptoms', DASHBOARD_SYMPTOMS)), DASHBOARD_MAX_SYMPTOMS))
+    except ValueError:
+        return Response({"error": "symptoms must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    patients = User.objects.filter(
+        doctor_links__doctor=request.user,
+        doctor_links__status='accepted',
+        doctor_links__deleted_at__isnull=True,
+    ).distinct().order_by('id').prefetch_related(
+        Prefetch('medicines', queryset=Medicine.objects.order_by('-added_at', '-id'), to_attr='current_medicines'),
+        Prefetch('symptoms', queryset=with_doctor_notes(SymptomReport.objects.order_by('-created_at', '-id'))[:limit],
+                 to_attr='latest_symptoms'),
+    )
 
     data = []
     for p in patients:
         data.append({
-            "id": p.id,  # <--- THIS WAS MISSING! CRITICAL FIX.
-            "name": p.first_name if p.first_name else p.username, # Fallback if name is empty
-            "email": p.username,
-            "age": p.age,
-            "gender": p.gender,
-            "weight": p.weight,
-            "height": p.height,
+            **patient_summary(p),
+            "medicines": [medicine_payload(m) for m in p.current_medicines],
+            "symptoms": [symptom_payload(s) for s in p.latest_symptoms],
         })
 
     return Response(data, status=status.HTTP_200_OK)
+# Weeks of symptom trends returned by default / at most (?weeks=N)
+TREND_WEEKS = 12
+TREND_MAX_WEEKS = 104
+
+
+@api_view(['GET'])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def get_patient_trends(request, patient_id):
+    """
+    Weekly count / mean / max severity per symptom for a patient, oldest week
+    first, read from the rollup table (api/rollups.py). Open to the patient
+    and to doctors the patient accepted. ?symptom= narrows it to one symptom.
+    """
+    try:
+        weeks = max(1, min(int(request.query_params.get('weeks', TREND_WEEKS)), TREND_MAX_WEEKS))
+    except ValueError:
+        return Response({"error": "weeks must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if request.user.id != patient_id and not DoctorPatient.objects.filter(
+            doctor=request.user, patient_id=patient_id, status='accepted').exists():
+        return Response({"error": "Access Denied"}, status=status.HTTP_403_FORBIDDEN)
+
+    return Response({
+        "patient_id": patient_id,
+        "weeks": weeks,
+        "symptoms": rollups.trends(patient_id, weeks, request.query_params.get('symptom')),
+    }, status=status.HTTP_200_OK)
+
+
 # --- Doctor: View Patient Records ---
 
 @api_view(['GET'])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def get_patient_medical_details(request, patient_id):
-    doctor_username = request.user.username
-    
     try:
-        # 1. Get the Patient
-        target_patient = User.objects.get(id=patient_id)
-        
-        # 2. Check Permission
-        has_access = DoctorPatient.objects.filter(
-            doctor_username=doctor_username,
-            patient_username=target_patient.username,
+        # 1. Get the Patient, and 2. Check Permission, in one query
+        target_patient = User.objects.annotate(has_access=Exists(DoctorPatient.objects.filter(
+            doctor=request.user,
+            patient=OuterRef('pk'),
             status='accepted'
-        ).exists()
+        ))).get(id=patient_id)
 
-        if not has_access:
+        if not target_patient.has_access:
             return Response({"error": "Access Denied"}, status=status.HTTP_403_FORBIDDEN)
 
         # 3. Fetch Medicines
-        medicines = Medicine.objects.filter(user=target_patient).values()
+        medicines = [medicine_payload(m) for m in Medicine.objects.filter(user=target_patient)]
 
         # 4. Fetch Symptoms
-        raw_symptoms = SymptomReport.objects.filter(user=target_patient)
-        
-        # DEBUG PRINT: Verify count in terminal
-        print(f"🔍 FOUND {raw_symptoms.count()} SYMPTOMS FOR {target_patient.username}")
-
-        symptoms_data = []
-        for s in raw_symptoms:
-            symptoms_data.append({
-                "id": s.id,
-                # ✅ SEND BOTH KEYS so Flutter never misses it
-                "symptom": s.symptom_name,       
-                "symptom_name": s.symptom_name,  
-                "severity": s.severity,
-                "frequency": s.frequency,
-                "notes": s.notes,
-                "created_at": s.created_at,
-            })
+        symptoms_data = [symptom_payload(s) for s in with_doctor_notes(SymptomReport.objects.filter(user=target_patient))]
 
         return Response({
             "patient_name": target_patient.first_name,
-            "medicines": list(medicines),
+            "medicines": medicines,
             "symptoms": symptoms_data 
         }, status=status.HTTP_200_OK)
 
@@ -393,10 +491,10 @@ def get_patient_medical_details(request, patient_id):
     # ... existing imports ...
 
 @api_view(['POST'])
-@authentication_classes([JWTAuthentication])
+@authentication_classes([CachedJWTAuthentication])
 @permission_classes([IsAuthenticated])
 def add_doctor_note(request, symptom_id):
-    """Appends a Doctor's note to a specific Symptom Report."""
+    """Adds a Doctor's note to a specific Symptom Report."""
     try:
         # 1. Find the specific symptom report
         report = SymptomReport.objects.get(id=symptom_id)
@@ -406,21 +504,93 @@ def add_doctor_note(request, symptom_id):
         if not doctor_note:
             return Response({"error": "Note cannot be empty"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 3. Append to existing notes (Safe way, preserves patient's text)
-        original_notes = report.notes if report.notes else ""
-        
-        # Format: "Original Text" + "--- Doctor: New Text"
-        updated_notes = f"{original_notes}\n\n Doctor: {doctor_note}".strip()
-        
-        report.notes = updated_notes
-        report.save()
+        # 3. Insert it as its own row: the report isn't rewritten, so concurrent notes can't overwrite each other
+        DoctorNote.objects.create(
+            symptom=report,
+            author=request.user,
+            author_name=request.user.first_name or request.user.username,
+            text=doctor_note,
+        )
 
         return Response({
             "message": "Note saved successfully", 
-            "new_notes": updated_notes
+            "new_notes": report.full_notes  # patient notes + every doctor note, as before
         }, status=status.HTTP_200_OK)
 
     except SymptomReport.DoesNotExist:
         return Response({"error": "Symptom not found"}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# --- Resumable uploads of expression tables (api/uploads.py) ---
+
+def upload_session_payload(session):
+    return {
+        "id": str(session.id),
+        "filename": session.filename,
+        "size": session.size,
+        "offset": session.received,
+        "chunk_size": uploads.CHUNK_SIZE,
+        "status": session.status,
+        "error": session.error,
+        "upload_id": session.upload_id,
+        "genes": session.gene_count,
+        "samples": session.sample_count,
+    }
+
+
+@api_view(['POST'])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def start_upload(request):
+    """Opens an upload session; the file is then sent with PUTs to upload_session."""
+    try:
+        session = uploads.start(request.user, request.data.get('filename'), request.data.get('size'))
+    except uploads.UploadError as e:
+        return Response({"error": str(e)}, status=e.status_code)
+    return Response(upload_session_payload(session), status=status.HTTP_201_CREATED,
+                    headers={'Location': f'/api/uploads/{session.id}/'})
+
+
+@api_view(['GET', 'PUT', 'DELETE'])
+@authentication_classes([CachedJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def upload_session(request, session_id):
+    """GET: progress/offset to resume at. PUT: the next chunk (Upload-Offset header). DELETE: abandon."""
+    if request.method == 'PUT':
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return Response({"error": "Upload-Offset and Content-Length headers are required"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if length > uploads.MAX_CHUNK_SIZE:
+            return Response({"error": f"Chunks are limited to {uploads.MAX_CHUNK_SIZE} bytes"},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        # Read the raw body directly: no parser, and no DATA_UPLOAD_MAX_MEMORY_SIZE check
+        data = request.stream.read(length) if length else b''
+        try:
+            session = uploads.append(session_id, request.user, offset, data)
+        except UploadSession.DoesNotExist:
+            return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+        except uploads.UploadConflict as e:
+            current = UploadSession.objects.filter(id=session_id, user=request.user).first()
+            return Response({"error": str(e), **(upload_session_payload(current) if current else {})},
+                            status=e.status_code)
+        except uploads.UploadError as e:
+            return Response({"error": str(e)}, status=e.status_code)
+
+        if session.status == 'failed':
+            return Response(upload_session_payload(session), status=status.HTTP_400_BAD_REQUEST)
+        code = status.HTTP_201_CREATED if session.status == 'complete' else status.HTTP_200_OK
+        return Response(upload_session_payload(session), status=code)
+
+    try:
+        session = UploadSession.objects.get(id=session_id, user=request.user)
+    except UploadSession.DoesNotExist:
+        return Response({"error": "Upload not found"}, status=status.HTTP_404_NOT_FOUND)
+    if request.method == 'DELETE':
+        uploads.abort(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(upload_session_payload(session))
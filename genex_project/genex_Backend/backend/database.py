@@ -0,0 +1,80 @@
+"""
+DATABASES['default'] built from environment variables.
+
+GENEX_DB_ENGINE=sqlite (default)
+    GENEX_DB_NAME                 file path (default BASE_DIR/db.sqlite3)
+    GENEX_SQLITE_JOURNAL_MODE     WAL (default): readers don't block the writer
+                                  and commits append to the log instead of
+                                  rewriting pages. DELETE is SQLite's own default.
+    GENEX_SQLITE_SYNCHRONOUS      NORMAL (default): with WAL, fsync at checkpoints
+                                  rather than on every commit. A power loss can
+                                  drop the last commits but not corrupt the file.
+    GENEX_SQLITE_BUSY_TIMEOUT     seconds a connection waits for the write lock
+                                  before "database is locked" (default 20).
+    GENEX_SQLITE_TRANSACTION_MODE IMMEDIATE (default): atomic() takes the write
+                                  lock up front, so it queues on the busy timeout
+                                  instead of failing when a read lock can't be
+                                  upgraded.
+
+GENEX_DB_ENGINE=postgresql
+    GENEX_DB_NAME / _USER / _PASSWORD / _HOST / _PORT
+    GENEX_DB_CONN_MAX_AGE         seconds a connection is reused across requests
+                                  (default 60, 0 = per request). Health checks
+                                  replace connections the server has dropped.
+    GENEX_DB_POOL=1               use psycopg 3's connection pool instead
+                                  (shared by a worker's threads; CONN_MAX_AGE
+                                  must be 0). GENEX_DB_POOL_MIN/MAX size it.
+"""
+import os
+
+
+def _env(environ, name, default):
+    value = environ.get(name)
+    return default if value in (None, '') else value
+
+
+def sqlite_config(base_dir, environ):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': _env(environ, 'GENEX_DB_NAME', base_dir / 'db.sqlite3'),
+        'OPTIONS': {
+            # Run on every new connection (journal_mode is persistent, the others aren't)
+            'init_command': (
+                f"PRAGMA journal_mode={_env(environ, 'GENEX_SQLITE_JOURNAL_MODE', 'WAL')};"
+                f"PRAGMA synchronous={_env(environ, 'GENEX_SQLITE_SYNCHRONOUS', 'NORMAL')};"
+            ),
+            'timeout': float(_env(environ, 'GENEX_SQLITE_BUSY_TIMEOUT', 20)),
+            'transaction_mode': _env(environ, 'GENEX_SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+        },
+    }
+
+
+def postgresql_config(environ):
+    config = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': _env(environ, 'GENEX_DB_NAME', 'genex'),
+        'USER': _env(environ, 'GENEX_DB_USER', ''),
+        'PASSWORD': _env(environ, 'GENEX_DB_PASSWORD', ''),
+        'HOST': _env(environ, 'GENEX_DB_HOST', ''),
+        'PORT': _env(environ, 'GENEX_DB_PORT', ''),
+        'CONN_MAX_AGE': int(_env(environ, 'GENEX_DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    if _env(environ, 'GENEX_DB_POOL', '0') == '1':
+        config['CONN_MAX_AGE'] = 0  # Django refuses persistent connections together with a pool
+        config['CONN_HEALTH_CHECKS'] = False  # the pool checks connections itself
+        config['OPTIONS']['pool'] = {
+            'min_size': int(_env(environ, 'GENEX_DB_POOL_MIN', 2)),
+            'max_size': int(_env(environ, 'GENEX_DB_POOL_MAX', 10)),
+        }
+    return config
+
+
+def database_config(base_dir, environ=os.environ):
+    engine = _env(environ, 'GENEX_DB_ENGINE', 'sqlite')
+    if engine in ('sqlite', 'sqlite3'):
+        return sqlite_config(base_dir, environ)
+    if engine in ('postgresql', 'postgres'):
+        return postgresql_config(environ)
+    raise ValueError(f"GENEX_DB_ENGINE must be 'sqlite' or 'postgresql', not {engine!r}")
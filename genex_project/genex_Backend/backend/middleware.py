@@ -0,0 +1,72 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import REGISTRY, track_queries
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'genex_http_requests_total', 'HTTP requests by route, method and status.', ['route', 'method', 'status'],
+)
+HTTP_ERRORS = REGISTRY.counter(
+    'genex_http_errors_total', 'HTTP responses with status >= 400, by route and status.', ['route', 'status'],
+)
+HTTP_DURATION = REGISTRY.histogram(
+    'genex_http_request_duration_seconds', 'Time spent handling a request.', ['route', 'method'],
+)
+DB_QUERIES = REGISTRY.histogram(
+    'genex_db_queries_per_request', 'SQL queries issued per request.', ['route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100, 250),
+)
+DB_DURATION = REGISTRY.histogram(
+    'genex_db_time_per_request_seconds', 'Time spent in SQL per request.', ['route'],
+)
+
+
+class MetricsMiddleware:
+    """
+    Records duration, status and SQL query count/time for every request.
+    Requests are labelled with their URL pattern (e.g. api/doctor/patient-records/<int:patient_id>/),
+    not the raw path, so ids don't create new series.
+    Works for both sync and async views without forcing a thread switch.
+    With DB_QUERY_HEADERS (default: DEBUG), responses carry the request's
+    query count and DB time as X-DB-Queries / X-DB-Time-Ms headers.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with track_queries() as queries:
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with track_queries() as queries:
+            response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+
+    @staticmethod
+    def record(request, response, elapsed, queries):
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else 'unmatched'
+        status = str(response.status_code)
+        HTTP_REQUESTS.inc(route=route, method=request.method, status=status)
+        if response.status_code >= 400:
+            HTTP_ERRORS.inc(route=route, status=status)
+        HTTP_DURATION.observe(elapsed, route=route, method=request.method)
+        DB_QUERIES.observe(queries.count, route=route)
+        DB_DURATION.observe(queries.duration, route=route)
+        if getattr(settings, 'DB_QUERY_HEADERS', settings.DEBUG):
+            response['X-DB-Queries'] = str(queries.count)
+            response['X-DB-Time-Ms'] = f'{queries.duration * 1000:.2f}'
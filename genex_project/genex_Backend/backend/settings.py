@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 
+from .database import database_config
+
 #os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'genex_Backend.settings')
 
 
@@ -50,7 +52,7 @@ INSTALLED_APPS = [
 ]
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -60,6 +62,7 @@ REST_FRAMEWORK = {
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # ✅ must be first
+    'backend.middleware.MetricsMiddleware',  # request time, status and SQL query counts for /metrics
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -92,11 +95,10 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite in WAL mode by default; GENEX_DB_* environment variables select
+# PostgreSQL and tune either engine (see backend/database.py).
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(BASE_DIR),
 }
 
 
@@ -154,4 +156,80 @@ CORS_ALLOW_HEADERS = [
     "user-agent",
     "x-csrftoken",
     "x-requested-with",
+    "upload-offset",  # resumable uploads (/api/uploads/)
 ]
+
+# --- ML model registry (ml_api) ---
+# Named joblib artifacts. The first entry is the default; others can be
+# selected per request with ?model=<name>. MMAP_MODE='r' memory-maps large
+# arrays (only for artifacts saved without compression).
+ML_MODELS = {
+    'default': {
+        'PATH': BASE_DIR / 'ml_api' / 'calibrated_model.joblib',
+        'MMAP_MODE': None,
+    },
+}
+# Seconds between checks of the artifact on disk for hot reload.
+ML_MODEL_CHECK_INTERVAL = 5.0
+# Score with the NumPy-compiled model when the pipeline supports it.
+ML_COMPILED_SCORER = True
+# In-process LRU+TTL cache of predict_xai results. BACKEND names an optional
+# CACHES alias shared between workers. Set to None to disable.
+ML_PREDICTION_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TTL': 300,
+    'BACKEND': None,
+}
+# Threads available for model calls made from async views.
+ML_INFERENCE_WORKERS = 4
+# Micro-batching of concurrent predict_xai/async/ requests under ASGI:
+# flush when MAX_BATCH_SIZE requests are queued or after MAX_WAIT seconds.
+# Beyond MAX_PENDING queued/in-flight requests, new ones get 503 (None: no limit).
+ML_MICROBATCH = {
+    'MAX_BATCH_SIZE': 64,
+    'MAX_WAIT': 0.005,
+    'MAX_PENDING': 1024,
+}
+# JSON rule table (marker/operator/threshold/message) for rule-based explanations.
+ML_EXPLANATION_RULES = BASE_DIR / 'ml_api' / 'explanation_rules.json'
+# 'model' = DiseaseXAILayer feature contributions, 'rules' = ML_EXPLANATION_RULES.
+ML_EXPLANATIONS = 'model'
+
+# Per-user payload cache for polled api endpoints (profile, medicines,
+# symptoms, patient requests). ETags and 304s work without it (versions are
+# kept in the database). Off by default: the default cache is per process, so
+# workers would serve stale payloads. To enable, add a CACHES entry every
+# worker shares (Redis, Memcached, database) and set e.g.
+# API_RESPONSE_CACHE = {'ALIAS': 'shared', 'TTL': 300}  # TTL: seconds a payload is kept
+API_RESPONSE_CACHE = None
+
+# In-process cache of authenticated users (api.authentication), so requests
+# don't load the User row. Entries are dropped on save in this process; other
+# processes see changes within TTL seconds. Set to None to disable.
+API_AUTH_USER_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TTL': 60,
+}
+
+# Delta sync (/api/sync/): rows changed within OVERLAP_SECONDS before a cursor
+# are sent again, so late-committing writes aren't missed. Deleted rows are kept
+# as tombstones for TOMBSTONE_DAYS (manage.py purge_tombstones).
+API_SYNC = {
+    'OVERLAP_SECONDS': 5,
+    'TOMBSTONE_DAYS': 90,
+}
+
+# Resumable uploads of expression tables (/api/uploads/, api/uploads.py).
+# CHUNK_SIZE is suggested to clients; larger chunks than MAX_CHUNK_SIZE get 413.
+# PARSERS open sessions keep their parser in memory per process (others replay
+# the bytes received so far); unfinished sessions expire after EXPIRE_HOURS.
+API_UPLOADS = {
+    'CHUNK_SIZE': 4 * 1024 * 1024,
+    'MAX_CHUNK_SIZE': 16 * 1024 * 1024,
+    'MAX_SIZE': 2 * 1024 * 1024 * 1024,
+    'PARSERS': 16,
+    'EXPIRE_HOURS': 48,
+}
+
+# Add X-DB-Queries / X-DB-Time-Ms headers (SQL per request) to every response.
+DB_QUERY_HEADERS = DEBUG
@@ -0,0 +1,79 @@
+from pathlib import Path
+
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+
+from .database import database_config
+from .metrics import MetricsRegistry
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    def test_histogram_renders_cumulative_buckets(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram('latency_seconds', 'Latency.', ['stage'], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value, stage='model')
+        text = registry.render()
+        self.assertIn('# TYPE latency_seconds histogram', text)
+        self.assertIn('latency_seconds_bucket{stage="model",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{stage="model",le="1.0"} 2', text)
+        self.assertIn('latency_seconds_bucket{stage="model",le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_count{stage="model"} 3', text)
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.counter('requests_total', 'Requests.', ['route']).inc(route='a"b\\c')
+        self.assertIn('requests_total{route="a\\"b\\\\c"} 1', registry.render())
+
+
+class MetricsEndpointTests(TestCase):
+    @staticmethod
+    def sample(text, series):
+        for line in text.splitlines():
+            if line.startswith(series + ' '):
+                return float(line.rsplit(' ', 1)[1])
+        return 0.0
+
+    def test_requests_and_queries_are_exported(self):
+        client = Client(HTTP_HOST='localhost')
+        queries = 'genex_db_queries_per_request_sum{route="api/signin/"}'
+        # The registry is process-wide: other tests' requests are in it too
+        before = self.sample(client.get('/metrics').content.decode(), queries)
+        response = client.post('/api/signin/', {'username': 'nobody', 'password': 'x'},
+                               content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['X-DB-Queries'], '1')
+
+        text = client.get('/metrics').content.decode()
+        self.assertIn('genex_http_requests_total{route="api/signin/",method="POST",status="401"}', text)
+        self.assertIn('genex_http_errors_total{route="api/signin/",status="401"}', text)
+        # The user lookup is one query.
+        self.assertEqual(self.sample(text, queries) - before, 1)
+        self.assertIn('genex_predict_stage_seconds', text)
+
+    @override_settings(DB_QUERY_HEADERS=False)
+    def test_query_headers_can_be_turned_off(self):
+        response = Client(HTTP_HOST='localhost').get('/api/')
+        self.assertNotIn('X-DB-Queries', response)
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    def test_sqlite_defaults_to_wal(self):
+        config = database_config(Path('/srv/genex'), environ={})
+        self.assertEqual(config['NAME'], Path('/srv/genex/db.sqlite3'))
+        self.assertIn('PRAGMA journal_mode=WAL;', config['OPTIONS']['init_command'])
+        self.assertIn('PRAGMA synchronous=NORMAL;', config['OPTIONS']['init_command'])
+        self.assertEqual(config['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+
+    def test_postgresql_persistent_or_pooled(self):
+        environ = {'GENEX_DB_ENGINE': 'postgresql', 'GENEX_DB_NAME': 'genex', 'GENEX_DB_CONN_MAX_AGE': '300'}
+        config = database_config(Path('.'), environ=environ)
+        self.assertEqual((config['CONN_MAX_AGE'], config['CONN_HEALTH_CHECKS']), (300, True))
+        self.assertNotIn('pool', config['OPTIONS'])
+
+        pooled = database_config(Path('.'), environ={**environ, 'GENEX_DB_POOL': '1'})
+        self.assertEqual(pooled['CONN_MAX_AGE'], 0)
+        self.assertEqual(pooled['OPTIONS']['pool'], {'min_size': 2, 'max_size': 10})
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            database_config(Path('.'), environ={'GENEX_DB_ENGINE': 'mysql'})
@@ -18,12 +18,15 @@ from django.contrib import admin
 from django.urls import path, include
 from django.http import HttpResponse
 
+from .metrics import metrics_view
+
 def home(request):
     return HttpResponse("Welcome to Genex Backend")
 
 urlpatterns = [
     path('', home),  # handles /
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view),  # Prometheus scrape target
     path('api/', include('api.urls')),
     path('', include('ml_api.urls')), # Connect your app's URLs here
         
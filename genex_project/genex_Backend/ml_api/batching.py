@@ -0,0 +1,98 @@
+"""
+Asyncio micro-batching for inference under ASGI.
+
+Concurrent single-patient requests each pay the model's fixed per-call
+overhead. MicroBatcher queues them on the event loop and flushes when the
+queue reaches max_batch_size or the oldest request has waited max_wait
+seconds. Each flush runs one handler call (one vectorized predict_proba) in
+a bounded thread pool, off the event loop, and resolves every waiting
+request with its own result.
+
+With max_pending set, submit() refuses new work (raises Overloaded) while
+that many requests are already queued or being scored, so a burst larger
+than the inference pool can absorb fails fast instead of growing the queue
+and every request's latency without bound.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Overloaded(Exception):
+    """submit() was called with max_pending requests already outstanding."""
+
+
+class MicroBatcher:
+    def __init__(self, handler, max_batch_size=64, max_wait=0.005, executor=None, max_pending=None):
+        """
+        handler(items) -> results is a synchronous callable returning one result
+        per item, in order. It runs in `executor` (a private pool if None).
+        max_pending (None: unbounded) caps queued plus in-flight items.
+        """
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.executor = executor or ThreadPoolExecutor(max_workers=2, thread_name_prefix='microbatch')
+        self._loop = None
+        self._pending = []
+        self._timer = None
+        self.outstanding = 0
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+
+    async def submit(self, item):
+        """Queues one item and waits for its result (or the handler's exception). Raises Overloaded."""
+        if self.max_pending is not None and self.outstanding >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded(f"{self.outstanding} inference requests already pending")
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Futures are bound to one loop; a new loop (e.g. tests) starts a fresh queue.
+            self._loop, self._pending, self._timer = loop, [], None
+
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        self.outstanding += 1
+        try:
+            return await future
+        finally:
+            self.outstanding -= 1
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            self._loop.create_task(self._run(batch))
+
+    async def _run(self, batch):
+        items = [item for item, _ in batch]
+        self.batches += 1
+        self.items += len(items)
+        try:
+            results = await self._loop.run_in_executor(self.executor, self.handler, items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            # A client that disconnected cancels its future; skip it.
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+            'outstanding': self.outstanding,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,225 @@
+"""
+Helpers for offline bulk scoring (manage.py score_patients).
+
+Input tables are read in fixed-size chunks, turned into the same payload
+dicts Flutter sends to predict_xai, and scored in worker processes through
+views.predict_rows, so the feature mapping, model and explanations match the
+API exactly. Worker functions live at module level so they can be pickled.
+"""
+import math
+import os
+
+import pandas as pd
+
+from .features import MARKER_FIELDS, NUMERIC_FIELDS
+
+# Payload key -> alternative column name accepted in input files (the model's
+# own column names, as in the training data).
+PAYLOAD_ALIASES = {'Age': 'Age', 'Gender': 'Gender', **{v: k for k, v in NUMERIC_FIELDS.items()},
+                   **{v: k for k, v in MARKER_FIELDS.items()}}
+
+TRUE_STRINGS = {'1', 'true', 't', 'yes', 'y', 'positive', 'pos', '+'}
+FALSE_STRINGS = {'0', 'false', 'f', 'no', 'n', 'negative', 'neg', '-', ''}
+
+
+def _is_blank(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def parse_marker(value):
+    """CSV cells for boolean markers: true/false, 1/0, Positive/Negative, blank."""
+    if _is_blank(value):
+        return None
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in TRUE_STRINGS:
+        return True
+    if text in FALSE_STRINGS:
+        return False
+    raise ValueError(f"Can't read {value!r} as a positive/negative marker")
+
+
+def resolve_columns(columns):
+    """Maps payload keys to the input column that holds them. Raises if nothing matches."""
+    columns = set(columns)
+    mapping = {}
+    for key, alias in PAYLOAD_ALIASES.items():
+        if key in columns:
+            mapping[key] = key
+        elif alias in columns:
+            mapping[key] = alias
+    if not mapping:
+        raise ValueError(
+            "Input has none of the expected columns (e.g. Age, Gender, ESR, CRP, RF, Anti_CCP, HLA_B27 ...)"
+        )
+    return mapping
+
+
+def chunk_to_records(frame, mapping):
+    """
+    Turns a DataFrame chunk into (payload, parse_error) pairs. Payloads use
+    the Flutter key names predict_xai expects.
+    """
+    records = []
+    columns = {key: frame[column].tolist() for key, column in mapping.items()}
+    for i in range(len(frame)):
+        payload = {}
+        try:
+            for key, values in columns.items():
+                value = values[i]
+                if key in MARKER_FIELDS.values():
+                    payload[key] = parse_marker(value)
+                elif not _is_blank(value):
+                    payload[key] = value
+            records.append((payload, None))
+        except ValueError as e:
+            records.append((None, str(e)))
+    return records
+
+
+def require_pyarrow(*paths):
+    """Parquet I/O is optional; fail early with a clear message if pyarrow is missing."""
+    if any(path.endswith('.parquet') for path in paths):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet files require pyarrow (pip install pyarrow)")
+
+
+def iter_chunks(path, chunk_size):
+    """Yields DataFrames of at most chunk_size rows from a CSV (optionally compressed) or Parquet file."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+# Parquet types of the result columns. A chunk's own types can't be used for
+# the file: a column that is empty in the first chunk (no errors yet) would
+# be typed null and every later chunk with a value would be rejected.
+RESULT_TYPES = {
+    'row': 'int64',
+    'disease_prediction': 'string',
+    'confidence': 'float64',
+    'xai_explanation': 'string',
+    'error': 'string',
+    'model_version': 'string',
+}
+
+
+class ChunkWriter:
+    """Appends result chunks to a CSV or Parquet file without holding earlier chunks in memory."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith('.parquet')
+        self._writer = None
+        self._first = True
+
+    def write(self, frame):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, _result_schema(frame))
+            self._writer.write_table(pa.Table.from_pandas(frame, schema=self._writer.schema, preserve_index=False))
+        else:
+            frame.to_csv(self.path, mode='w' if self._first else 'a', header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def _result_schema(frame):
+    """RESULT_TYPES for the result columns; copied input columns (the id) keep the first chunk's type."""
+    import pyarrow as pa
+    fields = []
+    for field in pa.Schema.from_pandas(frame, preserve_index=False):
+        if field.name in RESULT_TYPES:
+            field = field.with_type(pa.type_for_alias(RESULT_TYPES[field.name]))
+        elif pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+# --- Worker process side ---
+
+_worker = {}
+
+
+def init_worker(model_name, explanations):
+    """Process-pool initializer: loads the model once per worker."""
+    if 'DJANGO_SETTINGS_MODULE' not in os.environ:
+        os.environ['DJANGO_SETTINGS_MODULE'] = 'backend.settings'
+    import django
+    django.setup()
+
+    from . import views
+    # Bulk input rarely repeats; don't grow a per-process cache.
+    views.prediction_cache = None
+    current = views.registry.get(model_name)
+    if current is None:
+        raise RuntimeError('Model file not found or failed to load.')
+    _worker.update(views=views, current=current, explanations=explanations)
+
+
+def score_records(start, records):
+    """Scores one chunk of (payload, parse_error) records; returns a result DataFrame."""
+    from .features import to_feature_row
+    from .inference import score_rows
+
+    views, current = _worker['views'], _worker['current']
+    out = {
+        'row': list(range(start, start + len(records))),
+        'disease_prediction': [None] * len(records),
+        'confidence': [None] * len(records),
+        'xai_explanation': [None] * len(records),
+        'error': [None] * len(records),
+    }
+
+    rows, positions = [], []
+    for i, (payload, error) in enumerate(records):
+        if error is None:
+            try:
+                rows.append(to_feature_row(payload))
+                positions.append(i)
+                continue
+            except ValueError as e:
+                error = str(e)
+        out['error'][i] = error
+
+    def score(chunk):
+        if _worker['explanations']:
+            return views.predict_rows(current, chunk)
+        labels, confidences, _ = score_rows(current.model, chunk, current.compiled)
+        return [{'disease_prediction': str(label), 'confidence': confidence}
+                for label, confidence in zip(labels, confidences.tolist())]
+
+    try:
+        results = score(rows) if rows else []
+    except Exception:
+        # A row the model or the explanations can't handle fails the whole
+        # pass; score the chunk row by row so only that row gets the error.
+        results = []
+        for row in rows:
+            try:
+                results.append(score([row])[0])
+            except Exception as e:
+                results.append({'error': str(e) or type(e).__name__})
+    for i, result in zip(positions, results):
+        for column, value in result.items():
+            out[column][i] = value
+
+    frame = pd.DataFrame(out)
+    if not _worker['explanations']:
+        frame = frame.drop(columns=['xai_explanation'])
+    frame['model_version'] = current.version
+    return frame
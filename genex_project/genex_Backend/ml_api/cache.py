@@ -0,0 +1,118 @@
+"""
+Prediction cache for predict_xai.
+
+Clients re-submit the same lab panel often (re-opening the results screen,
+retries), so results are cached by a canonical hash of the normalized feature
+row plus the model version. The in-process LRU is always consulted first; an
+optional Django cache alias (e.g. a shared Redis/Memcached) sits behind it so
+workers can share results.
+"""
+import hashlib
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+from .features import FEATURE_COLUMNS
+
+
+def _canonical(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        value = float(value)
+        if math.isnan(value):
+            return None  # NaN and None both mean "missing" to the imputer
+        return value + 0.0  # folds -0.0 into 0.0
+    return value
+
+
+def feature_key(row, model_version):
+    """Stable cache key for a feature row (see features.to_feature_row) under a model version."""
+    canonical = [model_version] + [_canonical(row.get(column)) for column in FEATURE_COLUMNS]
+    blob = json.dumps(canonical, separators=(',', ':'), default=str)
+    return 'predict_xai:' + hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+class PredictionCache:
+    """Bounded LRU with per-entry TTL, optionally backed by a Django cache alias."""
+
+    def __init__(self, max_entries=10000, ttl=300, backend=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = caches[backend] if backend else None
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.shared_hits = 0
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Returns None when ML_PREDICTION_CACHE is set to None (caching disabled)."""
+        options = getattr(settings, 'ML_PREDICTION_CACHE', {})
+        if options is None:
+            return None
+        return cls(
+            max_entries=options.get('MAX_ENTRIES', 10000),
+            ttl=options.get('TTL', 300),
+            backend=options.get('BACKEND'),
+        )
+
+    def get(self, key):
+        now = self._clock()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+
+        value = self.backend.get(key) if self.backend is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.shared_hits += 1
+        self._store(key, value, now)
+        return value
+
+    def set(self, key, value):
+        self._store(key, value, self._clock())
+        if self.backend is not None:
+            self.backend.set(key, value, timeout=self.ttl)
+
+    def _store(self, key, value, now):
+        with self._lock:
+            self._data[key] = (now + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'shared_hits': self.shared_hits,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
@@ -0,0 +1,259 @@
+"""
+Pandas-free scorer for the calibrated model.
+
+The pickled model is CalibratedClassifierCV(Pipeline(prep=ColumnTransformer,
+clf=LogisticRegression)). Scoring it through sklearn means building a
+DataFrame and walking the ColumnTransformer for every calibrated fold, which
+dominates per-request latency. compile_model() reads the fitted parameters
+out once (imputer statistics, scaler mean/scale, one-hot category maps, LR
+coefficients and calibrator curves) and scores feature rows with plain NumPy.
+
+Each fold keeps its own parameters instead of averaging them: the isotonic
+calibrators are non-linear, so averaging coefficients would not reproduce the
+pipeline's probabilities. compile_model() returns None for anything it does
+not recognise, and callers fall back to the joblib pipeline.
+"""
+import numpy as np
+from scipy.special import expit
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+
+class NotCompilable(Exception):
+    """Raised internally when a fitted estimator uses a feature we don't support."""
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+class _NumericBlock:
+    """SimpleImputer (optional) followed by StandardScaler (optional)."""
+
+    def __init__(self, columns, steps):
+        self.columns = list(columns)
+        self.fill = None
+        self.mean = None
+        self.scale = None
+
+        steps = list(steps)
+        if steps and isinstance(steps[0], SimpleImputer):
+            self.fill = _imputer_statistics(steps.pop(0)).astype(float)
+        if steps and isinstance(steps[0], StandardScaler):
+            scaler = steps.pop(0)
+            self.mean = scaler.mean_ if scaler.with_mean else None
+            self.scale = scaler.scale_ if scaler.with_std else None
+        if steps:
+            raise NotCompilable(f"unsupported numeric step {type(steps[0]).__name__}")
+
+    @property
+    def width(self):
+        return len(self.columns)
+
+    def transform(self, raw):
+        """raw is the (n, k) float matrix for self.columns, NaN marking missing values."""
+        X = raw.copy()
+        if self.fill is not None:
+            missing = np.isnan(X)
+            X[missing] = np.broadcast_to(self.fill, X.shape)[missing]
+        if self.mean is not None:
+            X -= self.mean
+        if self.scale is not None:
+            X /= self.scale
+        return X
+
+
+class _CategoricalBlock:
+    """SimpleImputer (optional) followed by OneHotEncoder."""
+
+    def __init__(self, columns, steps):
+        self.columns = list(columns)
+        self.fill = None
+
+        steps = list(steps)
+        if len(steps) == 2 and isinstance(steps[0], SimpleImputer):
+            self.fill = list(_imputer_statistics(steps.pop(0)))
+        encoder = steps[0] if len(steps) == 1 else None
+        if not isinstance(encoder, OneHotEncoder):
+            raise NotCompilable("categorical block must end in a OneHotEncoder")
+        if encoder.drop is not None or getattr(encoder, "_infrequent_enabled", False):
+            raise NotCompilable("OneHotEncoder with drop/infrequent categories")
+
+        self.ignore_unknown = encoder.handle_unknown in ("ignore", "infrequent_if_exist")
+        # One {category: output column} map per input column.
+        self.maps = []
+        offset = 0
+        for categories in encoder.categories_:
+            self.maps.append({c: offset + j for j, c in enumerate(categories)})
+            offset += len(categories)
+        self._width = offset
+
+    @property
+    def width(self):
+        return self._width
+
+    def transform(self, values):
+        """values is a list of per-row lists of raw category values for self.columns."""
+        X = np.zeros((len(values), self._width))
+        for i, row in enumerate(values):
+            for k, value in enumerate(row):
+                if self.fill is not None and _is_missing(value):
+                    value = self.fill[k]
+                j = self.maps[k].get(value)
+                if j is not None:
+                    X[i, j] = 1.0
+                elif not self.ignore_unknown:
+                    raise ValueError(f"Found unknown category {value!r} in column {self.columns[k]!r}")
+        return X
+
+
+def _imputer_statistics(imputer):
+    if imputer.add_indicator:
+        raise NotCompilable("SimpleImputer(add_indicator=True)")
+    if not _is_missing(imputer.missing_values):
+        raise NotCompilable("SimpleImputer with non-NaN missing_values")
+    statistics = np.asarray(imputer.statistics_)
+    if statistics.dtype.kind == "f" and np.isnan(statistics).any():
+        # The pipeline drops all-missing columns; not worth reproducing.
+        raise NotCompilable("SimpleImputer with empty features")
+    return statistics
+
+
+def _compile_block(columns, transformer):
+    steps = transformer.steps if isinstance(transformer, Pipeline) else [("only", transformer)]
+    estimators = [est for _, est in steps if est not in (None, "passthrough")]
+    if not all(isinstance(c, str) for c in columns):
+        raise NotCompilable("ColumnTransformer columns must be selected by name")
+    if estimators and isinstance(estimators[-1], OneHotEncoder):
+        return _CategoricalBlock(columns, estimators)
+    return _NumericBlock(columns, estimators)
+
+
+class _CompiledFold:
+    """One calibrated fold: preprocessing blocks, LR parameters and calibrators."""
+
+    def __init__(self, calibrated, classes):
+        pipeline = calibrated.estimator
+        if not isinstance(pipeline, Pipeline) or len(pipeline.steps) != 2:
+            raise NotCompilable("fold estimator must be Pipeline(prep, clf)")
+        prep, clf = pipeline.steps[0][1], pipeline.steps[1][1]
+        if not isinstance(prep, ColumnTransformer) or not isinstance(clf, LogisticRegression):
+            raise NotCompilable("fold estimator must be ColumnTransformer + LogisticRegression")
+
+        self.blocks = []
+        for name, transformer, columns in prep.transformers_:
+            if transformer == "drop":
+                continue
+            if name == "remainder" or transformer == "passthrough":
+                raise NotCompilable("ColumnTransformer remainder/passthrough columns")
+            self.blocks.append(_compile_block(columns, transformer))
+
+        self.coef = clf.coef_
+        self.intercept = clf.intercept_
+        width = sum(block.width for block in self.blocks)
+        if self.coef.shape[1] != width:
+            raise NotCompilable("transformed width does not match LR coefficients")
+
+        self.n_classes = len(classes)
+        self.class_indices = np.searchsorted(classes, clf.classes_)
+        self.calibrators = [_compile_calibrator(c) for c in calibrated.calibrators]
+
+    def transform(self, numeric_raw, categorical_raw, layout):
+        """Returns the dense preprocessed matrix, in ColumnTransformer output order."""
+        parts = []
+        for block, (start, stop) in zip(self.blocks, layout):
+            if isinstance(block, _NumericBlock):
+                parts.append(block.transform(numeric_raw[:, start:stop]))
+            else:
+                parts.append(block.transform([row[start:stop] for row in categorical_raw]))
+        return np.hstack(parts)
+
+    def predict_proba(self, Xp):
+        decision = Xp @ self.coef.T + self.intercept
+        n = Xp.shape[0]
+        proba = np.zeros((n, self.n_classes))
+        for class_idx, scores, calibrate in zip(self.class_indices, decision.T, self.calibrators):
+            if self.n_classes == 2:
+                # Binary LR exposes a single score for classes_[1].
+                class_idx += 1
+            proba[:, class_idx] = calibrate(scores)
+
+        if self.n_classes == 2:
+            proba[:, 0] = 1.0 - proba[:, 1]
+        else:
+            denominator = proba.sum(axis=1)[:, np.newaxis]
+            uniform = np.full_like(proba, 1 / self.n_classes)
+            proba = np.divide(proba, denominator, out=uniform, where=denominator != 0)
+        proba[(1.0 < proba) & (proba <= 1.0 + 1e-5)] = 1.0
+        return proba
+
+
+def _compile_calibrator(calibrator):
+    if hasattr(calibrator, "X_thresholds_"):
+        if calibrator.out_of_bounds != "clip":
+            raise NotCompilable("IsotonicRegression without out_of_bounds='clip'")
+        xs, ys = calibrator.X_thresholds_, calibrator.y_thresholds_
+        lo, hi = calibrator.X_min_, calibrator.X_max_
+        if len(ys) == 1:
+            return lambda scores: np.full(scores.shape, ys[0])
+        return lambda scores: np.interp(np.clip(scores, lo, hi), xs, ys)
+    if hasattr(calibrator, "a_") and hasattr(calibrator, "b_"):
+        a, b = calibrator.a_, calibrator.b_
+        return lambda scores: expit(-(a * scores + b))
+    raise NotCompilable(f"unsupported calibrator {type(calibrator).__name__}")
+
+
+class CompiledCalibratedModel:
+    """NumPy scorer numerically equivalent to the CalibratedClassifierCV it was built from."""
+
+    def __init__(self, model):
+        self.classes_ = np.asarray(model.classes_)
+        self.folds = [_CompiledFold(c, self.classes_) for c in model.calibrated_classifiers_]
+
+        # The raw input layout is shared by every fold, so rows are unpacked once.
+        # layout[i] is block i's column range in the numeric or categorical raw matrix.
+        self.numeric_columns, self.categorical_columns, self.layout = [], [], []
+        for block in self.folds[0].blocks:
+            target = self.numeric_columns if isinstance(block, _NumericBlock) else self.categorical_columns
+            self.layout.append((len(target), len(target) + len(block.columns)))
+            target.extend(block.columns)
+        for fold in self.folds[1:]:
+            if [b.columns for b in fold.blocks] != [b.columns for b in self.folds[0].blocks]:
+                raise NotCompilable("folds select different columns")
+
+    def _unpack(self, rows):
+        numeric_raw = np.array(
+            [[np.nan if _is_missing(row[c]) else float(row[c]) for c in self.numeric_columns] for row in rows],
+            dtype=float,
+        ).reshape(len(rows), len(self.numeric_columns))
+        categorical_raw = [[row[c] for c in self.categorical_columns] for row in rows]
+        return numeric_raw, categorical_raw
+
+    def transform_rows(self, rows, fold=0):
+        """Preprocessed feature matrix for one fold (what its LogisticRegression sees)."""
+        return self.folds[fold].transform(*self._unpack(rows), self.layout)
+
+    def predict_proba_rows(self, rows):
+        """rows are flat {column: value} dicts as produced by features.to_feature_row."""
+        numeric_raw, categorical_raw = self._unpack(rows)
+        proba = np.zeros((len(rows), len(self.classes_)))
+        for fold in self.folds:
+            Xp = fold.transform(numeric_raw, categorical_raw, self.layout)
+            proba += fold.predict_proba(Xp)
+        proba /= len(self.folds)
+        return proba
+
+
+def compile_model(model):
+    """Returns a CompiledCalibratedModel, or None if the model can't be compiled."""
+    if not isinstance(model, CalibratedClassifierCV) or not getattr(model, "calibrated_classifiers_", None):
+        return None
+    try:
+        return CompiledCalibratedModel(model)
+    except NotCompilable as e:
+        print(f"Compiled scorer unavailable, using the sklearn pipeline: {e}")
+        return None
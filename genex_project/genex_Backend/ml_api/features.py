@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+
+# Column order the calibrated pipeline was trained on.
+FEATURE_COLUMNS = [
+    "Age", "Gender", "ESR", "CRP", "RF", "Anti-CCP", "HLA-B27",
+    "ANA", "Anti-Ro", "Anti-La", "Anti-dsDNA", "Anti-Sm", "C3", "C4",
+]
+
+# Flutter sends lab values under these keys (underscores instead of dashes).
+NUMERIC_FIELDS = {
+    "ESR": "ESR",
+    "CRP": "CRP",
+    "RF": "RF",
+    "Anti-CCP": "Anti_CCP",
+    "C3": "C3",
+    "C4": "C4",
+}
+
+# Flutter sends these markers as booleans; the notebook uses "Positive"/"Negative".
+MARKER_FIELDS = {
+    "HLA-B27": "HLA_B27",
+    "ANA": "ANA",
+    "Anti-Ro": "Anti_Ro",
+    "Anti-La": "Anti_La",
+    "Anti-dsDNA": "Anti_dsDNA",
+    "Anti-Sm": "Anti_Sm",
+}
+
+
+def _as_number(value, field):
+    """Coerces a JSON value to float, raising a readable error for bad input."""
+    if isinstance(value, bool):
+        raise ValueError(f"'{field}' must be a number, got a boolean")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{field}' must be a number, got {value!r}")
+
+
+def to_feature_row(data):
+    """
+    Maps one Flutter payload to a flat {model column: value} dict.
+    Missing lab values become NaN so the pipeline's imputer handles them.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Each patient must be a JSON object")
+
+    age = data.get('Age', 0)
+    gender = data.get('Gender')
+    if gender is not None and not isinstance(gender, str):
+        raise ValueError(f"'Gender' must be a string, got {gender!r}")
+    row = {
+        "Age": np.nan if age is None else _as_number(age, 'Age'),
+        "Gender": 'Female' if gender is None else gender,
+    }
+    for column, key in NUMERIC_FIELDS.items():
+        value = data.get(key)
+        row[column] = np.nan if value is None else _as_number(value, key)
+    for column, key in MARKER_FIELDS.items():
+        row[column] = "Positive" if data.get(key) else "Negative"
+    return row
+
+
+def rows_to_frame(rows):
+    """Builds a single DataFrame (in training column order) for a batch of rows."""
+    return pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+
+
+def rows_to_columns(rows):
+    """Column-oriented view ({column: [values...]}) used by the explanation helpers."""
+    return {column: [row[column] for row in rows] for column in FEATURE_COLUMNS}
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_api import views
+from ml_api.batching import MicroBatcher
+from ml_api.features import to_feature_row
+from ml_api.registry import ModelVersion
+from ml_api.synthetic import synthetic_payloads
+from ml_api.xai import DiseaseXAILayer
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks micro-batched vs one-call-per-request inference with N "
+        "concurrent in-process clients (closed loop, prediction cache disabled)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', default='50,100,250,500',
+                            help='Comma-separated concurrency levels.')
+        parser.add_argument('--requests-per-client', type=int, default=4)
+        parser.add_argument('--max-batch-size', type=int, default=64)
+        parser.add_argument('--max-wait', type=float, default=0.005, help='Seconds.')
+        parser.add_argument('--workers', type=int, default=4, help='Inference threads.')
+        parser.add_argument('--pipeline', action='store_true',
+                            help='Score through the sklearn pipeline instead of the compiled scorer.')
+
+    def handle(self, *args, **options):
+        current = views.registry.get()
+        if current is None:
+            raise CommandError('Model failed to load.')
+        if options['pipeline']:
+            current = ModelVersion(
+                current.name, current.path, current.model, None, current.digest, current.stamp,
+                DiseaseXAILayer.for_model(current.model),
+            )
+
+        # Measure the model, not the cache.
+        views.prediction_cache = None
+
+        levels = [int(c) for c in options['clients'].split(',')]
+        per_client = options['requests_per_client']
+        rows = [to_feature_row(p) for p in synthetic_payloads(max(levels) * per_client, seed=11)]
+        executor = ThreadPoolExecutor(max_workers=options['workers'])
+        batcher = MicroBatcher(
+            views.predict_items,
+            max_batch_size=options['max_batch_size'],
+            max_wait=options['max_wait'],
+            executor=executor,
+        )
+
+        async def unbatched(row):
+            loop = asyncio.get_running_loop()
+            return (await loop.run_in_executor(executor, views.predict_items, [(current, row)]))[0]
+
+        async def batched(row):
+            return await batcher.submit((current, row))
+
+        scorer = 'sklearn pipeline' if current.compiled is None else 'compiled scorer'
+        self.stdout.write(f"Scoring with the {scorer}, {options['workers']} inference threads, "
+                          f"{per_client} requests per client.\n")
+        header = f"{'clients':>8} {'mode':>10} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'batch':>7}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+
+        for clients in levels:
+            for mode, call in (('unbatched', unbatched), ('batched', batched)):
+                batches_before, items_before = batcher.batches, batcher.items
+                throughput, latencies = asyncio.run(self._drive(call, rows, clients, per_client))
+                if mode == 'batched':
+                    batches = batcher.batches - batches_before
+                    mean_batch = (batcher.items - items_before) / batches if batches else 0.0
+                else:
+                    mean_batch = 1.0
+                p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+                self.stdout.write(
+                    f"{clients:>8} {mode:>10} {throughput:>10.1f} {p50:>9.2f} {p99:>9.2f} {mean_batch:>7.1f}"
+                )
+
+        executor.shutdown()
+
+    @staticmethod
+    async def _drive(call, rows, clients, per_client):
+        latencies = []
+
+        async def client(offset):
+            for k in range(per_client):
+                row = rows[(offset * per_client + k) % len(rows)]
+                started = time.perf_counter()
+                await call(row)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(i) for i in range(clients)))
+        elapsed = time.perf_counter() - started
+        return len(latencies) / elapsed, np.array(latencies)
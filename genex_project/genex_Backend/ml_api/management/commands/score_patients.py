@@ -0,0 +1,90 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_api.bulk import (
+    ChunkWriter, chunk_to_records, init_worker, iter_chunks, require_pyarrow, resolve_columns, score_records,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Scores a CSV/Parquet file of lab panels offline with the predict_xai model. "
+        "Input is streamed in chunks and scored in a process pool; memory stays "
+        "bounded by chunk size x in-flight chunks regardless of file size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='CSV (.csv, .csv.gz, ...) or .parquet file.')
+        parser.add_argument('output', help='Output .csv or .parquet file (overwritten).')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--model', default=None, help='Registry model name (default model if omitted).')
+        parser.add_argument('--id-column', default=None, help='Input column copied to the output (e.g. patient_id).')
+        parser.add_argument('--no-explanations', action='store_true', help='Only write predictions and confidences.')
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['input']):
+            raise CommandError(f"Input file not found: {options['input']}")
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size and --workers must be positive')
+        try:
+            require_pyarrow(options['input'], options['output'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        workers = options['workers']
+        # At most this many chunks are read but not yet written.
+        max_in_flight = workers * 2
+        writer = ChunkWriter(options['output'])
+        id_column = options['id_column']
+        mapping = None
+        pending = deque()
+        rows_done = 0
+        started = time.perf_counter()
+
+        def drain_one():
+            nonlocal rows_done
+            future, ids = pending.popleft()
+            frame = future.result()
+            if ids is not None:
+                frame.insert(0, id_column, ids)
+            writer.write(frame)
+            rows_done += len(frame)
+            self.stdout.write(f"  scored {rows_done} rows", ending='\r')
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(options['model'], not options['no_explanations']),
+        ) as pool:
+            try:
+                start = 0
+                for chunk in iter_chunks(options['input'], options['chunk_size']):
+                    if mapping is None:
+                        mapping = resolve_columns(chunk.columns)
+                        if id_column and id_column not in chunk.columns:
+                            raise ValueError(f"--id-column '{id_column}' not in input")
+                    ids = chunk[id_column].tolist() if id_column else None
+                    pending.append((pool.submit(score_records, start, chunk_to_records(chunk, mapping)), ids))
+                    start += len(chunk)
+                    # Results are written in input order; block on the oldest chunk
+                    # before reading more so memory stays bounded.
+                    while len(pending) >= max_in_flight:
+                        drain_one()
+                while pending:
+                    drain_one()
+            except ValueError as e:
+                raise CommandError(str(e))
+            finally:
+                writer.close()
+
+        self.stdout.write('')
+        elapsed = time.perf_counter() - started
+        rate = rows_done / elapsed if elapsed else 0.0
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {rows_done} rows in {elapsed:.1f}s ({rate:.0f} rows/s) -> {options['output']}"
+        ))
@@ -0,0 +1,27 @@
+"""
+Inference metrics, exported at /metrics (see backend.metrics).
+
+Each stage of a prediction is timed separately so a latency regression can
+be pinned on request parsing, feature mapping, the cache, DataFrame
+construction (pipeline path only), the model itself or explanation text.
+"""
+from backend.metrics import REGISTRY
+
+STAGE_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+
+PREDICT_STAGE_SECONDS = REGISTRY.histogram(
+    'genex_predict_stage_seconds',
+    'Time spent per prediction stage (parse, features, cache, frame, model, explain).',
+    ['stage'], buckets=STAGE_BUCKETS,
+)
+PREDICT_ROWS = REGISTRY.histogram(
+    'genex_predict_rows_per_call', 'Feature rows scored per model call (cache misses only).',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 5000),
+)
+
+
+def stage(name):
+    """with stage('model'): ... -- times one stage into genex_predict_stage_seconds."""
+    return PREDICT_STAGE_SECONDS.time(stage=name)
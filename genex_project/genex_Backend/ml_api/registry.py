@@ -0,0 +1,186 @@
+"""
+Lazily loaded, hot-reloadable model artifacts.
+
+Each registered name points at a joblib artifact on disk. Nothing is loaded
+until the first get(); after that the file's (mtime, size) is re-checked at
+most once per check interval. When it changes, the new artifact is loaded and
+warmed up with a prediction, and only then swapped in. Requests keep getting
+the previous version until the swap, and keep it if the new file fails to
+load or predict.
+"""
+import hashlib
+import os
+import threading
+import time
+
+import joblib
+
+from .compiled import compile_model
+from .features import to_feature_row
+from .inference import score_rows
+from .xai import DiseaseXAILayer
+
+
+class ModelVersion:
+    """One loaded artifact, plus the compiled scorer and XAI layer built from it."""
+
+    def __init__(self, name, path, model, compiled, digest, stamp, xai=None):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.compiled = compiled
+        self.xai = xai
+        self.stamp = stamp
+        self.digest = digest
+        self.version = f"{name}-{digest[:12]}"
+        self.loaded_at = time.time()
+
+    def __repr__(self):
+        return f"<ModelVersion {self.version}>"
+
+
+class _Entry:
+    def __init__(self, name, path, mmap_mode):
+        self.name = name
+        self.path = str(path)
+        self.mmap_mode = mmap_mode
+        self.current = None
+        self.lock = threading.Lock()
+        self.last_check = None
+        self.failed_stamp = None
+        # Held while a background reload runs, so at most one is in flight.
+        self.reload_guard = threading.Lock()
+
+
+def _file_stamp(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class ModelRegistry:
+    def __init__(self, check_interval=5.0, compiled=True, background=True):
+        self.check_interval = check_interval
+        self.use_compiled = compiled
+        # Reload in a background thread so the request that notices the change
+        # isn't the one paying for the load.
+        self.background = background
+        self.default_name = None
+        self._entries = {}
+
+    @classmethod
+    def from_settings(cls, settings):
+        registry = cls(
+            check_interval=getattr(settings, 'ML_MODEL_CHECK_INTERVAL', 5.0),
+            compiled=getattr(settings, 'ML_COMPILED_SCORER', True),
+        )
+        for name, options in getattr(settings, 'ML_MODELS', {}).items():
+            registry.register(name, options['PATH'], mmap_mode=options.get('MMAP_MODE'))
+        return registry
+
+    def register(self, name, path, mmap_mode=None):
+        """Adds a named artifact. The first registered name becomes the default."""
+        self._entries[name] = _Entry(name, path, mmap_mode)
+        if self.default_name is None:
+            self.default_name = name
+
+    def names(self):
+        return list(self._entries)
+
+    def versions(self):
+        """{name: version id or None if not loaded yet}."""
+        return {name: e.current.version if e.current else None for name, e in self._entries.items()}
+
+    def get(self, name=None):
+        """
+        Returns the current ModelVersion for `name` (default model if None),
+        loading it on first use. Returns None if it has never loaded
+        successfully. Raises KeyError for unknown names.
+        """
+        entry = self._entries[name or self.default_name]
+        now = time.monotonic()
+        if entry.last_check is not None and now - entry.last_check < self.check_interval:
+            return entry.current
+
+        if entry.current is None:
+            # First use (or retry after a failed load): load synchronously, one thread at a time.
+            with entry.lock:
+                if entry.current is None and (entry.last_check is None or now - entry.last_check >= self.check_interval):
+                    self._refresh(entry)
+            return entry.current
+
+        entry.last_check = now
+        try:
+            changed = _file_stamp(entry.path) not in (entry.current.stamp, entry.failed_stamp)
+        except OSError:
+            changed = False  # Artifact temporarily missing mid-deploy: keep serving.
+        if changed:
+            if self.background:
+                self._start_background_refresh(entry)
+            else:
+                with entry.lock:
+                    self._refresh(entry)
+        return entry.current
+
+    def reload(self, name=None):
+        """Forces a synchronous reload check; returns the (possibly new) version."""
+        entry = self._entries[name or self.default_name]
+        with entry.lock:
+            self._refresh(entry, force=True)
+        return entry.current
+
+    def _start_background_refresh(self, entry):
+        if not entry.reload_guard.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                with entry.lock:
+                    self._refresh(entry)
+            finally:
+                entry.reload_guard.release()
+
+        threading.Thread(target=run, name=f"model-reload-{entry.name}", daemon=True).start()
+
+    def _refresh(self, entry, force=False):
+        """Loads and warms up the artifact if it changed, then swaps it in. Caller holds entry.lock."""
+        entry.last_check = time.monotonic()
+        try:
+            stamp = _file_stamp(entry.path)
+        except OSError as e:
+            print(f"Error loading model '{entry.name}': {e}")
+            return
+        if not force and (
+            (entry.current is not None and stamp == entry.current.stamp) or stamp == entry.failed_stamp
+        ):
+            return
+
+        try:
+            digest = _file_digest(entry.path)
+            if entry.current is not None and digest == entry.current.digest:
+                # Same bytes, new mtime (e.g. re-copied during deploy): nothing to swap.
+                entry.current.stamp = stamp
+                return
+            model = joblib.load(entry.path, mmap_mode=entry.mmap_mode)
+            compiled = compile_model(model) if self.use_compiled else None
+            xai = DiseaseXAILayer.for_model(model, compiled)
+            # Warm-up: a real prediction (and explanation) through the same path requests use.
+            warmup = [to_feature_row({})]
+            _, _, probabilities = score_rows(model, warmup, compiled)
+            if xai is not None:
+                xai.explain_batch(warmup, probabilities)
+        except Exception as e:
+            entry.failed_stamp = stamp
+            print(f"Error loading model '{entry.name}' from {entry.path}: {e}")
+            return
+
+        entry.current = ModelVersion(entry.name, entry.path, model, compiled, digest, stamp, xai)
+        entry.failed_stamp = None
+        print(f"Model '{entry.name}' loaded successfully ({entry.current.version})")
@@ -0,0 +1,94 @@
+"""
+Declarative rule-based explanations.
+
+Each rule is {"marker", "operator", "threshold", "message"}: when the patient's
+value for `marker` (a model column, e.g. "Anti-CCP") compares true against
+`threshold`, `message` is listed as a contributing factor. Numeric markers
+take number thresholds and categorical ones (Gender, the Positive/Negative
+markers) string thresholds; a missing value matches no rule, not even a
+"!=" one. Rules live in a JSON file (ML_EXPLANATION_RULES) so clinicians can
+add or tune them without touching code. A batch is evaluated as one boolean
+mask per rule.
+"""
+import json
+import operator
+
+import numpy as np
+
+from .features import FEATURE_COLUMNS, MARKER_FIELDS
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+CATEGORICAL = {'Gender', *MARKER_FIELDS}
+
+
+class RuleTable:
+    def __init__(self, rules):
+        self.rules = []
+        for i, rule in enumerate(rules):
+            marker, op = rule.get('marker'), rule.get('operator')
+            if marker not in FEATURE_COLUMNS:
+                raise ValueError(f"Rule {i}: unknown marker {marker!r}")
+            if op not in OPERATORS:
+                raise ValueError(f"Rule {i}: unknown operator {op!r} (use one of {', '.join(OPERATORS)})")
+            if 'threshold' not in rule or not rule.get('message'):
+                raise ValueError(f"Rule {i}: 'threshold' and 'message' are required")
+            if _is_number(rule['threshold']) == (marker in CATEGORICAL):
+                kind = 'a string' if marker in CATEGORICAL else 'a number'
+                raise ValueError(f"Rule {i}: {marker!r} needs {kind} threshold, got {rule['threshold']!r}")
+            self.rules.append(rule)
+        self.messages = np.array([rule['message'] for rule in self.rules], dtype=object)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def evaluate(self, columns):
+        """
+        columns is {model column: [values...]} for n patients (features.rows_to_columns).
+        Returns a (n_rules, n) boolean matrix; missing values never match.
+        """
+        n = len(columns[FEATURE_COLUMNS[0]])
+        mask = np.zeros((len(self.rules), n), dtype=bool)
+        arrays = {}
+        for r, rule in enumerate(self.rules):
+            marker = rule['marker']
+            if marker not in arrays:
+                if marker in CATEGORICAL:
+                    values = np.array(columns[marker], dtype=object)
+                    arrays[marker] = values, values != None  # noqa: E711 (elementwise)
+                else:
+                    values = np.array(columns[marker], dtype=float)
+                    arrays[marker] = values, ~np.isnan(values)
+            values, present = arrays[marker]
+            with np.errstate(invalid='ignore'):
+                mask[r] = OPERATORS[rule['operator']](values, rule['threshold']) & present
+        return mask
+
+    def explain(self, columns, predictions, confidences):
+        """One explanation string per patient, in the same format as before the rule table."""
+        mask = self.evaluate(columns)
+        explanations = []
+        for j, (prediction, confidence) in enumerate(zip(predictions, confidences)):
+            reasons = self.messages[mask[:, j]]
+            if not len(reasons):
+                explanations.append(
+                    f"The model predicts {prediction} with {confidence*100:.1f}% confidence based on the overall symptom pattern."
+                )
+            else:
+                explanations.append(
+                    f"The model predicts {prediction} ({confidence*100:.1f}% confidence).\n\nKey contributing factors:\n- "
+                    + "\n- ".join(reasons)
+                )
+        return explanations
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
@@ -0,0 +1,26 @@
+import numpy as np
+
+from .features import MARKER_FIELDS, NUMERIC_FIELDS
+
+
+def synthetic_payloads(n=300, seed=7, missing_rate=0.15):
+    """
+    Deterministic synthetic predict_xai payloads (Flutter key names), with some
+    lab values knocked out so the imputers are exercised. Used by tests and
+    benchmarks; never by the request path.
+    """
+    rng = np.random.RandomState(seed)
+    ranges = {"ESR": (0, 120), "CRP": (0, 60), "RF": (0, 150), "Anti_CCP": (0, 200), "C3": (40, 200), "C4": (5, 60)}
+    payloads = []
+    for i in range(n):
+        payload = {
+            "Age": int(rng.randint(18, 85)),
+            "Gender": ["Female", "Male", "Other"][i % 3],
+        }
+        for key in NUMERIC_FIELDS.values():
+            low, high = ranges[key]
+            payload[key] = None if rng.rand() < missing_rate else float(rng.uniform(low, high))
+        for key in MARKER_FIELDS.values():
+            payload[key] = bool(rng.rand() < 0.3)
+        payloads.append(payload)
+    return payloads
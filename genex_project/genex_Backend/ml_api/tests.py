@@ -0,0 +1,362 @@
+import asyncio
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+import joblib
+import numpy as np
+import pandas as pd
+from django.core.management import call_command
+from django.test import Client, RequestFactory, SimpleTestCase
+
+from . import bulk, views
+from .batching import MicroBatcher, Overloaded
+from .cache import PredictionCache, feature_key
+from .features import to_feature_row, rows_to_frame, rows_to_columns
+from .compiled import compile_model
+from .inference import predict_with_confidence, score_rows
+from .registry import ModelRegistry
+from .rules import RuleTable
+from .synthetic import synthetic_payloads
+from .xai import DiseaseXAILayer
+
+
+def load_model(testcase):
+    current = views.registry.get()
+    if current is None:
+        testcase.skipTest("calibrated_model.joblib could not be loaded")
+    return current.model
+
+
+class SinglePassPredictionTests(SimpleTestCase):
+    def setUp(self):
+        self.model = load_model(self)
+        self.frame = rows_to_frame([to_feature_row(p) for p in synthetic_payloads()])
+
+    def test_labels_match_predict(self):
+        labels, _, _ = predict_with_confidence(self.model, self.frame)
+        np.testing.assert_array_equal(labels, self.model.predict(self.frame))
+
+    def test_confidence_is_max_probability(self):
+        _, confidences, probabilities = predict_with_confidence(self.model, self.frame)
+        np.testing.assert_array_equal(confidences, self.model.predict_proba(self.frame).max(axis=1))
+        np.testing.assert_array_equal(probabilities, self.model.predict_proba(self.frame))
+
+
+class PredictBatchTests(SimpleTestCase):
+    def setUp(self):
+        load_model(self)
+        self.client = Client(HTTP_HOST='localhost')
+        self.payloads = synthetic_payloads(4, seed=11)
+
+    def post(self, body):
+        return self.client.post('/predict_xai/batch/', json.dumps(body), content_type='application/json')
+
+    def expected(self, payload):
+        return views.predict_rows(views.registry.get(), [to_feature_row(payload)])[0]['disease_prediction']
+
+    def test_results_in_request_order_for_either_body_shape(self):
+        for body in (self.payloads, {'patients': self.payloads}):
+            response = self.post(body)
+            self.assertEqual(response.status_code, 200)
+            results = response.json()['results']
+            self.assertEqual([r['index'] for r in results], [0, 1, 2, 3])
+            self.assertEqual([r['disease_prediction'] for r in results], [self.expected(p) for p in self.payloads])
+
+    def test_invalid_items_get_their_own_error(self):
+        body = [self.payloads[0], {'Gender': ['a']}, 'not a patient', {'CRP': 'high'}, self.payloads[1]]
+        results = self.post(body).json()['results']
+        self.assertEqual([('error' in r) for r in results], [False, True, True, True, False])
+        self.assertIn("'Gender' must be a string", results[1]['error'])
+        self.assertEqual(results[4]['disease_prediction'], self.expected(self.payloads[1]))
+
+    def test_a_row_breaking_the_model_pass_only_fails_itself(self):
+        real = views.predict_rows
+
+        def predict_rows(current, rows):
+            if any(row['Age'] == 999 for row in rows):
+                raise ValueError('model rejected the row')
+            return real(current, rows)
+
+        with mock.patch.object(views, 'predict_rows', predict_rows):
+            response = self.post([self.payloads[0], {**self.payloads[1], 'Age': 999}])
+        self.assertEqual(response.status_code, 200)
+        first, second = response.json()['results']
+        self.assertEqual(first['disease_prediction'], self.expected(self.payloads[0]))
+        self.assertEqual(second, {'index': 1, 'error': 'model rejected the row'})
+
+    def test_batch_size_limit(self):
+        with mock.patch.object(views, 'MAX_BATCH_SIZE', 3):
+            self.assertEqual(self.post(self.payloads).status_code, 413)
+
+
+class CompiledScorerTests(SimpleTestCase):
+    def setUp(self):
+        self.model = load_model(self)
+        self.rows = [to_feature_row(p) for p in synthetic_payloads()]
+        self.rows[0]["Gender"] = None  # missing category -> imputed
+        self.rows[1]["Gender"] = "Unknown"  # unseen category -> all-zero one-hot
+
+    def test_matches_pipeline_probabilities(self):
+        compiled = compile_model(self.model)
+        self.assertIsNotNone(compiled)
+        expected = self.model.predict_proba(rows_to_frame(self.rows))
+        np.testing.assert_allclose(compiled.predict_proba_rows(self.rows), expected, rtol=0, atol=1e-9)
+
+    def test_score_rows_labels_match_predict(self):
+        labels, _, _ = score_rows(self.model, self.rows, compile_model(self.model))
+        np.testing.assert_array_equal(labels, self.model.predict(rows_to_frame(self.rows)))
+
+    def test_unsupported_model_falls_back(self):
+        fold_pipeline = self.model.calibrated_classifiers_[0].estimator
+        self.assertIsNone(compile_model(fold_pipeline))
+        labels, _, _ = score_rows(fold_pipeline, self.rows, compile_model(fold_pipeline))
+        np.testing.assert_array_equal(labels, fold_pipeline.predict(rows_to_frame(self.rows)))
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        model = load_model(self)
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'model.joblib')
+        shutil.copy(views.MODEL_PATH, self.path)
+        self.model = model
+        self.registry = ModelRegistry(check_interval=0, background=False)
+        self.registry.register('default', self.path)
+
+    def _bump_mtime(self):
+        # Make sure the stamp changes even on coarse-mtime filesystems.
+        st = os.stat(self.path)
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    def test_lazy_load(self):
+        self.assertEqual(self.registry.versions(), {'default': None})
+        current = self.registry.get()
+        self.assertTrue(current.version.startswith('default-'))
+
+    def test_swaps_when_artifact_changes(self):
+        before = self.registry.get()
+        joblib.dump(self.model, self.path, compress=3)
+        self._bump_mtime()
+        after = self.registry.get()
+        self.assertNotEqual(before.version, after.version)
+
+    def test_keeps_serving_old_version_on_bad_artifact(self):
+        before = self.registry.get()
+        with open(self.path, 'wb') as f:
+            f.write(b'not a model')
+        self._bump_mtime()
+        self.assertIs(self.registry.get(), before)
+
+
+class PredictionCacheTests(SimpleTestCase):
+    def test_key_canonicalizes_missing_values_and_numbers(self):
+        row = to_feature_row({"Age": 40, "ESR": None})
+        same = dict(row, Age=40.0, ESR=float("nan"))
+        self.assertEqual(feature_key(row, "v1"), feature_key(same, "v1"))
+        self.assertNotEqual(feature_key(row, "v1"), feature_key(row, "v2"))
+
+    def test_lru_eviction_and_ttl(self):
+        now = [0.0]
+        cache = PredictionCache(max_entries=2, ttl=10, clock=lambda: now[0])
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)  # evicts "b", the least recently used
+        self.assertIsNone(cache.get("b"))
+        now[0] = 11.0
+        self.assertIsNone(cache.get("a"))  # expired
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]), (1, 2, 1, 1))
+
+
+class AsyncModelResolutionTests(SimpleTestCase):
+    def test_model_is_resolved_in_the_inference_pool(self):
+        threads = []
+
+        def get(name=None):
+            threads.append(threading.current_thread().name)
+            raise KeyError(name)
+
+        request = RequestFactory().post('/predict_xai/async/?model=nope')
+        with mock.patch.object(views.registry, 'get', get):
+            current, error = asyncio.run(views.aget_model_version(request))
+        self.assertIsNone(current)
+        self.assertEqual(error.status_code, 404)
+        self.assertTrue(threads[0].startswith('inference'), threads)
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def test_concurrent_submissions_share_a_flush_and_keep_order(self):
+        calls = []
+
+        def handler(items):
+            calls.append(list(items))
+            return [item * 10 for item in items]
+
+        batcher = MicroBatcher(handler, max_batch_size=4, max_wait=0.05)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+
+        self.assertEqual(asyncio.run(run()), [i * 10 for i in range(10)])
+        self.assertEqual([len(c) for c in calls], [4, 4, 2])
+
+    def test_handler_errors_reach_every_waiter(self):
+        def handler(items):
+            raise RuntimeError("boom")
+
+        batcher = MicroBatcher(handler, max_batch_size=8, max_wait=0.001)
+
+        async def run():
+            return await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in asyncio.run(run())))
+
+    def test_max_pending_rejects_instead_of_queueing(self):
+        batcher = MicroBatcher(lambda items: items, max_batch_size=8, max_wait=0.01, max_pending=2)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+        first, second, third = asyncio.run(run())
+        self.assertEqual((first, second), (0, 1))
+        self.assertIsInstance(third, Overloaded)
+        self.assertEqual((batcher.stats()['rejected'], batcher.stats()['outstanding']), (1, 0))
+        self.assertEqual(asyncio.run(run())[:2], [0, 1])  # capacity is back once they finish
+
+
+class RuleTableTests(SimpleTestCase):
+    def test_bundled_rules_explain_a_batch(self):
+        rows = [
+            to_feature_row({"Anti_CCP": 60, "RF": 5, "ANA": True}),
+            to_feature_row({"Anti_CCP": None}),  # missing values never match
+        ]
+        texts = views.rule_table.explain(rows_to_columns(rows), ["RA", "Normal"], [0.9, 0.5])
+        self.assertEqual(texts[0], (
+            "The model predicts RA (90.0% confidence).\n\nKey contributing factors:\n"
+            "- High Anti-CCP levels (specific to Rheumatoid Arthritis)\n"
+            "- Positive Antinuclear Antibody (ANA)"
+        ))
+        self.assertEqual(
+            texts[1], "The model predicts Normal with 50.0% confidence based on the overall symptom pattern."
+        )
+
+    def test_rejects_unknown_markers_and_operators(self):
+        with self.assertRaises(ValueError):
+            RuleTable([{"marker": "Ferritin", "operator": ">", "threshold": 1, "message": "x"}])
+        with self.assertRaises(ValueError):
+            RuleTable([{"marker": "RF", "operator": "~", "threshold": 1, "message": "x"}])
+        with self.assertRaisesRegex(ValueError, "'Gender' needs a string threshold"):
+            RuleTable([{"marker": "Gender", "operator": ">", "threshold": 0, "message": "x"}])
+        with self.assertRaisesRegex(ValueError, "'CRP' needs a number threshold"):
+            RuleTable([{"marker": "CRP", "operator": ">", "threshold": "10", "message": "x"}])
+
+    def test_missing_values_match_no_rule(self):
+        table = RuleTable([
+            {"marker": "CRP", "operator": "!=", "threshold": 0, "message": "Abnormal CRP"},
+            {"marker": "Gender", "operator": "!=", "threshold": "Female", "message": "Not female"},
+        ])
+        columns = {column: [None, None] for column in rows_to_columns([to_feature_row({})])}
+        columns.update({"CRP": [np.nan, 5.0], "Gender": [None, "Male"]})
+        np.testing.assert_array_equal(table.evaluate(columns), [[False, True], [False, True]])
+
+
+class DiseaseXAILayerTests(SimpleTestCase):
+    def setUp(self):
+        self.model = load_model(self)
+        self.rows = [to_feature_row(p) for p in synthetic_payloads(50)]
+        self.probabilities = self.model.predict_proba(rows_to_frame(self.rows))
+
+    def test_batch_contributions_match_per_row_sums(self):
+        xai = DiseaseXAILayer(self.model)
+        class_idx = np.argmax(self.probabilities, axis=1)
+        batch = xai.contributions(self.rows, class_idx)
+
+        Xp = xai.prep_.transform(rows_to_frame(self.rows))
+        for i in range(len(self.rows)):
+            per_feature = Xp[i] * xai.coef_[class_idx[i]]
+            for g, group in enumerate(xai.group_names_):
+                self.assertAlmostEqual(batch[i, g], per_feature[xai.group_to_indices_[group]].sum(), places=12)
+
+    def test_compiled_preprocessing_gives_same_explanations(self):
+        plain = DiseaseXAILayer(self.model).explain_batch(self.rows, self.probabilities)
+        fast = DiseaseXAILayer(self.model, compiled=compile_model(self.model)).explain_batch(self.rows, self.probabilities)
+        self.assertEqual(plain, fast)
+
+    def test_groups_are_original_features(self):
+        xai = DiseaseXAILayer(self.model)
+        self.assertEqual(sorted(xai.group_names_), sorted(self.model.feature_names_in_))
+
+
+class ScorePatientsCommandTests(SimpleTestCase):
+    def test_streams_csv_in_chunks_and_matches_the_model(self):
+        model = load_model(self)
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        source, target = os.path.join(tmpdir, 'in.csv'), os.path.join(tmpdir, 'out.csv')
+
+        payloads = synthetic_payloads(25)
+        frame = pd.DataFrame(payloads).astype(object)
+        frame.insert(0, 'patient_id', [f'p{i}' for i in range(len(frame))])
+        frame.loc[2, 'ANA'] = 'unclear'
+        frame.to_csv(source, index=False)
+
+        call_command('score_patients', source, target, chunk_size=10, workers=1,
+                     id_column='patient_id', no_explanations=True, stdout=io.StringIO())
+
+        out = pd.read_csv(target)
+        self.assertEqual(out['patient_id'].tolist(), frame['patient_id'].tolist())
+        self.assertIn('unclear', out.loc[2, 'error'])
+        ok = [i for i in range(len(payloads)) if i != 2]
+        expected = model.predict(rows_to_frame([to_feature_row(payloads[i]) for i in ok]))
+        self.assertEqual(out.loc[ok, 'disease_prediction'].tolist(), list(expected))
+
+    def test_parquet_output_with_errors_after_a_clean_chunk(self):
+        load_model(self)
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        source, target = os.path.join(tmpdir, 'in.csv'), os.path.join(tmpdir, 'out.parquet')
+        frame = pd.DataFrame(synthetic_payloads(20)).astype(object)
+        frame.insert(0, 'patient_id', [f'p{i}' for i in range(len(frame))])
+        frame.loc[10:, 'ANA'] = 'unclear'  # first chunk clean, second chunk all errors
+        frame.to_csv(source, index=False)
+
+        call_command('score_patients', source, target, chunk_size=10, workers=1,
+                     id_column='patient_id', stdout=io.StringIO())
+
+        out = pd.read_parquet(target)
+        self.assertEqual(out['patient_id'].tolist(), frame['patient_id'].tolist())
+        self.assertEqual(str(out['confidence'].dtype), 'float64')
+        self.assertTrue(out.loc[:9, 'error'].isna().all())
+        self.assertTrue(out.loc[10:, 'error'].str.contains('unclear').all())
+        self.assertTrue(out.loc[10:, 'confidence'].isna().all())
+
+    def test_model_errors_fail_only_their_row(self):
+        load_model(self)
+        self.enterContext(mock.patch.object(views, 'prediction_cache', None))  # init_worker turns it off
+        self.addCleanup(bulk._worker.clear)
+        bulk.init_worker(None, explanations=True)
+        real = views.predict_rows
+
+        def predict_rows(current, rows):
+            if any(row['Age'] == 999 for row in rows):
+                raise ValueError('model rejected the row')
+            return real(current, rows)
+
+        payloads = synthetic_payloads(4, seed=5)
+        payloads[1]['Age'] = 999
+        with mock.patch.object(views, 'predict_rows', predict_rows):
+            out = bulk.score_records(10, [(p, None) for p in payloads])
+        self.assertEqual(out['row'].tolist(), [10, 11, 12, 13])
+        self.assertEqual(out['error'].fillna('').tolist(), ['', 'model rejected the row', '', ''])
+        self.assertTrue(pd.isna(out.loc[1, 'disease_prediction']))
+        expected = [real(views.registry.get(), [to_feature_row(payloads[i])])[0] for i in (0, 2, 3)]
+        self.assertEqual(out.loc[[0, 2, 3], 'disease_prediction'].tolist(),
+                         [e['disease_prediction'] for e in expected])
+        self.assertTrue(all(out.loc[[0, 2, 3], 'xai_explanation']))
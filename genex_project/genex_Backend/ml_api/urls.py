@@ -3,4 +3,6 @@ from . import views
 
 urlpatterns = [
     path('predict_xai/', views.predict_xai, name='predict_xai'),
+    path('predict_xai/batch/', views.predict_xai_batch, name='predict_xai_batch'),
+    path('predict_xai/async/', views.predict_xai_async, name='predict_xai_async'),
 ]
\ No newline at end of file
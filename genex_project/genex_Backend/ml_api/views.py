@@ -1,111 +1,166 @@
+import asyncio
 import json
 import os
-import joblib
-import pandas as pd
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 
+from backend.metrics import REGISTRY
+
+from .features import to_feature_row, rows_to_columns
+from .batching import MicroBatcher, Overloaded
+from .cache import PredictionCache, feature_key
+from .inference import score_rows
+from .metrics import PREDICT_ROWS, stage
+from .registry import ModelRegistry
+from .rules import RuleTable
+
 
-# --- 1. Load Model & Preprocessing Artifacts ---
-# Use os.path to find the file relative to this script
+# --- 1. Model Registry ---
+# Models load lazily on first use (not at import time, so workers boot fast)
+# and are hot-swapped when the artifact on disk changes.
 CURRENT_DIR = os.path.dirname(__file__)
 MODEL_PATH = os.path.join(CURRENT_DIR, 'calibrated_model.joblib')
 
-try:
-    # Load the pipeline/model
-    model = joblib.load(MODEL_PATH)
-    print("Model loaded successfully!")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model = None
+registry = ModelRegistry.from_settings(settings)
+if not registry.names():
+    registry.register('default', MODEL_PATH)
 
-# --- 2. Define Helper Functions (XAI Placeholder) ---
-def simple_rule_based_explanation(row, prediction, confidence):
+
+def get_model_version(request):
     """
-    Since the specific XAI class was not found, this function generates 
-    a logic-based explanation using medical domain knowledge for Rheumatic diseases.
+    Resolves the ModelVersion for this request (?model=<name>, default otherwise).
+    Returns (version, None) or (None, error JsonResponse).
     """
-    reasons = []
-    
-    # Check for strong signals based on your dataset columns
-    if row['Anti-CCP'][0] > 20: 
-        reasons.append("High Anti-CCP levels (specific to Rheumatoid Arthritis)")
-    if row['RF'][0] > 20:
-        reasons.append("Elevated Rheumatoid Factor")
-    if row['HLA-B27'][0] == "Positive":
-        reasons.append("Positive HLA-B27 marker")
-    if row['ANA'][0] == "Positive":
-        reasons.append("Positive Antinuclear Antibody (ANA)")
-    if row['Anti-dsDNA'][0] == "Positive":
-        reasons.append("Positive Anti-dsDNA (suggestive of Lupus)")
-
-    # Construct the text
-    if not reasons:
-        explanation = f"The model predicts {prediction} with {confidence*100:.1f}% confidence based on the overall symptom pattern."
-    else:
-        explanation = f"The model predicts {prediction} ({confidence*100:.1f}% confidence).\n\nKey contributing factors:\n- " + "\n- ".join(reasons)
-    
-    return explanation
+    return _resolve_model(request.GET.get('model'))
+
+
+async def aget_model_version(request):
+    """get_model_version for async views: a (re)load runs joblib.load, so it goes to inference_executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor, _resolve_model, request.GET.get('model'))
+
+
+def _resolve_model(name):
+    try:
+        current = registry.get(name)
+    except KeyError:
+        return None, JsonResponse({'error': f"Unknown model '{name}'"}, status=404)
+    if current is None:
+        return None, JsonResponse({'error': 'Model file not found or failed to load.'}, status=500)
+    return current, None
+
+
+def versioned_response(payload, current, **kwargs):
+    """JsonResponse tagged with the model version that produced it."""
+    payload['model_version'] = current.version
+    response = JsonResponse(payload, **kwargs)
+    response['X-Model-Version'] = current.version
+    return response
+
+# Repeat submissions of the same panel are served from here (None = disabled).
+prediction_cache = PredictionCache.from_settings(settings)
+
+
+def prediction_cache_stats():
+    return prediction_cache.stats() if prediction_cache else {}
+
+
+REGISTRY.callback(
+    'genex_prediction_cache_entries', 'Entries in the in-process prediction cache.',
+    lambda: prediction_cache_stats().get('size', 0),
+)
+REGISTRY.callback(
+    'genex_prediction_cache_events_total', 'Prediction cache lookups and removals by outcome.',
+    lambda: {(event,): prediction_cache_stats().get(event, 0)
+             for event in ('hits', 'misses', 'shared_hits', 'evictions', 'expirations')},
+    labelnames=['event'], type='counter',
+)
+
+# Upper bound on patients per batch request, so one call can't exhaust memory.
+MAX_BATCH_SIZE = getattr(settings, 'ML_MAX_BATCH_SIZE', 1000)
+
+# --- 2. Explanations ---
+# 'model': DiseaseXAILayer contributions from the LR under the calibrated model.
+# 'rules': the marker/operator/threshold/message table, editable without code
+# changes (also the fallback for models the XAI layer can't explain).
+EXPLANATION_MODE = getattr(settings, 'ML_EXPLANATIONS', 'model')
+RULES_PATH = getattr(settings, 'ML_EXPLANATION_RULES', os.path.join(CURRENT_DIR, 'explanation_rules.json'))
+rule_table = RuleTable.from_file(RULES_PATH)
+
+
+def predict_rows(current, rows):
+    """
+    Prediction, confidence and explanation for each feature row, in order.
+    Rows found in the prediction cache are not re-scored; the rest go through
+    the model in a single pass.
+    """
+    results = [None] * len(rows)
+    keys = [feature_key(row, current.version) for row in rows] if prediction_cache else None
+
+    misses = []
+    with stage('cache'):
+        for i in range(len(rows)):
+            cached = prediction_cache.get(keys[i]) if prediction_cache else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                misses.append(i)
+
+    if misses:
+        miss_rows = [rows[i] for i in misses]
+        PREDICT_ROWS.observe(len(miss_rows))
+        # score_rows times its own 'frame' and 'model' stages.
+        labels, confidences, probabilities = score_rows(current.model, miss_rows, current.compiled)
+        confidences = confidences.tolist()
+        with stage('explain'):
+            if current.xai is not None and EXPLANATION_MODE == 'model':
+                # Model-based: per-feature contributions for the batch in one matrix product.
+                explanations = [
+                    current.xai.render_patient_text(e)
+                    for e in current.xai.explain_batch(miss_rows, probabilities)
+                ]
+            else:
+                # One vectorized rule pass for the whole batch.
+                explanations = rule_table.explain(rows_to_columns(miss_rows), labels, confidences)
+        for i, prediction, confidence, explanation in zip(misses, labels, confidences, explanations):
+            results[i] = {
+                'disease_prediction': str(prediction),
+                'confidence': confidence,
+                'xai_explanation': explanation,
+            }
+            if prediction_cache:
+                prediction_cache.set(keys[i], results[i])
+    return results
+
 
 @csrf_exempt
 def predict_xai(request):
     if request.method == 'POST':
         try:
             # --- 3. Parse JSON from Flutter ---
-            data = json.loads(request.body)
+            with stage('parse'):
+                data = json.loads(request.body)
             
-            # --- 4. Prepare DataFrame (Input Logic) ---
-            # NOTE: We map Flutter's booleans to "Positive"/"Negative" 
+            # --- 4. Prepare Features (Input Logic) ---
+            # NOTE: We map Flutter's booleans to "Positive"/"Negative"
             # because your notebook uses these string values.
-            input_dict = {
-                "Age": [data.get('Age', 0)],
-                "Gender": [data.get('Gender', 'Female')],
-                "ESR": [data.get('ESR') if data.get('ESR') is not None else np.nan],
-                "CRP": [data.get('CRP') if data.get('CRP') is not None else np.nan],
-                "RF": [data.get('RF') if data.get('RF') is not None else np.nan],
-                "Anti-CCP": [data.get('Anti_CCP') if data.get('Anti_CCP') is not None else np.nan],
-                "HLA-B27": ["Positive" if data.get('HLA_B27') else "Negative"],
-                "ANA": ["Positive" if data.get('ANA') else "Negative"],
-                "Anti-Ro": ["Positive" if data.get('Anti_Ro') else "Negative"],
-                "Anti-La": ["Positive" if data.get('Anti_La') else "Negative"],
-                "Anti-dsDNA": ["Positive" if data.get('Anti_dsDNA') else "Negative"],
-                "Anti-Sm": ["Positive" if data.get('Anti_Sm') else "Negative"],
-                "C3": [data.get('C3') if data.get('C3') is not None else np.nan],
-                "C4": [data.get('C4') if data.get('C4') is not None else np.nan],
-            }
-            
-            df_input = pd.DataFrame(input_dict)
+            with stage('features'):
+                row = to_feature_row(data)
 
             # Check if model loaded correctly
-            if model is None:
-                return JsonResponse({'error': 'Model file not found or failed to load.'}, status=500)
-
-            # --- 5. Make Prediction ---
-            # We use [0] because predict returns an array, we want the first item
-            prediction = model.predict(df_input)[0]
-            
-            # Get probability/confidence
-            if hasattr(model, "predict_proba"):
-                probabilities = model.predict_proba(df_input)[0].tolist()
-                confidence = max(probabilities)
-            else:
-                confidence = 1.0 # Fallback if model doesn't support probabilities
+            current, error = get_model_version(request)
+            if error:
+                return error
 
-            # --- 6. Generate XAI Explanation ---
-            # If you have your own class, uncomment the lines below and import it.
-            # explainer = DiseaseXAILayer(model, df_input)
-            # xai_explanation = explainer.explain()
-            
-            # For now, use the rule-based helper defined above:
-            xai_explanation = simple_rule_based_explanation(input_dict, prediction, confidence)
+            # --- 5. Make Prediction + 6. Generate XAI Explanation ---
+            # One probability pass gives both the label (argmax) and the confidence;
+            # repeat submissions are answered from the prediction cache.
+            result = predict_rows(current, [row])[0]
 
-            return JsonResponse({
-                'disease_prediction': str(prediction),
-                'confidence': confidence,
-                'xai_explanation': xai_explanation
-            })
+            return versioned_response(dict(result), current)
 
         except Exception as e:
             # Return detailed error for debugging
@@ -113,4 +168,142 @@ def predict_xai(request):
             traceback.print_exc()
             return JsonResponse({'error': str(e)}, status=400)
     
-    return JsonResponse({'error': 'POST method required'}, status=405)
\ No newline at end of file
+    return JsonResponse({'error': 'POST method required'}, status=405)
+
+
+@csrf_exempt
+def predict_xai_batch(request):
+    """
+    Scores a whole worklist in one round trip.
+
+    Accepts either a JSON list of patient payloads or {"patients": [...]}, each
+    shaped like the single-patient predict_xai body. Valid patients are scored
+    together in one model pass; invalid ones get a per-item error instead of
+    failing the batch. Results come back in request order.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST method required'}, status=405)
+
+    try:
+        with stage('parse'):
+            data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+
+    patients = data.get('patients') if isinstance(data, dict) else data
+    if not isinstance(patients, list):
+        return JsonResponse({'error': 'Expected a list of patients'}, status=400)
+    if len(patients) > MAX_BATCH_SIZE:
+        return JsonResponse(
+            {'error': f'Batch too large ({len(patients)} > {MAX_BATCH_SIZE})'}, status=413
+        )
+
+    current, error = get_model_version(request)
+    if error:
+        return error
+
+    # --- 1. Map every payload, collecting per-item validation errors ---
+    results = [None] * len(patients)
+    rows, positions = [], []
+    with stage('features'):
+        for i, payload in enumerate(patients):
+            try:
+                rows.append(to_feature_row(payload))
+                positions.append(i)
+            except ValueError as e:
+                results[i] = {'index': i, 'error': str(e)}
+
+    # --- 2. One model pass for all valid (uncached) rows ---
+    try:
+        predictions = predict_rows(current, rows)
+    except Exception:
+        # Something in the batch breaks the vectorized pass: score row by row
+        # so only the offending patients get an error.
+        import traceback
+        traceback.print_exc()
+        predictions = []
+        for row in rows:
+            try:
+                predictions.append(predict_rows(current, [row])[0])
+            except Exception as e:
+                predictions.append({'error': str(e)})
+
+    # --- 3. Fan results back out in request order ---
+    for i, prediction in zip(positions, predictions):
+        results[i] = {'index': i, **prediction}
+
+    return versioned_response({'results': results}, current)
+
+
+
+# --- Async (ASGI) path: micro-batched inference ---
+# Model calls from async views run in this bounded pool, never on the event loop.
+inference_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'ML_INFERENCE_WORKERS', 4), thread_name_prefix='inference'
+)
+
+
+def predict_items(items):
+    """MicroBatcher handler: items are (ModelVersion, row) pairs, possibly mixing versions."""
+    results = [None] * len(items)
+    groups = {}
+    for i, (current, _) in enumerate(items):
+        groups.setdefault(current.version, (current, []))[1].append(i)
+    for current, indices in groups.values():
+        predictions = predict_rows(current, [items[i][1] for i in indices])
+        for i, prediction in zip(indices, predictions):
+            results[i] = prediction
+    return results
+
+
+batcher = MicroBatcher(
+    predict_items,
+    max_batch_size=getattr(settings, 'ML_MICROBATCH', {}).get('MAX_BATCH_SIZE', 64),
+    max_wait=getattr(settings, 'ML_MICROBATCH', {}).get('MAX_WAIT', 0.005),
+    executor=inference_executor,
+    max_pending=getattr(settings, 'ML_MICROBATCH', {}).get('MAX_PENDING'),
+)
+REGISTRY.callback(
+    'genex_microbatch_batches_total', 'Micro-batches flushed on the async path.',
+    lambda: batcher.batches, type='counter',
+)
+REGISTRY.callback(
+    'genex_microbatch_items_total', 'Requests scored through micro-batches.',
+    lambda: batcher.items, type='counter',
+)
+REGISTRY.callback(
+    'genex_microbatch_rejected_total', 'Async predictions refused with 503 (MAX_PENDING reached).',
+    lambda: batcher.rejected, type='counter',
+)
+
+
+@csrf_exempt
+async def predict_xai_async(request):
+    """
+    Same contract as predict_xai, for ASGI deployments. Concurrent requests are
+    queued and scored together, one vectorized model pass per flush.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST method required'}, status=405)
+
+    try:
+        with stage('parse'):
+            data = json.loads(request.body)
+        with stage('features'):
+            row = to_feature_row(data)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    current, error = await aget_model_version(request)
+    if error:
+        return error
+
+    try:
+        result = await batcher.submit((current, row))
+    except Overloaded as e:
+        return JsonResponse({'error': str(e)}, status=503, headers={'Retry-After': '1'})
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return JsonResponse({'error': str(e)}, status=400)
+    return versioned_response(dict(result), current)
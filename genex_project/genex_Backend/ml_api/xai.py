@@ -0,0 +1,237 @@
+import numpy as np
+
+from .features import rows_to_frame
+
+DISCLAIMER = "This is a model estimate, not a diagnosis. Please discuss results with a clinician."
+
+
+class DiseaseXAILayer:
+    """
+    XAI for CalibratedClassifierCV(Pipeline(prep=ColumnTransformer, clf=LogisticRegression)).
+    Explains the underlying logistic regression contributions while reporting calibrated risk.
+
+    Production port of the layer in "XAI (3).ipynb". Everything that depends only
+    on the model (averaged LR parameters, feature-group index) is computed once
+    per model version; explaining a batch is one elementwise product plus one
+    matrix product against the group indicator matrix.
+    """
+
+    def __init__(self, calibrated_model, num_top=5, compiled=None):
+        self.cal = calibrated_model
+        self.num_top = num_top
+        self.compiled = compiled
+        self.classes_ = list(self.cal.classes_)
+
+        # CalibratedClassifierCV stores multiple calibrated estimators (one per CV split)
+        self._calibrated_clfs = getattr(self.cal, "calibrated_classifiers_", None)
+        if not self._calibrated_clfs:
+            raise ValueError(
+                "This XAI layer expects a fitted CalibratedClassifierCV with calibrated_classifiers_. "
+                "Make sure you called calibrated.fit(...)."
+            )
+
+        # Use the first fold pipeline to read structure (prep + clf)
+        first_pipe = self._calibrated_clfs[0].estimator
+        self.pipe_ = first_pipe
+        self.prep_ = first_pipe.named_steps["prep"]
+        self.clf_name_ = "clf"
+        self._feature_names = self._get_feature_names()
+
+        # Average coefficients across CV estimators for stability
+        self.coef_, self.intercept_ = self._avg_lr_params()
+
+        # Build maps to aggregate one-hot contributions back to original features
+        self._build_feature_group_index()
+
+    @classmethod
+    def for_model(cls, model, compiled=None):
+        """Returns a layer for `model`, or None if the model isn't a calibrated LR pipeline."""
+        try:
+            return cls(model, compiled=compiled)
+        except (AttributeError, KeyError, ValueError) as e:
+            print(f"Model-based explanations unavailable, using rules: {e}")
+            return None
+
+    def _avg_lr_params(self):
+        coefs = []
+        intercepts = []
+        for cc in self._calibrated_clfs:
+            pipe = cc.estimator
+            lr = pipe.named_steps[self.clf_name_]
+            coefs.append(lr.coef_)
+            intercepts.append(lr.intercept_)
+        coef = np.mean(np.stack(coefs, axis=0), axis=0)
+        intercept = np.mean(np.stack(intercepts, axis=0), axis=0)
+        return coef, intercept
+
+    def _get_feature_names(self):
+        try:
+            return self.prep_.get_feature_names_out().tolist()
+        except Exception:
+            return None
+
+    def _build_feature_group_index(self):
+        """
+        Build a mapping from transformed columns to original features:
+        - numeric: num__<feature>
+        - categorical onehot: cat__<feature>_<category>
+        One-hot columns are aggregated back into their categorical feature.
+        Also builds group_matrix_ (n_transformed x n_groups, 0/1) so per-group
+        contributions for a batch come from a single matrix product.
+        """
+        if self._feature_names is None:
+            # Fallback: generic names, one group per transformed column
+            self._feature_names = [f"f{j}" for j in range(self.coef_.shape[1])]
+
+        known = sorted(getattr(self.prep_, "feature_names_in_", []), key=len, reverse=True)
+        group_to_indices = {}
+        col_to_group = {}
+
+        for j, fname in enumerate(self._feature_names):
+            prefix, _, rest = fname.partition("__")
+            if prefix == "num":
+                group = rest
+            elif prefix == "cat":
+                # "<feature>_<category>": match the longest known input column so
+                # underscores inside feature or category names don't split wrongly.
+                group = next((k for k in known if rest.startswith(k + "_")), rest.split("_", 1)[0])
+            else:
+                group = fname  # fallback
+
+            group_to_indices.setdefault(group, []).append(j)
+            col_to_group[j] = group
+
+        self.group_to_indices_ = group_to_indices
+        self.col_to_group_ = col_to_group
+        self.group_names_ = list(group_to_indices)
+
+        self.group_matrix_ = np.zeros((len(self._feature_names), len(self.group_names_)))
+        for g, group in enumerate(self.group_names_):
+            self.group_matrix_[group_to_indices[group], g] = 1.0
+
+    def _linear_scores(self, rows):
+        """
+        Compute underlying LR linear scores (logits) on preprocessed features:
+        score_c = intercept_c + x_proc @ coef_c
+        Rows are feature dicts; they're preprocessed without pandas when a
+        compiled scorer is available.
+        """
+        if self.compiled is not None:
+            Xp = self.compiled.transform_rows(rows, fold=0)
+        else:
+            Xp = self.prep_.transform(rows_to_frame(rows))
+            # Ensure dense for easier ops
+            if hasattr(Xp, "toarray"):
+                Xp = Xp.toarray()
+        scores = Xp @ self.coef_.T + self.intercept_
+        return scores, Xp
+
+    def contributions(self, rows, class_indices):
+        """(n_rows, n_groups) contribution of each original feature to the chosen class per row."""
+        _, Xp = self._linear_scores(rows)
+        return (Xp * self.coef_[class_indices]) @ self.group_matrix_
+
+    def explain_batch(self, rows, probabilities, diseases=None, top_k=None):
+        """
+        Explain many rows at once. `probabilities` are the calibrated risks
+        (n_rows, n_classes) already computed for these rows; `diseases`
+        optionally picks the class to explain per row (default: predicted).
+        Returns one explanation dict per row, as explain_row() does.
+        """
+        top_k = top_k or self.num_top
+        probabilities = np.asarray(probabilities)
+        pred_idx = np.argmax(probabilities, axis=1)
+        if diseases is None:
+            class_idx = pred_idx
+        else:
+            for disease in diseases:
+                if disease not in self.classes_:
+                    raise ValueError(f"disease='{disease}' not in classes: {self.classes_}")
+            class_idx = np.array([self.classes_.index(d) for d in diseases])
+
+        contrib = self.contributions(rows, class_idx)
+        # Sort by impact, strongest positive first
+        order = np.argsort(-contrib, axis=1, kind="stable")
+
+        explanations = []
+        for i, row in enumerate(rows):
+            proba = probabilities[i]
+            values = contrib[i]
+            ranked = order[i]
+            drivers_up = [g for g in ranked if values[g] > 0][:top_k]
+            drivers_down = [g for g in ranked[::-1] if values[g] < 0][:top_k]
+
+            explanations.append({
+                "predicted_disease": self.classes_[pred_idx[i]],
+                "predicted_risk": float(proba[pred_idx[i]]),
+                "explained_disease": self.classes_[class_idx[i]],
+                "risk_scores": {cls: float(p) for cls, p in zip(self.classes_, proba)},
+                "drivers_up": [self._driver(row, g, values[g], "increases") for g in drivers_up],
+                "drivers_down": [self._driver(row, g, values[g], "decreases") for g in drivers_down],
+                "uncertainty_note": self._uncertainty_note(float(np.max(proba))),
+                "disclaimer": DISCLAIMER,
+            })
+        return explanations
+
+    def explain_row(self, row, probabilities=None, disease=None, top_k=None):
+        """Explain one feature row. Computes calibrated risks if not given."""
+        if probabilities is None:
+            probabilities = self.cal.predict_proba(rows_to_frame([row]))
+        probabilities = np.asarray(probabilities).reshape(1, -1)
+        diseases = None if disease is None else [disease]
+        return self.explain_batch([row], probabilities, diseases=diseases, top_k=top_k)[0]
+
+    def _driver(self, row, group, strength, direction):
+        raw_value = row.get(self.group_names_[group])
+        if isinstance(raw_value, float) and raw_value != raw_value:
+            raw_value = None  # missing lab value
+        return {
+            "feature": self.group_names_[group],
+            "raw_value": raw_value,
+            "direction": direction,
+            "strength": float(strength),
+        }
+
+    @staticmethod
+    def _uncertainty_note(max_p):
+        # A simple uncertainty hint: low max probability => uncertain prediction (not perfect, but useful)
+        if max_p >= 0.80:
+            return "Model confidence is relatively high (one disease probability is much higher than the others)."
+        if max_p >= 0.60:
+            return "Model confidence is moderate (top probabilities are somewhat close)."
+        return "Model confidence is low (several diseases have similar probabilities)."
+
+    def render_patient_text(self, explanation, top_k=3):
+        """
+        Convert explanation dict into patient-friendly text.
+        """
+        disease = explanation["explained_disease"]
+        risk = explanation["risk_scores"][disease]
+        pred = explanation["predicted_disease"]
+        pred_risk = explanation["predicted_risk"]
+
+        def pct(x):
+            return f"{100*x:.1f}%"
+
+        lines = []
+        lines.append(f"Your estimated risk for **{disease}** is **{pct(risk)}**.")
+        if disease == pred:
+            lines.append(f"This is the highest estimated risk among the diseases the model checked (**{pred}** at **{pct(pred_risk)}**).")
+        lines.append("")
+        lines.append("Key factors that influenced this estimate:")
+        for d in explanation["drivers_up"][:top_k]:
+            rv = d["raw_value"]
+            if rv is None:
+                lines.append(f"- **{d['feature']}** tended to increase the model’s estimate.")
+            else:
+                lines.append(f"- **{d['feature']}** (your value: {rv}) tended to increase the model’s estimate.")
+        for d in explanation["drivers_down"][:top_k]:
+            rv = d["raw_value"]
+            if rv is None:
+                lines.append(f"- **{d['feature']}** tended to decrease the model’s estimate.")
+            else:
+                lines.append(f"- **{d['feature']}** (your value: {rv}) tended to decrease the model’s estimate.")
+        lines.append("")
+        lines.append(explanation["uncertainty_note"])
+        lines.append(explanation["disclaimer"])
+        return "\n".join(lines)